@@ -19,8 +19,14 @@ from . import (
     user_tools,
 )
 from .config import DOMAIN, LANGFUSE, REDIS_HOST
+from .contents.counters import get_counter_buffer, is_counter_buffer_enabled
+from .contents.vector_index import get_vector_index
+from .dashboard.rollups import get_dashboard_rollup_job, is_dashboard_rollup_enabled
 from .prometheus_middleware import PrometheusMiddleware
-from .utils import setup_logger
+from .urgency_rules.matrix import get_rule_matrix_cache
+from .users.cache import get_user_cache
+from .utils import RATE_LIMIT_SCRIPT, get_embedding_cache, setup_logger
+from .write_behind import get_write_behind_queue, is_write_behind_enabled
 
 logger = setup_logger()
 
@@ -90,7 +96,26 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
 
     logger.info("Application started")
     app.state.redis = await aioredis.from_url(REDIS_HOST)
+    app.state.rate_limit_script = app.state.redis.register_script(RATE_LIMIT_SCRIPT)
+    get_embedding_cache().set_redis(app.state.redis)
+    get_user_cache().set_redis(app.state.redis)
+    get_vector_index().set_redis(app.state.redis)
+    get_rule_matrix_cache().start(app.state.redis)
+    if is_counter_buffer_enabled():
+        get_counter_buffer().start(app.state.redis)
+    if is_write_behind_enabled():
+        get_write_behind_queue().start()
+    if is_dashboard_rollup_enabled():
+        get_dashboard_rollup_job().start()
     yield
+    await get_dashboard_rollup_job().stop()
+    # flush queued writes before the connections they need are closed
+    await get_write_behind_queue().stop()
+    await get_counter_buffer().stop()
+    await get_rule_matrix_cache().stop()
+    get_vector_index().set_redis(None)
+    get_user_cache().set_redis(None)
+    get_embedding_cache().set_redis(None)
     await app.state.redis.close()
     logger.info("Application finished")
 
@@ -124,8 +149,10 @@ def create_app() -> FastAPI:
     app.include_router(contents.router)
     app.include_router(tags.router)
     app.include_router(question_answer.router)
+    app.include_router(question_answer.batch_router)
     app.include_router(urgency_rules.router)
     app.include_router(urgency_detection.router)
+    app.include_router(urgency_detection.batch_router)
     app.include_router(dashboard.router)
     app.include_router(auth.router)
     app.include_router(user_tools.router)
@@ -143,6 +170,8 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # pagination headers of the content listing and ETags of the listings
+        expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag"],
     )
 
     app.add_middleware(PrometheusMiddleware)
@@ -2,7 +2,7 @@ from datetime import datetime, timedelta, timezone
 from typing import Annotated, Dict, Optional, Union
 
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Response, status
 from fastapi.requests import Request
 from fastapi.security import (
     HTTPAuthorizationCredentials,
@@ -14,6 +14,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import DEFAULT_API_QUOTA, DEFAULT_CONTENT_QUOTA
 from ..database import get_sqlalchemy_async_engine
+from ..users.cache import get_user_cache
 from ..users.models import (
     UserDB,
     UserNotFoundError,
@@ -21,8 +22,10 @@ from ..users.models import (
     get_user_by_username,
     save_user_to_db,
 )
-from ..users.schemas import UserCreate
+from ..users.schemas import UserCreate, UserIdentity
 from ..utils import (
+    consume_api_call,
+    get_key_hash,
     setup_logger,
     update_api_limits,
     verify_password_salted_hash,
@@ -31,7 +34,6 @@ from .config import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     JWT_ALGORITHM,
     JWT_SECRET,
-    REDIS_KEY_EXPIRED,
 )
 from .schemas import AuthenticatedUser
 
@@ -43,23 +45,34 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 async def authenticate_key(
     credentials: HTTPAuthorizationCredentials = Depends(bearer),
-) -> UserDB:
+) -> UserIdentity:
     """
     Authenticate using basic bearer token. Used for calling
     the question-answering endpoints. In case the JWT token is
-    provided instead of the API key, it will fall back to JWT
+    provided instead of the API key, it will fall back to JWT.
+
+    Users found by API key are cached (see `UserCache`), so in the steady state
+    this does not hit the database.
     """
     token = credentials.credentials
+    hashed_api_key = get_key_hash(token)
+    user_cache = get_user_cache()
+    user = await user_cache.get(hashed_api_key)
+    if user is not None:
+        return user
+
     async with AsyncSession(
         get_sqlalchemy_async_engine(), expire_on_commit=False
     ) as asession:
         try:
             user_db = await get_user_by_api_key(token, asession)
-            return user_db
+            user = UserIdentity.model_validate(user_db)
+            await user_cache.set(hashed_api_key, user)
+            return user
         except UserNotFoundError:
             # Fall back to JWT token authentication if api key is not valid.
             user_db = await get_current_user(token)
-            return user_db
+            return UserIdentity.model_validate(user_db)
 
 
 async def authenticate_credentials(
@@ -158,23 +171,37 @@ def create_access_token(username: str) -> str:
 
 async def rate_limiter(
     request: Request,
-    user_db: UserDB = Depends(authenticate_key),
+    response: Response,
+    user_db: UserIdentity = Depends(authenticate_key),
 ) -> None:
     """
-    Rate limiter for the API calls. Gets daily quota and decrement it
+    Rate limiter for the API calls. Gets daily quota and decrement it.
+
+    The check and decrement are done atomically in Redis, and the number of calls
+    left today is returned in the `X-RateLimit-Remaining` header for users with a
+    daily quota.
     """
-    username = user_db.username
-    key = f"remaining-calls:{username}"
-    redis = request.app.state.redis
-    ttl = await redis.ttl(key)
-    # if key does not exist, set the key and value
-    if ttl == REDIS_KEY_EXPIRED:
-        await update_api_limits(redis, username, user_db.api_daily_quota)
-
-    nb_remaining = await redis.get(key)
-
-    if nb_remaining != b"None":
-        nb_remaining = int(nb_remaining)
-        if nb_remaining <= 0:
-            raise HTTPException(status_code=429, detail="API call limit reached.")
-        await redis.set(key, nb_remaining - 1, keepttl=True)
+    await consume_api_calls(request, response, user_db, n_calls=1)
+
+
+async def consume_api_calls(
+    request: Request, response: Response, user_db: UserIdentity, n_calls: int
+) -> None:
+    """
+    Consume `n_calls` of the user's daily quota, e.g. one per item of a batch
+    request, raising an error 429 if there aren't enough calls left.
+    """
+    allowed, nb_remaining = await consume_api_call(
+        request.app.state.rate_limit_script,
+        user_db.username,
+        user_db.api_daily_quota,
+        n_calls=n_calls,
+    )
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="API call limit reached.",
+            headers={"X-RateLimit-Remaining": str(nb_remaining or 0)},
+        )
+    if nb_remaining is not None:
+        response.headers["X-RateLimit-Remaining"] = str(nb_remaining)
@@ -0,0 +1,147 @@
+"""This module contains the catalog versions used for conditional GETs of listings.
+
+Each user has a catalog version in Redis that increases whenever their contents,
+tags or urgency rules change. Listings of these return it as a weak ETag, so a
+client sending it back in `If-None-Match` gets a 304 response without the listing
+being queried or serialized.
+
+Vote counts change too often to bump the version, so the ETag also changes every
+`CATALOG_ETAG_MAX_AGE_SECONDS`, which bounds how stale the counts can be.
+"""
+
+import time
+from typing import Optional
+
+from fastapi import Request, Response, status
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from .config import CATALOG_ETAG_MAX_AGE_SECONDS
+from .utils import setup_logger
+
+logger = setup_logger()
+
+
+def is_catalog_etag_enabled() -> bool:
+    """Whether listings get catalog ETags."""
+
+    return int(CATALOG_ETAG_MAX_AGE_SECONDS) > 0
+
+
+def get_catalog_version_key(user_id: int) -> str:
+    """Get the Redis key of the user's catalog version."""
+
+    return f"catalog-version:{user_id}"
+
+
+async def bump_catalog_version(redis: aioredis.Redis, user_id: int) -> None:
+    """Increase the user's catalog version, after a change to their contents, tags
+    or urgency rules.
+
+    A missing version starts from the current time in milliseconds rather than 0, so
+    that versions keep increasing if Redis loses its data.
+
+    The change itself is already saved, so a Redis error is only logged: clients
+    may then get 304 responses for the old catalog until their ETag expires, after
+    at most `CATALOG_ETAG_MAX_AGE_SECONDS`.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    user_id
+        The ID of the user whose catalog changed.
+    """
+
+    key = get_catalog_version_key(user_id)
+    try:
+        await redis.set(key, time.time_ns() // 1_000_000, nx=True)
+        await redis.incr(key)
+    except RedisError as e:
+        logger.warning(f"Catalog version bump failed for user {user_id}: {e}")
+
+
+async def get_catalog_etag(redis: aioredis.Redis, user_id: int) -> Optional[str]:
+    """Get the weak ETag of the user's current catalog.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    user_id
+        The ID of the user.
+
+    Returns
+    -------
+    Optional[str]
+        The ETag, or `None` if the catalog version can't be read.
+    """
+
+    key = get_catalog_version_key(user_id)
+    try:
+        version = await redis.get(key)
+        if version is None:
+            await redis.set(key, time.time_ns() // 1_000_000, nx=True)
+            version = await redis.get(key)
+    except RedisError as e:
+        logger.warning(f"Catalog version read failed: {e}")
+        return None
+    if version is None:
+        return None
+
+    period = int(time.time() // int(CATALOG_ETAG_MAX_AGE_SECONDS))
+    return f'W/"{user_id}-{int(version)}-{period}"'
+
+
+async def get_not_modified_response(
+    request: Request, response: Response, user_id: int
+) -> Optional[Response]:
+    """Set the catalog ETag on the response of a listing, and get a 304 response if
+    the client's copy is up to date.
+
+    The ETag must be read before the listing is queried, so that a change made in
+    between gives the listing a newer ETag on the next request.
+
+    Parameters
+    ----------
+    request
+        The request for the listing.
+    response
+        The response of the listing.
+    user_id
+        The ID of the user whose catalog is listed.
+
+    Returns
+    -------
+    Optional[Response]
+        The 304 response if the client's copy is up to date, otherwise `None`.
+    """
+
+    if not is_catalog_etag_enabled():
+        return None
+    etag = await get_catalog_etag(request.app.state.redis, user_id)
+    if etag is None:
+        return None
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    response.headers["ETag"] = etag
+    return None
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an `If-None-Match` header matches the ETag, with weak comparison."""
+
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return _strip_weak(etag) in {_strip_weak(candidate) for candidate in candidates}
+
+
+def _strip_weak(etag: str) -> str:
+    """Remove the weak indicator of an ETag."""
+
+    return etag[2:] if etag.startswith("W/") else etag
@@ -75,3 +75,61 @@ DB_POOL_SIZE = os.environ.get("DB_POOL_SIZE", 20)  # Number of connections in th
 
 # Redis
 REDIS_HOST = os.environ.get("REDIS_HOST", "redis://localhost:6379")
+
+# Embedding batches
+# Max number of texts per embedding request
+EMBEDDING_BATCH_SIZE = os.environ.get("EMBEDDING_BATCH_SIZE", 64)
+# Max number of embedding requests in flight per batch call
+EMBEDDING_BATCH_CONCURRENCY = os.environ.get("EMBEDDING_BATCH_CONCURRENCY", 4)
+
+# Embedding cache
+# Number of embeddings kept in the in-process tier (each is ~6KB for 1536 dims)
+EMBEDDING_CACHE_MAX_SIZE = os.environ.get("EMBEDDING_CACHE_MAX_SIZE", 4096)
+# Expiry of embeddings in the shared Redis tier
+EMBEDDING_CACHE_TTL_SECONDS = os.environ.get(
+    "EMBEDDING_CACHE_TTL_SECONDS", 60 * 60 * 24 * 30
+)
+
+# API key -> user cache
+# Expiry of user snapshots in the shared Redis tier. Entries are also invalidated
+# explicitly when a user's API key or quotas change.
+USER_CACHE_TTL_SECONDS = os.environ.get("USER_CACHE_TTL_SECONDS", 300)
+# Expiry of the in-process tier. This bounds how long other workers keep serving a
+# snapshot after it has been invalidated, so keep it short.
+USER_CACHE_LOCAL_TTL_SECONDS = os.environ.get("USER_CACHE_LOCAL_TTL_SECONDS", 5)
+USER_CACHE_MAX_SIZE = os.environ.get("USER_CACHE_MAX_SIZE", 1024)
+
+# Write-behind persistence of query responses and counters
+# If "False", writes are done inline on the request path
+WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND_ENABLED", "True")
+# Max number of writes committed together
+WRITE_BEHIND_MAX_BATCH_SIZE = os.environ.get("WRITE_BEHIND_MAX_BATCH_SIZE", 500)
+# Max time a write waits in the queue before its batch is committed
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = os.environ.get(
+    "WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", 1
+)
+# Requests wait for space in the queue once it is full
+WRITE_BEHIND_MAX_QUEUE_SIZE = os.environ.get("WRITE_BEHIND_MAX_QUEUE_SIZE", 10000)
+
+# Data API
+# Number of rows fetched from the database per batch of a streaming export
+DATA_API_EXPORT_BATCH_SIZE = os.environ.get("DATA_API_EXPORT_BATCH_SIZE", 500)
+# Max number of rows per page of the paginated endpoints
+DATA_API_MAX_PAGE_SIZE = os.environ.get("DATA_API_MAX_PAGE_SIZE", 1000)
+# The cursor returned by the change endpoints is this much earlier than the time of
+# the request, so that changes committed late (with an earlier update time) aren't
+# missed by the next sync
+DATA_API_SYNC_OVERLAP_SECONDS = os.environ.get("DATA_API_SYNC_OVERLAP_SECONDS", 60)
+# Deletions are reported by the change endpoints for this many days. Tombstones
+# older than this are pruned, and a sync from before it gets a 410 response: the
+# client must fetch all the records again.
+DATA_API_TOMBSTONE_RETENTION_DAYS = os.environ.get(
+    "DATA_API_TOMBSTONE_RETENTION_DAYS", 30
+)
+
+# Catalog ETags
+# Listings of contents, tags and urgency rules get an ETag from the user's catalog
+# version, which is bumped whenever these change. Vote counts aren't part of the
+# catalog, so listings are also revalidated once this many seconds have passed
+# (0 to disable ETags).
+CATALOG_ETAG_MAX_AGE_SECONDS = os.environ.get("CATALOG_ETAG_MAX_AGE_SECONDS", 300)
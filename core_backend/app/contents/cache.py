@@ -0,0 +1,111 @@
+"""This module contains the Redis-backed cache of content counts.
+
+Counts are keyed on the user ID and the filters they were counted with. Each user
+has a version number in Redis that is part of every key, so all of a user's counts
+are invalidated at once by incrementing it whenever their contents or tags change.
+"""
+
+import hashlib
+import json
+from typing import Optional, Sequence
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from ..utils import setup_logger
+from .config import CONTENT_COUNT_CACHE_TTL_SECONDS
+
+logger = setup_logger()
+
+
+def is_content_count_cache_enabled() -> bool:
+    """Whether content counts are cached."""
+
+    return int(CONTENT_COUNT_CACHE_TTL_SECONDS) > 0
+
+
+def get_filters_hash(
+    *,
+    exclude_archived: bool,
+    tag_ids: Optional[Sequence[int]],
+    search_text: Optional[str],
+) -> str:
+    """Hash the filters of a content count."""
+
+    filters = [exclude_archived, sorted(set(tag_ids or [])), search_text or ""]
+    return hashlib.sha256(json.dumps(filters).encode()).hexdigest()
+
+
+async def get_cached_content_count(
+    redis: aioredis.Redis, user_id: int, filters_hash: str
+) -> Optional[int]:
+    """Look up the user's cached content count for the filters.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    user_id
+        The ID of the user.
+    filters_hash
+        The hash of the filters of the count (see `get_filters_hash`).
+
+    Returns
+    -------
+    Optional[int]
+        The cached count if there is one, otherwise `None`.
+    """
+
+    try:
+        key = await _get_count_key(redis, user_id, filters_hash)
+        cached = await redis.get(key)
+    except RedisError as e:
+        logger.warning(f"Content count cache read failed: {e}")
+        return None
+    return int(cached) if cached is not None else None
+
+
+async def cache_content_count(
+    redis: aioredis.Redis, user_id: int, filters_hash: str, count: int
+) -> None:
+    """Cache the user's content count for the filters.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    user_id
+        The ID of the user.
+    filters_hash
+        The hash of the filters of the count (see `get_filters_hash`).
+    count
+        The count to cache.
+    """
+
+    try:
+        key = await _get_count_key(redis, user_id, filters_hash)
+        await redis.set(key, count, ex=int(CONTENT_COUNT_CACHE_TTL_SECONDS))
+    except RedisError as e:
+        logger.warning(f"Content count cache write failed: {e}")
+
+
+async def invalidate_content_counts(redis: aioredis.Redis, user_id: int) -> None:
+    """Invalidate all cached content counts for the user.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    user_id
+        The ID of the user whose counts are invalidated.
+    """
+
+    await redis.incr(f"content-count-version:{user_id}")
+
+
+async def _get_count_key(redis: aioredis.Redis, user_id: int, filters_hash: str) -> str:
+    """Get the key of the count for the user's current version."""
+
+    cached_version = await redis.get(f"content-count-version:{user_id}")
+    version = int(cached_version) if cached_version is not None else 0
+    return f"content-count:{user_id}:{version}:{filters_hash}"
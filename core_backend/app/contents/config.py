@@ -5,3 +5,52 @@ PGVECTOR_VECTOR_SIZE = os.environ.get("PGVECTOR_VECTOR_SIZE", "1536")
 PGVECTOR_M = os.environ.get("PGVECTOR_M", "16")
 PGVECTOR_EF_CONSTRUCTION = os.environ.get("PGVECTOR_EF_CONSTRUCTION", "64")
 PGVECTOR_DISTANCE = os.environ.get("PGVECTOR_DISTANCE", "vector_cosine_ops")
+# `hnsw.ef_search` is set per query to PGVECTOR_EF_SEARCH_RATIO times the user's
+# number of contents, clipped to [PGVECTOR_EF_SEARCH_MIN, PGVECTOR_EF_SEARCH_MAX]
+PGVECTOR_EF_SEARCH_MIN = os.environ.get("PGVECTOR_EF_SEARCH_MIN", "40")
+PGVECTOR_EF_SEARCH_MAX = os.environ.get("PGVECTOR_EF_SEARCH_MAX", "1000")
+PGVECTOR_EF_SEARCH_RATIO = os.environ.get("PGVECTOR_EF_SEARCH_RATIO", "0.05")
+# How long each worker caches a user's number of contents for `hnsw.ef_search`
+PGVECTOR_EF_SEARCH_CACHE_TTL_SECONDS = os.environ.get(
+    "PGVECTOR_EF_SEARCH_CACHE_TTL_SECONDS", "300"
+)
+
+# Content counters (query count and votes)
+# If "True", increments are accumulated in Redis and flushed to Postgres
+# periodically, so hot contents aren't updated on every query
+CONTENT_COUNTERS_REDIS_BUFFER = os.environ.get("CONTENT_COUNTERS_REDIS_BUFFER", "False")
+CONTENT_COUNTERS_FLUSH_INTERVAL_SECONDS = os.environ.get(
+    "CONTENT_COUNTERS_FLUSH_INTERVAL_SECONDS", "10"
+)
+# Each flush is recorded in Postgres so that it is applied once even if retried (e.g.
+# by another worker after a crash). Records are kept for this many days.
+CONTENT_COUNTERS_FLUSH_RECORD_RETENTION_DAYS = os.environ.get(
+    "CONTENT_COUNTERS_FLUSH_RECORD_RETENTION_DAYS", "7"
+)
+
+# Content search engine: "pgvector", or "numpy" to search each user's contents in
+# an in-process matrix (falls back to pgvector for users with more contents than
+# NUMPY_INDEX_MAX_CONTENTS). Postgres remains the source of truth.
+CONTENT_SEARCH_ENGINE = os.environ.get("CONTENT_SEARCH_ENGINE", "pgvector")
+NUMPY_INDEX_MAX_CONTENTS = os.environ.get("NUMPY_INDEX_MAX_CONTENTS", "5000")
+# Memory cap on the embedding matrices each worker keeps; the least recently searched
+# users' indexes are dropped beyond it
+NUMPY_INDEX_MAX_MEMORY_MB = os.environ.get("NUMPY_INDEX_MAX_MEMORY_MB", "512")
+
+# Hybrid retrieval: if "True", contents are also searched by full-text search and
+# the lexical and vector rankings are merged with reciprocal-rank fusion
+HYBRID_SEARCH_ENABLED = os.environ.get("HYBRID_SEARCH_ENABLED", "False")
+HYBRID_SEARCH_N_CANDIDATES = os.environ.get("HYBRID_SEARCH_N_CANDIDATES", "20")
+HYBRID_SEARCH_RRF_K = os.environ.get("HYBRID_SEARCH_RRF_K", "60")
+# If set, the embedding call is skipped when the top lexical match contains every
+# query term and its normalized rank (between 0 and 1) is at least this value
+HYBRID_SEARCH_SKIP_EMBEDDING_MIN_RANK = os.environ.get(
+    "HYBRID_SEARCH_SKIP_EMBEDDING_MIN_RANK", None
+)
+
+# Content counts of the admin API (e.g. the total number of contents matching the
+# filters of a listing) are cached in Redis for this many seconds (0 to disable).
+# They are invalidated whenever the user's contents or tags change.
+CONTENT_COUNT_CACHE_TTL_SECONDS = os.environ.get(
+    "CONTENT_COUNT_CACHE_TTL_SECONDS", "300"
+)
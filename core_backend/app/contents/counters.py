@@ -0,0 +1,176 @@
+"""This module contains the Redis buffer for content counter increments."""
+
+import asyncio
+from typing import Iterable, Optional
+from uuid import uuid4
+
+from redis import asyncio as aioredis
+from redis.exceptions import ResponseError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_sqlalchemy_async_engine
+from ..utils import setup_logger
+from .config import (
+    CONTENT_COUNTERS_FLUSH_INTERVAL_SECONDS,
+    CONTENT_COUNTERS_REDIS_BUFFER,
+)
+from .models import (
+    ContentCounter,
+    ContentCounterDeltas,
+    apply_content_counter_deltas,
+    record_content_counter_flush,
+)
+
+logger = setup_logger()
+
+
+class RedisCounterBuffer:
+    """
+    Accumulates content counter increments in a Redis hash with `HINCRBY` and
+    periodically flushes the totals to Postgres with set-based `UPDATE`s.
+
+    Hot contents are then updated once per flush rather than once per query. The
+    hash is shared by all workers: a flush atomically `RENAME`s it to a new flushing
+    key, so increments made during a flush go to a fresh hash and none are lost.
+
+    If a flush fails part way through, or its worker dies, the flushing key is kept
+    and retried by the next flush of any worker. Each flushing key is recorded in
+    Postgres in the same transaction as its increments (see
+    `record_content_counter_flush`), so they are applied once even if the key is
+    retried after being committed, or by two workers at the same time.
+    """
+
+    KEY = "content-counter-deltas"
+    FLUSHING_KEY_PREFIX = f"{KEY}:flushing:"
+
+    def __init__(self, flush_interval_seconds: float) -> None:
+        """
+        Initialize the buffer
+        """
+        self.flush_interval_seconds = flush_interval_seconds
+        self.redis: aioredis.Redis | None = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Whether increments are being buffered
+        """
+        return self._worker is not None
+
+    def start(self, redis: aioredis.Redis) -> None:
+        """
+        Start buffering increments in Redis and flushing them periodically
+        """
+        self.redis = redis
+        if self._worker is None:
+            self._stopping = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the periodic flush and flush what is left
+        """
+        if self._worker is None:
+            return
+        self._stopping.set()
+        await self._worker
+        self._worker = None
+
+    async def add(
+        self, user_id: int, content_ids: Iterable[int], counter: ContentCounter
+    ) -> None:
+        """
+        Add an increment of the counter for each of the user's contents
+        """
+        if self.redis is None:
+            raise RuntimeError("The content counter buffer hasn't been started")
+        pipe = self.redis.pipeline(transaction=False)
+        for content_id in content_ids:
+            pipe.hincrby(self.KEY, f"{user_id}:{content_id}:{counter}", 1)
+        await pipe.execute()
+
+    async def flush(self) -> None:
+        """
+        Apply the accumulated increments to the database
+        """
+        if self.redis is None:
+            # never started, so nothing was buffered
+            return
+        # left over by the failed flushes of any worker
+        async for key in self.redis.scan_iter(match=f"{self.FLUSHING_KEY_PREFIX}*"):
+            if isinstance(key, bytes):
+                key = key.decode()
+            await self._apply_and_delete(self.redis, key)
+
+        flushing_key = f"{self.FLUSHING_KEY_PREFIX}{uuid4().hex}"
+        try:
+            await self.redis.rename(self.KEY, flushing_key)
+        except ResponseError:
+            # nothing to flush
+            return
+        await self._apply_and_delete(self.redis, flushing_key)
+
+    async def _apply_and_delete(self, redis: aioredis.Redis, flushing_key: str) -> None:
+        """
+        Apply the increments in the flushing key to the database, unless they have
+        already been applied, then delete it
+        """
+        raw_deltas = await redis.hgetall(flushing_key)
+
+        deltas: ContentCounterDeltas = {}
+        for field, n in raw_deltas.items():
+            if isinstance(field, bytes):
+                field = field.decode()
+            user_id, content_id, counter = field.split(":")
+            deltas[(int(user_id), int(content_id), counter)] = int(n)  # type: ignore
+
+        if deltas:
+            flush_id = flushing_key.removeprefix(self.FLUSHING_KEY_PREFIX)
+            async with AsyncSession(
+                get_sqlalchemy_async_engine(), expire_on_commit=False
+            ) as asession:
+                if await record_content_counter_flush(flush_id, asession):
+                    await apply_content_counter_deltas(deltas, asession)
+                await asession.commit()
+        await redis.delete(flushing_key)
+
+    async def _run(self) -> None:
+        """
+        Flush periodically until stopped, then flush one last time
+        """
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), self.flush_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            # Any error is caught so that the loop keeps flushing. The flushing key
+            # is kept and retried on the next flush.
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Content counter flush failed, will retry: {e!r}")
+
+
+_COUNTER_BUFFER = RedisCounterBuffer(
+    flush_interval_seconds=float(CONTENT_COUNTERS_FLUSH_INTERVAL_SECONDS)
+)
+
+
+def is_counter_buffer_enabled() -> bool:
+    """Whether content counter increments should be buffered in Redis."""
+
+    return CONTENT_COUNTERS_REDIS_BUFFER == "True"
+
+
+def get_counter_buffer() -> RedisCounterBuffer:
+    """Return the global content counter buffer.
+
+    :returns:
+        The global content counter buffer.
+    """
+
+    return _COUNTER_BUFFER
@@ -2,37 +2,96 @@
 database helper functions such as saving, updating, deleting, and retrieving content.
 """
 
-from datetime import datetime, timezone
-from typing import Dict, List, Optional
-
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Set, Tuple
+
+import numpy as np
 from pgvector.sqlalchemy import Vector
 from sqlalchemy import (
     JSON,
     Boolean,
     DateTime,
+    Exists,
     ForeignKey,
     Index,
     Integer,
+    Select,
     String,
+    Text,
+    any_,
+    bindparam,
+    cast,
     delete,
+    exists,
     false,
+    func,
+    literal_column,
+    or_,
     select,
+    text,
+    true,
     update,
 )
+from sqlalchemy.dialects.postgresql import ARRAY, TSQUERY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Mapped, mapped_column, relationship, selectinload
+from sqlalchemy.orm import Mapped, defer, mapped_column, relationship, selectinload
 
+from ..database import get_sqlalchemy_async_engine
 from ..models import Base, JSONDict
 from ..schemas import FeedbackSentiment, QuerySearchResult
 from ..tags.models import content_tags_table
-from ..utils import embedding
+from ..tombstones import add_tombstone
+from ..utils import embedding, embedding_batch, setup_logger
 from .config import (
+    CONTENT_COUNTERS_FLUSH_RECORD_RETENTION_DAYS,
+    HYBRID_SEARCH_ENABLED,
+    HYBRID_SEARCH_N_CANDIDATES,
+    HYBRID_SEARCH_RRF_K,
+    HYBRID_SEARCH_SKIP_EMBEDDING_MIN_RANK,
     PGVECTOR_DISTANCE,
     PGVECTOR_EF_CONSTRUCTION,
+    PGVECTOR_EF_SEARCH_CACHE_TTL_SECONDS,
+    PGVECTOR_EF_SEARCH_MAX,
+    PGVECTOR_EF_SEARCH_MIN,
+    PGVECTOR_EF_SEARCH_RATIO,
     PGVECTOR_M,
     PGVECTOR_VECTOR_SIZE,
 )
 from .schemas import ContentCreate, ContentUpdate
+from .vector_index import TenantIndex, get_vector_index, is_vector_index_enabled
+
+logger = setup_logger()
+
+ContentCounter = Literal["query_count", "positive_votes", "negative_votes"]
+# (user_id, content_id, counter) -> increment
+ContentCounterDeltas = Dict[Tuple[int, int, ContentCounter], int]
+
+# Must match the expression of the `content_text_search_idx` GIN index. The "simple"
+# configuration doesn't stem, since contents can be in any language.
+CONTENT_TSVECTOR = literal_column(
+    "to_tsvector('simple', content.content_title || ' ' || content.content_text)"
+)
+
+# What `str.strip()` strips, for comparisons with stripped titles and texts
+STRIPPED_CHARACTERS = " \t\n\r\f\v"
+
+# users whose partial HNSW index is known to exist, or is being built
+_USERS_WITH_CONTENT_INDEX: Set[int] = set()
+_USERS_BUILDING_INDEX: Set[int] = set()
+# first key of the session-level advisory lock held, with the user ID as second key,
+# while checking and building a user's index, so that only one worker does it at a
+# time
+CONTENT_INDEX_LOCK_CLASS = 72_642_151
+
+# user ID -> (expiry time, number of non-archived contents), for `hnsw.ef_search`
+EF_SEARCH_CACHE_MAX_SIZE = 10000
+_EF_SEARCH_CACHE: OrderedDict[int, Tuple[float, int]] = OrderedDict()
 
 
 class ContentDB(Base):
@@ -55,6 +114,8 @@ class ContentDB(Base):
             },
             postgresql_ops={"embedding": {PGVECTOR_DISTANCE}},
         ),
+        Index("content_user_id_idx", "user_id"),
+        Index("content_user_id_updated_idx", "user_id", "updated_datetime_utc"),
     )
 
     content_id: Mapped[int] = mapped_column(Integer, primary_key=True, nullable=False)
@@ -113,6 +174,48 @@ class ContentDB(Base):
         )
 
 
+class ContentCounterFlushDB(Base):
+    """ORM for the flushes of the Redis buffer of content counter increments (see
+    `RedisCounterBuffer`).
+
+    A flush is recorded in the same transaction as its increments, so that they are
+    applied once even if the flush is retried.
+    """
+
+    __tablename__ = "content_counter_flush"
+
+    __table_args__ = (
+        Index("content_counter_flush_flushed_idx", "flushed_datetime_utc"),
+    )
+
+    flush_id: Mapped[str] = mapped_column(
+        String(length=64), primary_key=True, nullable=False
+    )
+    flushed_datetime_utc: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        """Construct the string representation of the `ContentCounterFlushDB` object.
+
+        Returns
+        -------
+        str
+            A string representation of the `ContentCounterFlushDB` object.
+        """
+
+        return (
+            f"ContentCounterFlushDB(flush_id={self.flush_id}, "
+            f"flushed_datetime_utc={self.flushed_datetime_utc})"
+        )
+
+
+# Loads every column of the contents but their embeddings, which are only needed to
+# search or index them. Accessing the embedding of a content loaded with this option
+# raises instead of querying the database again.
+CONTENT_WITHOUT_EMBEDDING = defer(ContentDB.content_embedding, raiseload=True)
+
+
 async def save_content_to_db(
     *,
     user_id: int,
@@ -169,6 +272,62 @@ async def save_content_to_db(
     return result or content_db
 
 
+async def save_contents_to_db(
+    *,
+    user_id: int,
+    contents: List[ContentCreate],
+    asession: AsyncSession,
+) -> List[ContentDB]:
+    """Vectorize a list of contents and save them to the database in a single
+    transaction.
+
+    The contents are embedded in batches (see `embedding_batch`) and inserted with
+    a multi-row INSERT.
+
+    NB: The tags of each content must already be validated `TagDB` objects.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user requesting the save.
+    contents
+        The contents to save.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    List[ContentDB]
+        The newly created content objects, in the same order as `contents`.
+    """
+
+    metadata = {
+        "trace_user_id": "user_id-" + str(user_id),
+        "generation_name": "save_contents_to_db",
+    }
+
+    content_embeddings = await embedding_batch(
+        [_get_text_to_embed(content) for content in contents], metadata=metadata
+    )
+    content_dbs = [
+        ContentDB(
+            user_id=user_id,
+            content_embedding=content_embedding,
+            content_title=content.content_title,
+            content_text=content.content_text,
+            content_metadata=content.content_metadata,
+            content_tags=content.content_tags,
+            created_datetime_utc=datetime.now(timezone.utc),
+            updated_datetime_utc=datetime.now(timezone.utc),
+        )
+        for content, content_embedding in zip(contents, content_embeddings)
+    ]
+    asession.add_all(content_dbs)
+    await asession.commit()
+
+    return content_dbs
+
+
 async def update_content_in_db(
     user_id: int,
     content_id: int,
@@ -248,14 +407,120 @@ async def increment_query_count(
 
     if contents is None:
         return
-    for _, content in contents.items():
-        content_db = await get_content_from_db(
-            user_id=user_id, content_id=content.id, asession=asession
+    await increment_content_counters(
+        user_id=user_id,
+        content_ids=[content.id for content in contents.values()],
+        counter="query_count",
+        asession=asession,
+    )
+    await asession.commit()
+
+
+async def increment_content_counters(
+    user_id: int,
+    content_ids: Iterable[int],
+    counter: ContentCounter,
+    asession: AsyncSession,
+    n: int = 1,
+) -> None:
+    """Increment a counter of the contents in a single set-based `UPDATE`.
+
+    The increment is done by the database, so concurrent increments are not lost.
+    Archived contents are not updated. Does not commit.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user who owns the contents.
+    content_ids
+        The IDs of the contents to update. Unknown IDs are ignored.
+    counter
+        The counter to increment.
+    asession
+        `AsyncSession` object for database transactions.
+    n
+        The increment.
+    """
+
+    content_ids = list(content_ids)
+    if not content_ids:
+        return
+    column = getattr(ContentDB, counter)
+    stmt = (
+        update(ContentDB)
+        .where(ContentDB.user_id == user_id)
+        .where(ContentDB.content_id == any_(content_ids))
+        .where(ContentDB.is_archived == false())
+        .values({counter: column + n})
+    )
+    await asession.execute(stmt)
+
+
+async def apply_content_counter_deltas(
+    deltas: ContentCounterDeltas,
+    asession: AsyncSession,
+) -> None:
+    """Apply accumulated counter increments with one `UPDATE` per distinct
+    (user, counter, increment). Does not commit.
+
+    Parameters
+    ----------
+    deltas
+        The increment for each (user ID, content ID, counter).
+    asession
+        `AsyncSession` object for database transactions.
+    """
+
+    grouped: Dict[Tuple[int, ContentCounter, int], List[int]] = {}
+    for (user_id, content_id, counter), n in deltas.items():
+        if n:
+            grouped.setdefault((user_id, counter, n), []).append(content_id)
+    for (user_id, counter, n), content_ids in grouped.items():
+        await increment_content_counters(
+            user_id=user_id,
+            content_ids=sorted(content_ids),
+            counter=counter,
+            asession=asession,
+            n=n,
         )
-        if content_db:
-            content_db.query_count = content_db.query_count + 1
-            await asession.merge(content_db)
-            await asession.commit()
+
+
+async def record_content_counter_flush(flush_id: str, asession: AsyncSession) -> bool:
+    """Record a flush of the content counter buffer, unless it has already been
+    recorded, and delete the records older than
+    `CONTENT_COUNTERS_FLUSH_RECORD_RETENTION_DAYS`. Does not commit.
+
+    If the flush is being recorded concurrently by another transaction, this waits
+    for that transaction to end.
+
+    Parameters
+    ----------
+    flush_id
+        The ID of the flush.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    bool
+        Whether the flush has been recorded, i.e. whether its increments haven't
+        been applied yet and should be applied in the same transaction.
+    """
+
+    now = datetime.now(timezone.utc)
+    await asession.execute(
+        delete(ContentCounterFlushDB).where(
+            ContentCounterFlushDB.flushed_datetime_utc
+            < now - timedelta(days=float(CONTENT_COUNTERS_FLUSH_RECORD_RETENTION_DAYS))
+        )
+    )
+    stmt = (
+        pg_insert(ContentCounterFlushDB)
+        .values(flush_id=flush_id, flushed_datetime_utc=now)
+        .on_conflict_do_nothing(index_elements=[ContentCounterFlushDB.flush_id])
+        .returning(ContentCounterFlushDB.flush_id)
+    )
+    return (await asession.execute(stmt)).scalar_one_or_none() is not None
 
 
 async def archive_content_from_db(
@@ -279,7 +544,7 @@ async def archive_content_from_db(
         update(ContentDB)
         .where(ContentDB.user_id == user_id)
         .where(ContentDB.content_id == content_id)
-        .values(is_archived=True)
+        .values(is_archived=True, updated_datetime_utc=datetime.now(timezone.utc))
     )
     await asession.execute(stmt)
     await asession.commit()
@@ -290,7 +555,7 @@ async def delete_content_from_db(
     content_id: int,
     asession: AsyncSession,
 ) -> None:
-    """Delete content from the database.
+    """Delete content from the database, leaving a tombstone for the data API.
 
     Parameters
     ----------
@@ -311,7 +576,14 @@ async def delete_content_from_db(
         .where(ContentDB.user_id == user_id)
         .where(ContentDB.content_id == content_id)
     )
-    await asession.execute(stmt)
+    result = await asession.execute(stmt)
+    if result.rowcount:
+        await add_tombstone(
+            user_id=user_id,
+            record_type="content",
+            record_id=content_id,
+            asession=asession,
+        )
     await asession.commit()
 
 
@@ -359,9 +631,13 @@ async def get_list_of_content_from_db(
     offset: int = 0,
     limit: Optional[int] = None,
     exclude_archived: bool = True,
+    after_id: Optional[int] = None,
+    tag_ids: Optional[Sequence[int]] = None,
+    search_text: Optional[str] = None,
+    include_embedding: bool = False,
     asession: AsyncSession,
 ) -> List[ContentDB]:
-    """Retrieve all content from the database.
+    """Retrieve all content from the database, ordered by ID.
 
     Parameters
     ----------
@@ -374,6 +650,17 @@ async def get_list_of_content_from_db(
         content items are retrieved.
     exclude_archived
         Specifies whether to exclude archived content.
+    after_id
+        If specified, only content items with a greater ID are retrieved. Unlike
+        `offset`, this doesn't get slower as the pages go on.
+    tag_ids
+        If specified, only content items with at least one of these tags are
+        retrieved.
+    search_text
+        If specified, only content items whose title or text contains this text
+        (case-insensitively) are retrieved.
+    include_embedding
+        Specifies whether to load the embeddings of the content items.
     asession
         `AsyncSession` object for database transactions.
 
@@ -383,14 +670,19 @@ async def get_list_of_content_from_db(
         A list of content objects if they exist, otherwise an empty list.
     """
 
-    stmt = (
+    stmt = filter_contents(
         select(ContentDB)
         .options(selectinload(ContentDB.content_tags))
-        .where(ContentDB.user_id == user_id)
-        .order_by(ContentDB.content_id)
+        .order_by(ContentDB.content_id),
+        user_id=user_id,
+        exclude_archived=exclude_archived,
+        tag_ids=tag_ids,
+        search_text=search_text,
     )
-    if exclude_archived:
-        stmt = stmt.where(ContentDB.is_archived == false())
+    if not include_embedding:
+        stmt = stmt.options(CONTENT_WITHOUT_EMBEDDING)
+    if after_id is not None:
+        stmt = stmt.where(ContentDB.content_id > after_id)
     if offset > 0:
         stmt = stmt.offset(offset)
     if isinstance(limit, int) and limit > 0:
@@ -400,6 +692,162 @@ async def get_list_of_content_from_db(
     return [c[0] for c in content_rows] if content_rows else []
 
 
+async def count_contents_in_db(
+    *,
+    user_id: int,
+    exclude_archived: bool = True,
+    tag_ids: Optional[Sequence[int]] = None,
+    search_text: Optional[str] = None,
+    asession: AsyncSession,
+) -> int:
+    """Count the contents of a user in the database.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user whose contents are counted.
+    exclude_archived
+        Specifies whether to exclude archived content.
+    tag_ids
+        If specified, only contents with at least one of these tags are counted.
+    search_text
+        If specified, only contents whose title or text contains this text
+        (case-insensitively) are counted.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    int
+        The number of contents of the user.
+    """
+
+    stmt = filter_contents(
+        select(func.count()).select_from(ContentDB),
+        user_id=user_id,
+        exclude_archived=exclude_archived,
+        tag_ids=tag_ids,
+        search_text=search_text,
+    )
+    return (await asession.execute(stmt)).scalar_one()
+
+
+def filter_contents(
+    stmt: Select,
+    *,
+    user_id: int,
+    exclude_archived: bool = True,
+    tag_ids: Optional[Sequence[int]] = None,
+    search_text: Optional[str] = None,
+) -> Select:
+    """Restrict a statement selecting from `ContentDB` to the user's contents that
+    match the filters.
+
+    The text search is a substring match, served by the trigram indexes of the
+    titles and texts.
+
+    Parameters
+    ----------
+    stmt
+        The statement to restrict.
+    user_id
+        The ID of the user whose contents are selected.
+    exclude_archived
+        Specifies whether to exclude archived content.
+    tag_ids
+        If specified, only contents with at least one of these tags are selected.
+    search_text
+        If specified, only contents whose title or text contains this text
+        (case-insensitively) are selected.
+
+    Returns
+    -------
+    Select
+        The restricted statement.
+    """
+
+    stmt = stmt.where(ContentDB.user_id == user_id)
+    if exclude_archived:
+        stmt = stmt.where(ContentDB.is_archived == false())
+    if tag_ids:
+        stmt = stmt.where(
+            exists().where(
+                content_tags_table.c.content_id == ContentDB.content_id,
+                content_tags_table.c.tag_id
+                == any_(cast(list(tag_ids), ARRAY(Integer))),
+            )
+        )
+    if search_text:
+        pattern = f"%{_escape_like(search_text)}%"
+        stmt = stmt.where(
+            or_(
+                ContentDB.content_title.ilike(pattern, escape="\\"),
+                ContentDB.content_text.ilike(pattern, escape="\\"),
+            )
+        )
+    return stmt
+
+
+def _escape_like(value: str) -> str:
+    """Escape the wildcards of a LIKE pattern, with backslashes."""
+
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def check_titles_and_texts_in_db(
+    *,
+    user_id: int,
+    titles: Sequence[str],
+    texts: Sequence[str],
+    asession: AsyncSession,
+) -> Tuple[bool, bool]:
+    """Check whether any of the titles, and any of the texts, are already those of
+    an unarchived content of the user.
+
+    Titles and texts are compared after stripping the surrounding whitespace of the
+    contents in the database. Both checks run in a single query, so no content is
+    transferred from the database.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user whose contents are checked.
+    titles
+        The (stripped) titles to look for.
+    texts
+        The (stripped) texts to look for.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    Tuple[bool, bool]
+        Whether any of the titles exists, and whether any of the texts exists.
+    """
+
+    stmt = select(
+        _stripped_value_exists(user_id, ContentDB.content_title, titles),
+        _stripped_value_exists(user_id, ContentDB.content_text, texts),
+    )
+    title_in_db, text_in_db = (await asession.execute(stmt)).one()
+    return title_in_db, text_in_db
+
+
+def _stripped_value_exists(
+    user_id: int, column: Mapped[str], values: Sequence[str]
+) -> Exists:
+    """Get the EXISTS clause of an unarchived content of the user whose stripped
+    column is one of the values.
+    """
+
+    return exists().where(
+        ContentDB.user_id == user_id,
+        ContentDB.is_archived == false(),
+        func.btrim(column, STRIPPED_CHARACTERS)
+        == any_(cast(list(values), ARRAY(Text))),
+    )
+
+
 async def _get_content_embeddings(
     content: ContentCreate | ContentUpdate,
     metadata: Optional[dict] = None,
@@ -419,8 +867,24 @@ async def _get_content_embeddings(
         The vectorized content embedding.
     """
 
-    text_to_embed = content.content_title + "\n" + content.content_text
-    return await embedding(text_to_embed, metadata=metadata)
+    return await embedding(_get_text_to_embed(content), metadata=metadata)
+
+
+def _get_text_to_embed(content: ContentCreate | ContentUpdate) -> str:
+    """Get the text to embed for the content.
+
+    Parameters
+    ----------
+    content
+        The content to vectorize.
+
+    Returns
+    -------
+    str
+        The text to embed.
+    """
+
+    return content.content_title + "\n" + content.content_text
 
 
 async def get_similar_content_async(
@@ -459,6 +923,15 @@ async def get_similar_content_async(
     metadata = metadata or {}
     metadata["generation_name"] = "get_similar_content_async"
 
+    if exclude_archived and HYBRID_SEARCH_ENABLED == "True":
+        return await get_hybrid_search_results(
+            user_id=user_id,
+            question=question,
+            n_similar=n_similar,
+            asession=asession,
+            metadata=metadata,
+        )
+
     question_embedding = await embedding(
         question,
         metadata=metadata,
@@ -505,14 +978,28 @@ async def get_search_results(
         dictionary
     """
 
+    if exclude_archived:
+        tenant = await get_indexed_tenant(user_id=user_id, asession=asession)
+        if tenant is not None:
+            return _convert_index_matches(tenant.search(question_embedding, n_similar))
+
     query = select(
         ContentDB,
         ContentDB.content_embedding.cosine_distance(question_embedding).label(
             "distance"
         ),
-    ).where(ContentDB.user_id == user_id)
+    )
     if exclude_archived:
-        query = query.where(ContentDB.is_archived == false())
+        # Render the user ID inline so that the planner can match the predicate of
+        # the user's partial HNSW index even with cached prepared statements
+        query = query.where(
+            ContentDB.user_id == bindparam("user_id", user_id, literal_execute=True)
+        ).where(ContentDB.is_archived == false())
+        await set_hnsw_ef_search(
+            user_id=user_id, n_similar=n_similar, asession=asession
+        )
+    else:
+        query = query.where(ContentDB.user_id == user_id)
     query = query.order_by(
         ContentDB.content_embedding.cosine_distance(question_embedding)
     ).limit(n_similar)
@@ -531,6 +1018,578 @@ async def get_search_results(
     return results_dict
 
 
+async def get_indexed_tenant(
+    *, user_id: int, asession: AsyncSession
+) -> Optional[TenantIndex]:
+    """Get the in-process index of the user's non-archived contents, loading it if
+    needed.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user whose contents are searched.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    Optional[TenantIndex]
+        The user's index, or `None` if the in-process index is disabled or the user
+        has too many contents for it.
+    """
+
+    if not is_vector_index_enabled():
+        return None
+
+    async def load(limit: int) -> List[ContentDB]:
+        rows = await asession.scalars(
+            select(ContentDB)
+            .where(ContentDB.user_id == user_id)
+            .where(ContentDB.is_archived == false())
+            .order_by(ContentDB.content_id)
+            .limit(limit)
+        )
+        return list(rows.all())
+
+    tenant = await get_vector_index().get_tenant(user_id, load)
+    return tenant if tenant.matrix is not None else None
+
+
+def _convert_index_matches(
+    matches: List[Tuple[int, str, str, float]]
+) -> Dict[int, QuerySearchResult]:
+    """Convert the matches of an in-process index search to search results."""
+
+    return {
+        i: QuerySearchResult(id=id_, title=title, text=text, distance=distance)
+        for i, (id_, title, text, distance) in enumerate(matches)
+    }
+
+
+async def get_similar_content_batch_async(
+    *,
+    user_id: int,
+    questions: List[str],
+    n_similar: int,
+    asession: AsyncSession,
+    metadata: Optional[dict] = None,
+) -> List[Dict[int, QuerySearchResult]]:
+    """Get the most similar non-archived contents for each of many questions.
+
+    The questions are embedded together (see `embedding_batch`) and searched for in
+    a single query (see `get_search_results_batch`). With hybrid search, the
+    full-text search still takes one query per question, and its results are
+    always fused with the vector results, since the embeddings are already paid for.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user requesting the similar content.
+    questions
+        The questions to search for similar content.
+    n_similar
+        The number of similar content items to retrieve per question.
+    asession
+        `AsyncSession` object for database transactions.
+    metadata
+        The metadata to use for the embedding generation
+
+    Returns
+    -------
+    List[Dict[int, QuerySearchResult]]
+        The similar content items of each question, in the same order.
+    """
+
+    metadata = metadata or {}
+    metadata["generation_name"] = "get_similar_content_batch_async"
+
+    question_embeddings = await embedding_batch(questions, metadata=metadata)
+
+    if HYBRID_SEARCH_ENABLED != "True":
+        return await get_search_results_batch(
+            user_id=user_id,
+            question_embeddings=question_embeddings,
+            n_similar=n_similar,
+            asession=asession,
+        )
+
+    n_candidates = max(n_similar, int(HYBRID_SEARCH_N_CANDIDATES))
+    vector_results = await get_search_results_batch(
+        user_id=user_id,
+        question_embeddings=question_embeddings,
+        n_similar=n_candidates,
+        asession=asession,
+    )
+    results = []
+    for question, question_embedding, question_vector_results in zip(
+        questions, question_embeddings, vector_results
+    ):
+        lexical_results = await get_lexical_search_results(
+            user_id=user_id,
+            question=question,
+            n_similar=n_candidates,
+            asession=asession,
+        )
+        results.append(
+            fuse_search_results(
+                question_embedding=question_embedding,
+                vector_results=question_vector_results,
+                lexical_results=lexical_results,
+                n_similar=n_similar,
+            )
+        )
+    return results
+
+
+async def get_search_results_batch(
+    *,
+    user_id: int,
+    question_embeddings: List[List[float]],
+    n_similar: int,
+    asession: AsyncSession,
+) -> List[Dict[int, QuerySearchResult]]:
+    """Get the non-archived contents most similar to each of the given embeddings.
+
+    All the embeddings are searched for in one round-trip: they are sent as an array
+    that is unnested and LATERAL-joined to the nearest-neighbour search, so each one
+    still uses the user's HNSW index. With the in-process index, they are scored with
+    a single matrix product instead.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user requesting the similar content.
+    question_embeddings
+        The embedding vectors of the questions to search for.
+    n_similar
+        The number of similar content items to retrieve per embedding.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    List[Dict[int, QuerySearchResult]]
+        The similar content items of each embedding, in the same order.
+    """
+
+    if not question_embeddings:
+        return []
+
+    tenant = await get_indexed_tenant(user_id=user_id, asession=asession)
+    if tenant is not None:
+        return [
+            _convert_index_matches(matches)
+            for matches in tenant.search_batch(question_embeddings, n_similar)
+        ]
+
+    vector_type = Vector(int(PGVECTOR_VECTOR_SIZE))
+    questions = (
+        func.unnest(
+            cast(
+                bindparam(
+                    "question_embeddings",
+                    [
+                        "[" + ",".join(map(str, embedding)) + "]"
+                        for embedding in question_embeddings
+                    ],
+                    type_=ARRAY(Text),
+                ),
+                ARRAY(vector_type),
+            )
+        )
+        .table_valued("embedding", with_ordinality="position")
+        .render_derived(name="questions")
+    )
+    distance = ContentDB.content_embedding.cosine_distance(questions.c.embedding)
+    matches = (
+        select(
+            ContentDB.content_id,
+            ContentDB.content_title,
+            ContentDB.content_text,
+            distance.label("distance"),
+        )
+        # See `get_search_results`
+        .where(ContentDB.user_id == bindparam("user_id", user_id, literal_execute=True))
+        .where(ContentDB.is_archived == false())
+        .order_by(distance)
+        .limit(n_similar)
+        .lateral("matches")
+    )
+    stmt = (
+        select(questions.c.position, matches)
+        .select_from(questions)
+        .join(matches, true())
+        .order_by(questions.c.position, matches.c.distance)
+    )
+
+    await set_hnsw_ef_search(user_id=user_id, n_similar=n_similar, asession=asession)
+    rows = (await asession.execute(stmt)).all()
+
+    results: List[Dict[int, QuerySearchResult]] = [{} for _ in question_embeddings]
+    for position, content_id, title, text_, distance_ in rows:
+        question_results = results[position - 1]
+        question_results[len(question_results)] = QuerySearchResult(
+            id=content_id, title=title, text=text_, distance=distance_
+        )
+    return results
+
+
+async def get_lexical_search_results(
+    *, user_id: int, question: str, n_similar: int, asession: AsyncSession
+) -> List[Tuple[ContentDB, float, bool]]:
+    """Get the non-archived contents matching any term of the question by
+    full-text search, best match first.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user requesting the similar content.
+    question
+        The question to search for similar content.
+    n_similar
+        The number of content items to retrieve.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    List[Tuple[ContentDB, float, bool]]
+        The matching contents, each with its rank normalized between 0 and 1 and
+        whether it contains every term of the question.
+    """
+
+    all_terms = func.plainto_tsquery(literal_column("'simple'"), question)
+    any_term = cast(func.replace(cast(all_terms, Text), "&", "|"), TSQUERY)
+    # normalization 32 scales the rank to rank / (rank + 1)
+    rank = func.ts_rank_cd(CONTENT_TSVECTOR, any_term, 32)
+    stmt = (
+        select(ContentDB, rank, CONTENT_TSVECTOR.bool_op("@@")(all_terms))
+        .where(ContentDB.user_id == user_id)
+        .where(ContentDB.is_archived == false())
+        .where(CONTENT_TSVECTOR.bool_op("@@")(any_term))
+        .order_by(rank.desc(), ContentDB.content_id)
+        .limit(n_similar)
+    )
+    rows = (await asession.execute(stmt)).all()
+    return [(r[0], float(r[1]), bool(r[2])) for r in rows]
+
+
+async def get_hybrid_search_results(
+    *,
+    user_id: int,
+    question: str,
+    n_similar: int,
+    asession: AsyncSession,
+    metadata: Optional[dict] = None,
+) -> Dict[int, QuerySearchResult]:
+    """Get the non-archived contents most relevant to the question by merging
+    full-text and vector search results with reciprocal-rank fusion.
+
+    The full-text search runs concurrently with the embedding call. If
+    `HYBRID_SEARCH_SKIP_EMBEDDING_MIN_RANK` is set, it runs first instead, and the
+    embedding call is skipped when its top match is confident enough. There is no
+    query embedding then, so the results have `distance_type` "lexical" and their
+    distance is 1 - their normalized rank, which is not on the cosine scale.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user requesting the similar content.
+    question
+        The question to search for similar content.
+    n_similar
+        The number of similar content items to retrieve.
+    asession
+        `AsyncSession` object for database transactions.
+    metadata
+        The metadata to use for the embedding generation
+
+    Returns
+    -------
+    Dict[int, QuerySearchResult]
+        A dictionary of similar content items if they exist, otherwise an empty
+        dictionary
+    """
+
+    n_candidates = max(n_similar, int(HYBRID_SEARCH_N_CANDIDATES))
+    lexical_search = get_lexical_search_results(
+        user_id=user_id, question=question, n_similar=n_candidates, asession=asession
+    )
+
+    if HYBRID_SEARCH_SKIP_EMBEDDING_MIN_RANK is not None:
+        lexical_results = await lexical_search
+        if (
+            lexical_results
+            and lexical_results[0][2]
+            and lexical_results[0][1] >= float(HYBRID_SEARCH_SKIP_EMBEDDING_MIN_RANK)
+        ):
+            return {
+                i: QuerySearchResult(
+                    id=content.content_id,
+                    title=content.content_title,
+                    text=content.content_text,
+                    distance=1.0 - rank,
+                    distance_type="lexical",
+                )
+                for i, (content, rank, _) in enumerate(lexical_results[:n_similar])
+            }
+        question_embedding = await embedding(question, metadata=metadata)
+    else:
+        lexical_results, question_embedding = await asyncio.gather(
+            lexical_search, embedding(question, metadata=metadata)
+        )
+
+    vector_results = await get_search_results(
+        user_id=user_id,
+        question_embedding=question_embedding,
+        n_similar=n_candidates,
+        asession=asession,
+    )
+    return fuse_search_results(
+        question_embedding=question_embedding,
+        vector_results=vector_results,
+        lexical_results=lexical_results,
+        n_similar=n_similar,
+    )
+
+
+def fuse_search_results(
+    *,
+    question_embedding: List[float],
+    vector_results: Dict[int, QuerySearchResult],
+    lexical_results: List[Tuple[ContentDB, float, bool]],
+    n_similar: int,
+) -> Dict[int, QuerySearchResult]:
+    """Merge the vector and full-text search results of a question with
+    reciprocal-rank fusion.
+
+    Parameters
+    ----------
+    question_embedding
+        The embedding vector of the question.
+    vector_results
+        The vector search results, closest first.
+    lexical_results
+        The full-text search results, best match first (see
+        `get_lexical_search_results`).
+    n_similar
+        The number of content items to return.
+
+    Returns
+    -------
+    Dict[int, QuerySearchResult]
+        The merged results, all with their cosine distance to the question.
+    """
+
+    results_by_id = {r.id: r for r in vector_results.values()}
+    question_vector = np.asarray(question_embedding, dtype=np.float32)
+    for content, _, _ in lexical_results:
+        if content.content_id not in results_by_id:
+            results_by_id[content.content_id] = QuerySearchResult(
+                id=content.content_id,
+                title=content.content_title,
+                text=content.content_text,
+                distance=_cosine_distance(question_vector, content.content_embedding),
+            )
+
+    fused_ids = reciprocal_rank_fusion(
+        [
+            [r.id for r in vector_results.values()],
+            [content.content_id for content, _, _ in lexical_results],
+        ],
+        k=int(HYBRID_SEARCH_RRF_K),
+    )
+    return {i: results_by_id[id_] for i, id_ in enumerate(fused_ids[:n_similar])}
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int) -> List[int]:
+    """Merge rankings of IDs by reciprocal-rank fusion: each ID scores the sum of
+    1 / (k + rank) over the rankings it appears in, with ranks starting at 1.
+
+    Parameters
+    ----------
+    rankings
+        The rankings to merge, best first.
+    k
+        The fusion constant. Larger values give less weight to the top ranks.
+
+    Returns
+    -------
+    List[int]
+        All the IDs, from highest to lowest score. Ties keep the order in which
+        the IDs were first seen.
+    """
+
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda id_: -scores[id_])
+
+
+def _cosine_distance(question_vector: np.ndarray, content_embedding: Vector) -> float:
+    """Get the cosine distance between a question and a content embedding."""
+
+    content_vector = np.asarray(content_embedding, dtype=np.float32)
+    norms = float(np.linalg.norm(question_vector) * np.linalg.norm(content_vector))
+    if norms == 0:
+        return 1.0
+    return 1.0 - float(question_vector @ content_vector) / norms
+
+
+async def set_hnsw_ef_search(
+    *, user_id: int, n_similar: int, asession: AsyncSession
+) -> None:
+    """Set `hnsw.ef_search` for the current transaction based on the number of
+    non-archived contents of the user.
+
+    The value is cached per user for `PGVECTOR_EF_SEARCH_CACHE_TTL_SECONDS`, so the
+    contents are only counted on a cache miss.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user whose contents are searched.
+    n_similar
+        The number of similar content items to retrieve.
+    asession
+        `AsyncSession` object for database transactions.
+    """
+
+    cached = _EF_SEARCH_CACHE.get(user_id)
+    if cached is not None and cached[0] > time.monotonic():
+        n_contents = cached[1]
+        _EF_SEARCH_CACHE.move_to_end(user_id)
+    else:
+        n_contents = await asession.scalar(
+            select(func.count())
+            .where(ContentDB.user_id == user_id)
+            .where(ContentDB.is_archived == false())
+        )
+        expires_at = time.monotonic() + int(PGVECTOR_EF_SEARCH_CACHE_TTL_SECONDS)
+        _EF_SEARCH_CACHE[user_id] = (expires_at, n_contents)
+        _EF_SEARCH_CACHE.move_to_end(user_id)
+        while len(_EF_SEARCH_CACHE) > EF_SEARCH_CACHE_MAX_SIZE:
+            _EF_SEARCH_CACHE.popitem(last=False)
+
+    ef_search = min(
+        max(
+            int(PGVECTOR_EF_SEARCH_MIN),
+            n_similar,
+            math.ceil(n_contents * float(PGVECTOR_EF_SEARCH_RATIO)),
+        ),
+        int(PGVECTOR_EF_SEARCH_MAX),
+    )
+    await asession.execute(
+        select(func.set_config("hnsw.ef_search", str(ef_search), true()))
+    )
+
+
+def get_user_content_index_name(user_id: int) -> str:
+    """Get the name of the partial HNSW index over the contents of a user.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user.
+
+    Returns
+    -------
+    str
+        The name of the index.
+    """
+
+    return f"content_embedding_user_{int(user_id)}_idx"
+
+
+def get_user_content_index_ddl(user_id: int) -> str:
+    """Get the DDL creating the partial HNSW index over the non-archived contents of
+    a user, if it doesn't exist.
+
+    A single HNSW index shared by all users returns neighbours from other users that
+    are then filtered out, so searches within a user get slower and can return fewer
+    than `k` results as the number of users grows.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user.
+
+    Returns
+    -------
+    str
+        The `CREATE INDEX` statement.
+    """
+
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+        f"{get_user_content_index_name(user_id)} "
+        f"ON content USING hnsw (content_embedding {PGVECTOR_DISTANCE}) "
+        f"WITH (m = {PGVECTOR_M}, ef_construction = {PGVECTOR_EF_CONSTRUCTION}) "
+        f"WHERE user_id = {int(user_id)} AND NOT is_archived"
+    )
+
+
+async def ensure_user_content_index(user_id: int) -> None:
+    """Create the partial HNSW index over the contents of a user if it doesn't exist.
+
+    Indexes of users who existed at migration time are created by the migration;
+    other users get theirs when they first save content. The index is built with
+    `CREATE INDEX CONCURRENTLY` on a connection of its own, so that writes to
+    `content` are not blocked while it is built. Since that can take a while, this
+    is meant to run off the request path, e.g. as a background task. An invalid
+    index left behind by a failed build is dropped and built again.
+
+    Workers build a user's index under an advisory lock, since an index that is
+    still being built is also invalid. If another worker holds the lock, this
+    returns and the index is checked again on the next save.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user.
+    """
+
+    if user_id in _USERS_WITH_CONTENT_INDEX or user_id in _USERS_BUILDING_INDEX:
+        return
+
+    index_name = get_user_content_index_name(user_id)
+    _USERS_BUILDING_INDEX.add(user_id)
+    try:
+        async with get_sqlalchemy_async_engine().connect() as connection:
+            connection = await connection.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+            lock_keys = (CONTENT_INDEX_LOCK_CLASS, int(user_id))
+            if not await connection.scalar(
+                select(func.pg_try_advisory_lock(*lock_keys))
+            ):
+                # another worker is building the index
+                return
+            try:
+                is_valid = await connection.scalar(
+                    text(
+                        "SELECT indisvalid FROM pg_index "
+                        "WHERE indexrelid = to_regclass(:index_name)"
+                    ),
+                    {"index_name": index_name},
+                )
+                if is_valid is False:
+                    await connection.execute(
+                        text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+                    )
+                if not is_valid:
+                    await connection.execute(text(get_user_content_index_ddl(user_id)))
+            finally:
+                await connection.scalar(select(func.pg_advisory_unlock(*lock_keys)))
+        _USERS_WITH_CONTENT_INDEX.add(user_id)
+    except SQLAlchemyError as e:
+        # retried on the next save
+        logger.warning(f"Could not create the content index of user {user_id}: {e}")
+    finally:
+        _USERS_BUILDING_INDEX.discard(user_id)
+
+
 async def update_votes_in_db(
     user_id: int,
     content_id: int,
@@ -556,18 +1615,23 @@ async def update_votes_in_db(
         The content object if it exists, otherwise `None`.
     """
 
-    content_db = await get_content_from_db(
-        user_id=user_id, content_id=content_id, asession=asession
-    )
-    if not content_db:
-        return None
-
     match vote:
         case FeedbackSentiment.POSITIVE:
-            content_db.positive_votes += 1
+            counter: ContentCounter = "positive_votes"
         case FeedbackSentiment.NEGATIVE:
-            content_db.negative_votes += 1
+            counter = "negative_votes"
+        case _:
+            return await get_content_from_db(
+                user_id=user_id, content_id=content_id, asession=asession
+            )
 
-    content_db = await asession.merge(content_db)
+    await increment_content_counters(
+        user_id=user_id,
+        content_ids=[content_id],
+        counter=counter,
+        asession=asession,
+    )
     await asession.commit()
-    return content_db
+    return await get_content_from_db(
+        user_id=user_id, content_id=content_id, asession=asession
+    )
@@ -1,30 +1,52 @@
 """This module contains the FastAPI router for the content management endpoints."""
 
-from typing import Annotated, List, Optional
+import base64
+from typing import Annotated, List, Optional, Sequence
 
 import pandas as pd
 import sqlalchemy.exc
-from fastapi import APIRouter, Depends, UploadFile, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
 from fastapi.exceptions import HTTPException
+from fastapi.requests import Request
 from pandas.errors import EmptyDataError, ParserError
 from pydantic import BaseModel
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.dependencies import get_current_user
+from ..catalog import bump_catalog_version, get_not_modified_response
 from ..config import CHECK_CONTENT_LIMIT
 from ..database import get_async_session
+from ..question_answer.cache import invalidate_search_cache
 from ..tags.models import TagDB, get_list_of_tag_from_db, save_tag_to_db, validate_tags
 from ..tags.schemas import TagCreate, TagRetrieve
 from ..users.models import UserDB, get_content_quota_by_userid
 from ..utils import setup_logger
+from .cache import (
+    cache_content_count,
+    get_cached_content_count,
+    get_filters_hash,
+    invalidate_content_counts,
+    is_content_count_cache_enabled,
+)
 from .models import (
     ContentDB,
     archive_content_from_db,
+    check_titles_and_texts_in_db,
+    count_contents_in_db,
     delete_content_from_db,
+    ensure_user_content_index,
     get_content_from_db,
     get_list_of_content_from_db,
     save_content_to_db,
+    save_contents_to_db,
     update_content_in_db,
 )
 from .schemas import (
@@ -33,6 +55,7 @@ from .schemas import (
     CustomError,
     CustomErrorList,
 )
+from .vector_index import get_vector_index, is_vector_index_enabled
 
 TAG_METADATA = {
     "name": "Content management",
@@ -64,6 +87,8 @@ class ExceedsContentQuotaError(Exception):
 async def create_content(
     content: ContentCreate,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
+    background_tasks: BackgroundTasks,
     asession: AsyncSession = Depends(get_async_session),
 ) -> Optional[ContentRetrieve]:
     """
@@ -102,6 +127,8 @@ async def create_content(
         exclude_archived=False,  # Don't exclude for newly saved content!
         asession=asession,
     )
+    background_tasks.add_task(ensure_user_content_index, user_db.user_id)
+    await _refresh_content_search(request, user_db.user_id, upserted=[content_db])
     return _convert_record_to_schema(content_db)
 
 
@@ -110,6 +137,7 @@ async def edit_content(
     content_id: int,
     content: ContentCreate,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
     exclude_archived: bool = True,
     asession: AsyncSession = Depends(get_async_session),
 ) -> ContentRetrieve:
@@ -146,6 +174,7 @@ async def edit_content(
         content=content,
         asession=asession,
     )
+    await _refresh_content_search(request, user_db.user_id, upserted=[updated_content])
 
     return _convert_record_to_schema(updated_content)
 
@@ -153,22 +182,56 @@ async def edit_content(
 @router.get("/", response_model=List[ContentRetrieve])
 async def retrieve_content(
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 50,
     exclude_archived: bool = True,
+    cursor: Optional[str] = None,
+    tags: Annotated[Optional[List[int]], Query()] = None,
+    search: Optional[str] = None,
     asession: AsyncSession = Depends(get_async_session),
-) -> List[ContentRetrieve]:
+) -> List[ContentRetrieve] | Response:
     """
-    Retrieve all contents
+    Retrieve all contents, ordered by ID.
+
+    Filter the contents with `tags` (contents with any of these tag IDs) and
+    `search` (contents whose title or text contains this text). The total number
+    of contents matching the filters is returned in the `X-Total-Count` header.
+
+    To get the next page, pass the `X-Next-Cursor` header of the response as
+    `cursor`. There is no such header on the last page.
+
+    Send the `ETag` of the response back in `If-None-Match` to get a 304 response
+    if the contents haven't changed.
     """
 
+    not_modified = await get_not_modified_response(request, response, user_db.user_id)
+    if not_modified is not None:
+        return not_modified
+    after_id = _decode_cursor(cursor) if cursor is not None else None
     records = await get_list_of_content_from_db(
         user_id=user_db.user_id,
         offset=skip,
         limit=limit,
         exclude_archived=exclude_archived,
+        after_id=after_id,
+        tag_ids=tags,
+        search_text=search,
+        asession=asession,
+    )
+    total = await _count_contents(
+        request=request,
+        user_id=user_db.user_id,
+        exclude_archived=exclude_archived,
+        tag_ids=tags,
+        search_text=search,
         asession=asession,
     )
+
+    response.headers["X-Total-Count"] = str(total)
+    if limit > 0 and len(records) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(records[-1].content_id)
     contents = [_convert_record_to_schema(c) for c in records]
     return contents
 
@@ -177,6 +240,7 @@ async def retrieve_content(
 async def archive_content(
     content_id: int,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
     asession: AsyncSession = Depends(get_async_session),
 ) -> None:
     """
@@ -199,12 +263,14 @@ async def archive_content(
         content_id=content_id,
         asession=asession,
     )
+    await _refresh_content_search(request, user_db.user_id, removed_ids=[content_id])
 
 
 @router.delete("/{content_id}")
 async def delete_content(
     content_id: int,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
     asession: AsyncSession = Depends(get_async_session),
 ) -> None:
     """
@@ -235,6 +301,7 @@ async def delete_content(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Deletion of content with feedback is not allowed.",
         ) from e
+    await _refresh_content_search(request, user_db.user_id, removed_ids=[content_id])
 
 
 @router.get("/{content_id}", response_model=ContentRetrieve)
@@ -268,6 +335,8 @@ async def retrieve_content_by_id(
 async def bulk_upload_contents(
     file: UploadFile,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
+    background_tasks: BackgroundTasks,
     exclude_archived: bool = True,
     asession: AsyncSession = Depends(get_async_session),
 ) -> BulkUploadResponse:
@@ -298,7 +367,7 @@ async def bulk_upload_contents(
     # Create each new tag in the database
     tags_col = "tags"
     created_tags: List[TagRetrieve] = []
-    tag_name_to_id_map: dict[str, int] = {}
+    tags_in_db: List[TagDB] = []
     skip_tags = tags_col not in df.columns or df[tags_col].isnull().all()
     if not skip_tags:
         incoming_tags = _extract_unique_tags(tags_col=df[tags_col])
@@ -321,36 +390,35 @@ async def bulk_upload_contents(
             tag_retrieve = _convert_tag_record_to_schema(tag_db)
             created_tags.append(tag_retrieve)
 
-        # tag name to tag id mapping
-        tag_name_to_id_map = {tag.tag_name: tag.tag_id for tag in tags_in_db}
-
-    # Add each row to the content database
-    created_contents = []
+    # Add all rows to the content database in one go
+    tag_name_to_tag_map = {tag.tag_name: tag for tag in tags_in_db}
+    contents = []
     for _, row in df.iterrows():
-        content_tags: List = []  # should be List[TagDB] but clashes with validate_tags
-        if tag_name_to_id_map and not pd.isna(row[tags_col]):
-            tag_names = [
+        content_tags: List[TagDB] = []
+        if tag_name_to_tag_map and not pd.isna(row[tags_col]):
+            tag_names = dict.fromkeys(
                 tag_name.strip().upper() for tag_name in row[tags_col].split(",")
-            ]
-            tag_ids = [tag_name_to_id_map[tag_name] for tag_name in tag_names]
-            _, content_tags = await validate_tags(user_db.user_id, tag_ids, asession)
-
-        content = ContentCreate(
-            content_title=row["title"],
-            content_text=row["text"],
-            content_tags=content_tags,
-            content_metadata={},
+            )
+            content_tags = [tag_name_to_tag_map[tag_name] for tag_name in tag_names]
+
+        contents.append(
+            ContentCreate(
+                content_title=row["title"],
+                content_text=row["text"],
+                content_tags=content_tags,
+                content_metadata={},
+            )
         )
 
-        content_db = await save_content_to_db(
-            user_id=user_db.user_id,
-            content=content,
-            exclude_archived=exclude_archived,
-            asession=asession,
-        )
-        content_retrieve = _convert_record_to_schema(content_db)
-        created_contents.append(content_retrieve)
+    contents_db = await save_contents_to_db(
+        user_id=user_db.user_id,
+        contents=contents,
+        asession=asession,
+    )
+    background_tasks.add_task(ensure_user_content_index, user_db.user_id)
+    created_contents = [_convert_record_to_schema(c) for c in contents_db]
 
+    await _refresh_content_search(request, user_db.user_id, upserted=contents_db)
     return BulkUploadResponse(tags=created_tags, contents=created_contents)
 
 
@@ -459,20 +527,21 @@ async def check_db_duplicates(
         The list of errors to append to.
     """
 
-    contents_in_db = await get_list_of_content_from_db(
-        user_id=user_id, offset=0, limit=None, asession=asession
+    title_in_db, text_in_db = await check_titles_and_texts_in_db(
+        user_id=user_id,
+        titles=[title for title in df["title"].unique() if isinstance(title, str)],
+        texts=[text for text in df["text"].unique() if isinstance(text, str)],
+        asession=asession,
     )
-    content_titles_in_db = {c.content_title.strip() for c in contents_in_db}
-    content_texts_in_db = {c.content_text.strip() for c in contents_in_db}
 
-    if df["title"].isin(content_titles_in_db).any():
+    if title_in_db:
         error_list.append(
             CustomError(
                 type="title_in_db",
                 description="One or more content titles already exist in the database.",
             )
         )
-    if df["text"].isin(content_texts_in_db).any():
+    if text_in_db:
         error_list.append(
             CustomError(
                 type="text_in_db",
@@ -670,11 +739,9 @@ async def _check_content_quota_availability(
     # if content_quota is None, then there is no limit
     if content_quota is not None:
         # get the number of contents this user has already added
-        stmt = select(ContentDB).where(
-            (ContentDB.user_id == user_id) & (~ContentDB.is_archived)
+        n_contents_in_db = await count_contents_in_db(
+            user_id=user_id, asession=asession
         )
-        user_active_contents = (await asession.execute(stmt)).all()
-        n_contents_in_db = len(user_active_contents)
 
         # error if total of existing and new contents exceeds the quota
         if (n_contents_in_db + n_contents_to_add) > content_quota:
@@ -743,6 +810,84 @@ def _get_tags_not_in_db(
     return tags_not_in_db_list
 
 
+def _encode_cursor(content_id: int) -> str:
+    """
+    Encode the ID of the last content of a page as the cursor of the next page
+    """
+    return base64.urlsafe_b64encode(str(content_id).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> int:
+    """
+    Decode a cursor into the ID of the last content of the previous page
+    """
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cursor: {cursor}",
+        ) from e
+
+
+async def _count_contents(
+    *,
+    request: Request,
+    user_id: int,
+    exclude_archived: bool,
+    tag_ids: Optional[List[int]],
+    search_text: Optional[str],
+    asession: AsyncSession,
+) -> int:
+    """
+    Count the user's contents matching the filters, using the cached count if
+    there is one
+    """
+    if not is_content_count_cache_enabled():
+        return await count_contents_in_db(
+            user_id=user_id,
+            exclude_archived=exclude_archived,
+            tag_ids=tag_ids,
+            search_text=search_text,
+            asession=asession,
+        )
+
+    redis = request.app.state.redis
+    filters_hash = get_filters_hash(
+        exclude_archived=exclude_archived, tag_ids=tag_ids, search_text=search_text
+    )
+    count = await get_cached_content_count(redis, user_id, filters_hash)
+    if count is None:
+        count = await count_contents_in_db(
+            user_id=user_id,
+            exclude_archived=exclude_archived,
+            tag_ids=tag_ids,
+            search_text=search_text,
+            asession=asession,
+        )
+        await cache_content_count(redis, user_id, filters_hash, count)
+    return count
+
+
+async def _refresh_content_search(
+    request: Request,
+    user_id: int,
+    upserted: Sequence[ContentDB] = (),
+    removed_ids: Sequence[int] = (),
+) -> None:
+    """
+    Bump the catalog version, invalidate cached search results and content counts,
+    and update the in-process vector index after the user's contents have changed
+    """
+    await bump_catalog_version(request.app.state.redis, user_id)
+    await invalidate_search_cache(request.app.state.redis, user_id)
+    await invalidate_content_counts(request.app.state.redis, user_id)
+    if is_vector_index_enabled():
+        await get_vector_index().update(
+            user_id, upserted=upserted, removed_ids=removed_ids
+        )
+
+
 def _convert_record_to_schema(record: ContentDB) -> ContentRetrieve:
     """Convert `models.ContentDB` models to `ContentRetrieve` schema.
 
@@ -0,0 +1,316 @@
+"""This module contains the optional in-process vector index used to search each
+user's contents without a round-trip to pgvector.
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from ..utils import setup_logger
+from .config import (
+    CONTENT_SEARCH_ENGINE,
+    NUMPY_INDEX_MAX_CONTENTS,
+    NUMPY_INDEX_MAX_MEMORY_MB,
+)
+
+logger = setup_logger()
+
+# A content row needs `content_id`, `content_title`, `content_text`,
+# `content_embedding` and `is_archived` (e.g. `ContentDB`)
+ContentRow = Any
+ContentLoader = Callable[[int], Awaitable[Sequence[ContentRow]]]
+
+
+@dataclass
+class TenantIndex:
+    """
+    Non-archived contents of one user, with their embeddings as the rows of a
+    contiguous, L2-normalized float32 matrix. `matrix` is `None` if the user has
+    too many contents to be indexed in memory.
+    """
+
+    version: int
+    content_ids: List[int] = field(default_factory=list)
+    titles: List[str] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+    matrix: Optional[np.ndarray] = None
+
+    def search(
+        self, question_embedding: List[float], n_similar: int
+    ) -> List[Tuple[int, str, str, float]]:
+        """
+        Get the (content ID, title, text, cosine distance) of the `n_similar`
+        contents closest to the question, closest first
+        """
+        return self.search_batch([question_embedding], n_similar)[0]
+
+    def search_batch(
+        self, question_embeddings: List[List[float]], n_similar: int
+    ) -> List[List[Tuple[int, str, str, float]]]:
+        """
+        Batch version of `search`, scoring all the questions with a single matrix
+        product
+        """
+        assert self.matrix is not None
+        k = min(n_similar, len(self.content_ids))
+        if k <= 0 or not question_embeddings:
+            return [[] for _ in question_embeddings]
+
+        questions = np.stack(
+            [_normalize(np.asarray(embedding)) for embedding in question_embeddings]
+        )
+        results = []
+        for scores in questions @ self.matrix.T:
+            top_k = np.argpartition(-scores, k - 1)[:k]
+            top_k = top_k[np.argsort(-scores[top_k], kind="stable")]
+            results.append(
+                [
+                    (
+                        self.content_ids[i],
+                        self.titles[i],
+                        self.texts[i],
+                        float(1.0 - scores[i]),
+                    )
+                    for i in top_k
+                ]
+            )
+        return results
+
+    def upsert(self, contents: Sequence[ContentRow]) -> None:
+        """
+        Add or replace contents; archived contents are removed instead
+        """
+        assert self.matrix is not None
+        positions = {content_id: i for i, content_id in enumerate(self.content_ids)}
+        self.remove([c.content_id for c in contents if c.is_archived])
+
+        new_rows = []
+        for content in contents:
+            if content.is_archived:
+                continue
+            row = _normalize(np.asarray(content.content_embedding))
+            i = positions.get(content.content_id)
+            if i is None:
+                self.content_ids.append(content.content_id)
+                self.titles.append(content.content_title)
+                self.texts.append(content.content_text)
+                new_rows.append(row)
+            else:
+                self.titles[i] = content.content_title
+                self.texts[i] = content.content_text
+                self.matrix[i] = row
+        if new_rows:
+            self.matrix = np.ascontiguousarray(np.vstack([self.matrix, *new_rows]))
+
+    def remove(self, content_ids: Sequence[int]) -> None:
+        """
+        Remove contents, if present
+        """
+        assert self.matrix is not None
+        to_remove = set(content_ids)
+        keep = [i for i, c in enumerate(self.content_ids) if c not in to_remove]
+        if len(keep) == len(self.content_ids):
+            return
+        self.content_ids = [self.content_ids[i] for i in keep]
+        self.titles = [self.titles[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.matrix = np.ascontiguousarray(self.matrix[keep])
+
+
+class InMemoryVectorIndex:
+    """
+    Per-user in-process vector indexes, loaded lazily from the database.
+
+    Each user's index is tagged with a version stored in Redis, which is
+    incremented on every change to their contents. The worker making the change
+    updates its index in place; other workers see a newer version on their next
+    search and reload from the database. Without Redis (e.g. outside the app),
+    changes are only applied locally.
+
+    Once the embedding matrices take more than `max_bytes`, the indexes of the least
+    recently searched users are dropped, to be reloaded if they search again.
+    """
+
+    def __init__(self, max_contents: int, max_bytes: int) -> None:
+        """
+        Initialize the index
+        """
+        self.max_contents = max_contents
+        self.max_bytes = max_bytes
+        self.redis: aioredis.Redis | None = None
+        self._tenants: OrderedDict[int, TenantIndex] = OrderedDict()
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    def set_redis(self, redis: aioredis.Redis | None) -> None:
+        """
+        Set (or unset) the Redis connection used for index versions
+        """
+        self.redis = redis
+
+    @staticmethod
+    def get_version_key(user_id: int) -> str:
+        """
+        Get the Redis key of the user's index version
+        """
+        return f"vector-index-version:{user_id}"
+
+    async def get_tenant(self, user_id: int, load: ContentLoader) -> TenantIndex:
+        """
+        Get the user's up-to-date index, loading it with `load` if needed.
+
+        `load(limit)` must return up to `limit` non-archived contents of the user.
+        """
+        version = await self._get_version(user_id)
+        tenant = self._tenants.get(user_id)
+        if tenant is not None and tenant.version == version:
+            self._tenants.move_to_end(user_id)
+            return tenant
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            tenant = self._tenants.get(user_id)
+            if tenant is not None and tenant.version == version:
+                return tenant
+            contents = await load(self.max_contents + 1)
+            tenant = TenantIndex(version=version)
+            if len(contents) <= self.max_contents:
+                tenant.matrix = np.empty((0, 0), dtype=np.float32)
+                if contents:
+                    tenant.matrix = np.empty(
+                        (0, len(contents[0].content_embedding)), dtype=np.float32
+                    )
+                    tenant.upsert(contents)
+            self._tenants[user_id] = tenant
+            self._tenants.move_to_end(user_id)
+            self._evict()
+            return tenant
+
+    async def update(
+        self,
+        user_id: int,
+        upserted: Sequence[ContentRow] = (),
+        removed_ids: Sequence[int] = (),
+    ) -> None:
+        """
+        Record a change to the user's contents, after it has been committed
+        """
+        new_version = await self._increment_version(user_id)
+        tenant = self._tenants.get(user_id)
+        if tenant is None:
+            return
+        if (
+            new_version is not None and tenant.version != new_version - 1
+        ) or tenant.matrix is None:
+            # missed another worker's change, or not indexed in memory: reload on
+            # next search
+            self._drop(user_id)
+            return
+
+        if removed_ids:
+            tenant.remove(removed_ids)
+        if upserted:
+            if tenant.matrix.shape[1] == 0:
+                tenant.matrix = np.empty(
+                    (0, len(upserted[0].content_embedding)), dtype=np.float32
+                )
+            tenant.upsert(upserted)
+        if new_version is not None:
+            tenant.version = new_version
+        if len(tenant.content_ids) > self.max_contents:
+            self._drop(user_id)
+        self._evict()
+
+    def clear(self) -> None:
+        """
+        Drop all the indexes
+        """
+        self._tenants.clear()
+        self._locks.clear()
+
+    def _drop(self, user_id: int) -> None:
+        """
+        Drop the user's index, and its lock unless a load holds it
+        """
+        self._tenants.pop(user_id, None)
+        lock = self._locks.get(user_id)
+        if lock is not None and not lock.locked():
+            del self._locks[user_id]
+
+    def _evict(self) -> None:
+        """
+        Drop the least recently searched indexes until the matrices fit in
+        `max_bytes`, keeping at least the most recent one
+        """
+        nbytes = sum(
+            tenant.matrix.nbytes
+            for tenant in self._tenants.values()
+            if tenant.matrix is not None
+        )
+        while nbytes > self.max_bytes and len(self._tenants) > 1:
+            user_id, tenant = next(iter(self._tenants.items()))
+            if tenant.matrix is not None:
+                nbytes -= tenant.matrix.nbytes
+            self._drop(user_id)
+
+    async def _get_version(self, user_id: int) -> int:
+        """
+        Get the current version of the user's index, 0 without Redis
+        """
+        if self.redis is None:
+            return 0
+        try:
+            version = await self.redis.get(self.get_version_key(user_id))
+        except RedisError as e:
+            logger.warning(f"Vector index version read failed: {e}")
+            # force a reload
+            return -1
+        return int(version or 0)
+
+    async def _increment_version(self, user_id: int) -> Optional[int]:
+        """
+        Increment the version of the user's index. Returns `None` without Redis.
+        """
+        if self.redis is None:
+            return None
+        try:
+            return await self.redis.incr(self.get_version_key(user_id))
+        except RedisError as e:
+            logger.warning(f"Vector index version update failed: {e}")
+            self._drop(user_id)
+            return None
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize a vector as float32, leaving zero vectors as they are
+    """
+    vector = vector.astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+_VECTOR_INDEX = InMemoryVectorIndex(
+    max_contents=int(NUMPY_INDEX_MAX_CONTENTS),
+    max_bytes=int(NUMPY_INDEX_MAX_MEMORY_MB) * 1024 * 1024,
+)
+
+
+def is_vector_index_enabled() -> bool:
+    """Whether contents are searched with the in-process index."""
+
+    return CONTENT_SEARCH_ENGINE == "numpy"
+
+
+def get_vector_index() -> InMemoryVectorIndex:
+    """Return the global in-process vector index.
+
+    :returns:
+        The global vector index.
+    """
+
+    return _VECTOR_INDEX
@@ -0,0 +1,90 @@
+"""This module contains the Redis-backed cache of the dashboard overviews.
+
+Entries are keyed on the user ID and the period of the overview (e.g. "week") and
+expire after `DASHBOARD_CACHE_TTL_SECONDS`, so the statistics are at most that old.
+"""
+
+from typing import Optional
+
+from pydantic import ValidationError
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from ..utils import setup_logger
+from .config import DASHBOARD_CACHE_TTL_SECONDS
+from .schemas import DashboardOverview
+
+logger = setup_logger()
+
+
+def is_dashboard_cache_enabled() -> bool:
+    """Whether dashboard overviews are cached."""
+
+    return int(DASHBOARD_CACHE_TTL_SECONDS) > 0
+
+
+def get_overview_key(user_id: int, period: str) -> str:
+    """Get the Redis key of the user's overview for the period."""
+
+    return f"dashboard-overview:{user_id}:{period}"
+
+
+async def get_cached_overview(
+    redis: aioredis.Redis, user_id: int, period: str
+) -> Optional[DashboardOverview]:
+    """Look up the user's cached overview for the period.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    user_id
+        The ID of the user.
+    period
+        The period of the overview.
+
+    Returns
+    -------
+    Optional[DashboardOverview]
+        The cached overview if there is one, otherwise `None`.
+    """
+
+    try:
+        cached = await redis.get(get_overview_key(user_id, period))
+    except RedisError as e:
+        logger.warning(f"Dashboard cache read failed: {e}")
+        return None
+    if cached is None:
+        return None
+    try:
+        return DashboardOverview.model_validate_json(cached)
+    except ValidationError:
+        # written by a different version of the schema
+        return None
+
+
+async def cache_overview(
+    redis: aioredis.Redis, user_id: int, period: str, overview: DashboardOverview
+) -> None:
+    """Cache the user's overview for the period.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    user_id
+        The ID of the user.
+    period
+        The period of the overview.
+    overview
+        The overview to cache.
+    """
+
+    try:
+        await redis.set(
+            get_overview_key(user_id, period),
+            overview.model_dump_json(),
+            ex=int(DASHBOARD_CACHE_TTL_SECONDS),
+        )
+    except RedisError as e:
+        logger.warning(f"Dashboard cache write failed: {e}")
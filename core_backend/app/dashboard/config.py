@@ -0,0 +1,26 @@
+import os
+
+# Hourly rollups of the dashboard statistics
+# If "True", a background job periodically aggregates the closed hours of raw
+# queries, feedback and urgency responses into per-user hourly rollups, and the
+# dashboard only reads raw rows for the hours that aren't rolled up yet
+DASHBOARD_ROLLUP_ENABLED = os.environ.get("DASHBOARD_ROLLUP_ENABLED", "True")
+DASHBOARD_ROLLUP_INTERVAL_SECONDS = os.environ.get(
+    "DASHBOARD_ROLLUP_INTERVAL_SECONDS", "300"
+)
+# Rolled up hours are recomputed for this many hours to pick up late writes
+DASHBOARD_ROLLUP_LOOKBACK_HOURS = os.environ.get("DASHBOARD_ROLLUP_LOOKBACK_HOURS", "2")
+# Max number of hours rolled up per transaction, e.g. while the existing history is
+# backfilled on the first run
+DASHBOARD_ROLLUP_CHUNK_HOURS = os.environ.get("DASHBOARD_ROLLUP_CHUNK_HOURS", "24")
+
+# Max number of sessions each worker uses at once for the dashboard queries, across
+# all requests, so that overviews can't take over the connection pool (DB_POOL_SIZE)
+DASHBOARD_MAX_CONCURRENT_SESSIONS = os.environ.get(
+    "DASHBOARD_MAX_CONCURRENT_SESSIONS", "8"
+)
+
+# Dashboard overview cache
+# Overviews are cached in Redis per user and period for this many seconds (0 to
+# disable), so that repeated refreshes of the same view don't rerun the queries
+DASHBOARD_CACHE_TTL_SECONDS = os.environ.get("DASHBOARD_CACHE_TTL_SECONDS", "60")
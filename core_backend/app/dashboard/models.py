@@ -1,19 +1,17 @@
 """This module contains functionalities for managing the dashboard statistics."""
 
-from datetime import date
-from typing import cast, get_args
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Awaitable, Callable, Optional, TypeVar, cast, get_args
 
-from sqlalchemy import case, func, literal_column, select, text, true
+from sqlalchemy import Select, func, literal_column, select, text, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.expression import Subquery
 
 from ..contents.models import ContentDB
-from ..question_answer.models import (
-    ContentFeedbackDB,
-    QueryDB,
-    ResponseFeedbackDB,
-)
-from ..urgency_detection.models import UrgencyResponseDB
+from ..database import get_sqlalchemy_async_engine
+from .config import DASHBOARD_MAX_CONCURRENT_SESSIONS
+from .rollups import get_hourly_counts, get_rolled_up_to
 from .schemas import (
     ContentFeedbackStats,
     Day,
@@ -28,12 +26,72 @@ from .schemas import (
     UrgencyStats,
 )
 
+T = TypeVar("T")
+
+SENTIMENTS = ("positive", "negative")
+# labels of the timeseries counts, mapped to the hourly counts they sum (see
+# `rollups.COUNT_COLUMNS`)
+QUERY_TIMESERIES_COUNTS = {
+    "escalated": "n_response_feedback_negative",
+    "not_escalated": "n_response_feedback_not_negative",
+}
+URGENCY_TIMESERIES_COUNTS = {"urgent": "n_urgent"}
+# the hourly counts summed by the stats cards
+STATS_CARDS_COUNTS = [
+    "n_queries",
+    "n_response_feedback_positive",
+    "n_response_feedback_negative",
+    "n_content_feedback_positive",
+    "n_content_feedback_negative",
+    "n_urgent",
+]
+
+# bounds the sessions opened by `run_in_new_session` across all requests
+_SESSION_SEMAPHORE = asyncio.Semaphore(int(DASHBOARD_MAX_CONCURRENT_SESSIONS))
+
 
 async def get_stats_cards(
     *, user_id: int, asession: AsyncSession, start_date: date, end_date: date
 ) -> StatsCards:
     """Retrieve statistics for question answering and upvotes.
 
+    Parameters
+    ----------
+    user_id
+        The ID of the user to retrieve the statistics for.
+    asession
+        `AsyncSession` object for database transactions.
+    start_date
+        The starting date (inclusive) for the statistics.
+    end_date
+        The ending date (exclusive) for the statistics.
+
+    Returns
+    -------
+    StatsCards
+        The statistics for question answering and upvotes.
+    """
+
+    return await query_stats_cards(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        rolled_up_to=await get_rolled_up_to(asession),
+    )
+
+
+async def query_stats_cards(
+    *,
+    user_id: int,
+    asession: AsyncSession,
+    start_date: date,
+    end_date: date,
+    rolled_up_to: Optional[datetime],
+) -> StatsCards:
+    """Retrieve statistics for question answering and upvotes, given the watermark
+    of the rollups. All the cards are computed with a single query.
+
     Parameters
     ----------
     user_id
@@ -44,6 +102,8 @@ async def get_stats_cards(
         The starting date for the statistics.
     end_date
         The ending date for the statistics.
+    rolled_up_to
+        The watermark of the rollups (see `rollups.get_rolled_up_to`).
 
     Returns
     -------
@@ -51,23 +111,54 @@ async def get_stats_cards(
         The statistics for question answering and upvotes.
     """
 
-    query_stats = await get_query_count_stats(user_id, asession, start_date, end_date)
-    response_feedback_stats = await get_response_feedback_stats(
-        user_id, asession, start_date, end_date
-    )
-    content_feedback_stats = await get_content_feedback_stats(
-        user_id, asession, start_date, end_date
+    curr_counts, prev_counts = await get_period_counts(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        names=STATS_CARDS_COUNTS,
+        rolled_up_to=rolled_up_to,
     )
-    urgency_stats = await get_urgency_stats(user_id, asession, start_date, end_date)
 
     return StatsCards(
-        query_stats=query_stats,
-        response_feedback_stats=response_feedback_stats,
-        content_feedback_stats=content_feedback_stats,
-        urgency_stats=urgency_stats,
+        query_stats=_get_query_stats(curr_counts, prev_counts),
+        response_feedback_stats=ResponseFeedbackStats.model_validate(
+            _get_feedback_stats(curr_counts, prev_counts, "n_response_feedback")
+        ),
+        content_feedback_stats=ContentFeedbackStats.model_validate(
+            _get_feedback_stats(curr_counts, prev_counts, "n_content_feedback")
+        ),
+        urgency_stats=_get_urgency_stats(curr_counts, prev_counts),
     )
 
 
+async def run_in_new_session(
+    query_function: Callable[..., Awaitable[T]], **kwargs: Any
+) -> T:
+    """Run a query function in a new session, so that it can run concurrently with
+    others (an `AsyncSession` can't be used concurrently). At most
+    `DASHBOARD_MAX_CONCURRENT_SESSIONS` run at once; the others wait.
+
+    Parameters
+    ----------
+    query_function
+        The function to run. It is passed the session as `asession`.
+    **kwargs
+        The other arguments of the function.
+
+    Returns
+    -------
+    T
+        The result of the function.
+    """
+
+    async with (
+        _SESSION_SEMAPHORE,
+        AsyncSession(get_sqlalchemy_async_engine(), expire_on_commit=False) as asession,
+    ):
+        return await query_function(asession=asession, **kwargs)
+
+
 async def get_heatmap(
     user_id: int, asession: AsyncSession, start_date: date, end_date: date
 ) -> Heatmap:
@@ -90,20 +181,57 @@ async def get_heatmap(
         The heatmap of queries per two hour blocks.
     """
 
-    statement = (
-        select(
-            func.to_char(QueryDB.query_datetime_utc, "Dy").label("day_of_week"),
-            func.to_char(QueryDB.query_datetime_utc, "HH24").label("hour_of_day"),
-            func.count(QueryDB.query_id).label("n_questions"),
-        )
-        .where(
-            (QueryDB.user_id == user_id)
-            & (QueryDB.query_datetime_utc >= start_date)
-            & (QueryDB.query_datetime_utc < end_date)
-        )
-        .group_by("day_of_week", "hour_of_day")
+    return await query_heatmap(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        rolled_up_to=await get_rolled_up_to(asession),
     )
 
+
+async def query_heatmap(
+    *,
+    user_id: int,
+    asession: AsyncSession,
+    start_date: date,
+    end_date: date,
+    rolled_up_to: Optional[datetime],
+) -> Heatmap:
+    """Retrieve queries per two hour blocks each weekday between start and end date,
+    given the watermark of the rollups.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user to retrieve the heatmap for.
+    asession
+        `AsyncSession` object for database transactions.
+    start_date
+        The starting date for the heatmap.
+    end_date
+        The ending date for the heatmap.
+    rolled_up_to
+        The watermark of the rollups (see `rollups.get_rolled_up_to`).
+
+    Returns
+    -------
+    Heatmap
+        The heatmap of queries per two hour blocks.
+    """
+
+    hourly_counts = get_hourly_counts(
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date,
+        rolled_up_to=rolled_up_to,
+    )
+    statement = select(
+        func.to_char(hourly_counts.c.hour_start, "Dy").label("day_of_week"),
+        func.to_char(hourly_counts.c.hour_start, "HH24").label("hour_of_day"),
+        func.sum(hourly_counts.c.n_queries).label("n_questions"),
+    ).group_by("day_of_week", "hour_of_day")
+
     result = await asession.execute(statement)
     rows = result.fetchall()  # (day of week, hour of day, n_questions)
 
@@ -111,7 +239,7 @@ async def get_heatmap(
     for row in rows:
         day_of_week = row.day_of_week
         hour_of_day = int(row.hour_of_day)
-        n_questions = row.n_questions
+        n_questions = int(row.n_questions)
         if int(hour_of_day) % 2 == 1:
             hour_grp = hour_of_day - 1
         else:
@@ -150,17 +278,63 @@ async def get_timeseries(
         The queries count timeseries.
     """
 
-    query_ts = await get_timeseries_query(
-        user_id, asession, start_date, end_date, frequency
+    return await query_timeseries(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        frequency=frequency,
+        rolled_up_to=await get_rolled_up_to(asession),
     )
-    urgency_ts = await get_timeseries_urgency(
-        user_id, asession, start_date, end_date, frequency
+
+
+async def query_timeseries(
+    *,
+    user_id: int,
+    asession: AsyncSession,
+    start_date: date,
+    end_date: date,
+    frequency: TimeFrequency,
+    rolled_up_to: Optional[datetime],
+) -> TimeSeries:
+    """Retrieve count of queries over time for the user, given the watermark of the
+    rollups. All the timeseries are computed with a single query.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user to retrieve the queries count timeseries for.
+    asession
+        `AsyncSession` object for database transactions.
+    start_date
+        The starting date for the queries count timeseries.
+    end_date
+        The ending date for the queries count timeseries.
+    frequency
+        The frequency at which to retrieve the queries count timeseries.
+    rolled_up_to
+        The watermark of the rollups (see `rollups.get_rolled_up_to`).
+
+    Returns
+    -------
+    TimeSeries
+        The queries count timeseries.
+    """
+
+    timeseries = await get_timeseries_counts(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        frequency=frequency,
+        counts={**QUERY_TIMESERIES_COUNTS, **URGENCY_TIMESERIES_COUNTS},
+        rolled_up_to=rolled_up_to,
     )
 
     return TimeSeries(
-        urgent=urgency_ts,
-        not_urgent_escalated=query_ts["escalated"],
-        not_urgent_not_escalated=query_ts["not_escalated"],
+        urgent=timeseries["urgent"],
+        not_urgent_escalated=timeseries["escalated"],
+        not_urgent_not_escalated=timeseries["not_escalated"],
     )
 
 
@@ -263,90 +437,281 @@ def get_time_labels_query(
     )
 
 
-async def get_timeseries_query(
+def get_timeseries_counts_query(
+    *,
     user_id: int,
-    asession: AsyncSession,
     start_date: date,
     end_date: date,
     frequency: TimeFrequency,
-) -> dict[str, dict[str, int]]:
-    """Retrieve the timeseries corresponding to escalated and not escalated queries
-    over the specified time period.
-
-    NB: The SQLAlchemy statement below selects time periods from `ts_labels` and counts
-    the number of negative and non-negative feedback entries from `ResponseFeedbackDB`
-    for each time period, after filtering for a specific user. It groups and orders the
-    results by time period. The outer join with `ResponseFeedbackDB` is based on the
-    truncation of dates to the specified interval (`interval_str`). This joins
-    `ResponseFeedbackDB` to `ts_labels` on matching truncated dates.
+    counts: dict[str, str],
+    rolled_up_to: Optional[datetime],
+) -> Select:
+    """Get the statement summing the user's hourly counts over each time period.
 
     Parameters
     ----------
     user_id
-        The ID of the user to retrieve the queries count timeseries query for.
-    asession
-        `AsyncSession` object for database transactions.
+        The ID of the user to retrieve the counts for.
     start_date
-        The starting date for the queries count timeseries query.
+        The starting date for the counts. The counts start at the beginning of the
+        time period that contains it.
     end_date
-        The ending date for the queries count timeseries query.
+        The ending date for the counts.
     frequency
-        The frequency at which to retrieve the queries count timeseries.
+        The frequency at which to retrieve the counts.
+    counts
+        The labels of the counts to retrieve, mapped to the names of the hourly
+        counts to sum (see `rollups.COUNT_COLUMNS`).
+    rolled_up_to
+        The watermark of the rollups (see `rollups.get_rolled_up_to`).
 
     Returns
     -------
-    dict[str, dict[str, int]]
-        Dictionary whose keys are "escalated" and "not_escalated" and whose values are
-        dictionaries containing the count of queries over time for each category.
+    Select
+        The statement, with a `time_period` column and one column per count label,
+        ordered by time period.
     """
 
     interval_str, ts_labels = get_time_labels_query(frequency, start_date, end_date)
+    hourly_counts = get_hourly_counts(
+        user_id=user_id,
+        start_date=truncate_datetime(start_date, interval_str),
+        end_date=end_date,
+        rolled_up_to=rolled_up_to,
+    )
+    time_period = func.date_trunc(interval_str, hourly_counts.c.hour_start)
+    period_counts = (
+        select(
+            time_period.label("time_period"),
+            *[
+                func.sum(hourly_counts.c[name]).label(label)
+                for label, name in counts.items()
+            ],
+        )
+        .group_by(time_period)
+        .subquery("period_counts")
+    )
 
-    statement = (
+    return (
         select(
             ts_labels.c.time_period,
-            func.coalesce(
-                func.count(
-                    case(
-                        (ResponseFeedbackDB.feedback_sentiment == "negative", 1),
-                        else_=None,
-                    )
-                ),
-                0,
-            ).label("negative_feedback_count"),
-            func.coalesce(
-                func.count(
-                    case(
-                        (ResponseFeedbackDB.feedback_sentiment != "negative", 1),
-                        else_=None,
-                    )
-                ),
-                0,
-            ).label("non_negative_feedback_count"),
+            *[
+                func.coalesce(period_counts.c[label], 0).label(label)
+                for label in counts
+            ],
         )
         .select_from(ts_labels)
         .outerjoin(
-            ResponseFeedbackDB,
-            func.date_trunc(interval_str, ResponseFeedbackDB.feedback_datetime_utc)
-            == func.date_trunc(interval_str, ts_labels.c.time_period),
+            period_counts, period_counts.c.time_period == ts_labels.c.time_period
         )
-        .where(ResponseFeedbackDB.query.has(user_id=user_id))
-        .group_by(ts_labels.c.time_period)
         .order_by(ts_labels.c.time_period)
     )
 
+
+async def get_timeseries_counts(
+    *,
+    user_id: int,
+    asession: AsyncSession,
+    start_date: date,
+    end_date: date,
+    frequency: TimeFrequency,
+    counts: dict[str, str],
+    rolled_up_to: Optional[datetime],
+) -> dict[str, dict[str, int]]:
+    """Get the timeseries of the user's counts (see `get_timeseries_counts_query`).
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user to retrieve the counts for.
+    asession
+        `AsyncSession` object for database transactions.
+    start_date
+        The starting date for the counts.
+    end_date
+        The ending date for the counts.
+    frequency
+        The frequency at which to retrieve the counts.
+    counts
+        The labels of the counts to retrieve, mapped to the names of the hourly
+        counts to sum (see `rollups.COUNT_COLUMNS`).
+    rolled_up_to
+        The watermark of the rollups (see `rollups.get_rolled_up_to`).
+
+    Returns
+    -------
+    dict[str, dict[str, int]]
+        The count of each label over time, keyed by the start of each time period.
+    """
+
+    statement = get_timeseries_counts_query(
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date,
+        frequency=frequency,
+        counts=counts,
+        rolled_up_to=rolled_up_to,
+    )
+
     result = await asession.execute(statement)
     rows = result.fetchall()
-    escalated = dict()
-    not_escalated = dict()
     format_str = "%Y-%m-%dT%H:%M:%S.000000Z"  # ISO 8601 format (required by frontend)
-    for row in rows:
-        escalated[row.time_period.strftime(format_str)] = row.negative_feedback_count
-        not_escalated[row.time_period.strftime(format_str)] = (
-            row.non_negative_feedback_count
+    return {
+        label: {
+            row.time_period.strftime(format_str): int(getattr(row, label))
+            for row in rows
+        }
+        for label in counts
+    }
+
+
+def truncate_datetime(dt: date, interval_str: str) -> datetime:
+    """Truncate a datetime to the start of the hour, day or week (like
+    `date_trunc` in Postgres).
+
+    Parameters
+    ----------
+    dt
+        The datetime to truncate.
+    interval_str
+        "hour", "day" or "week".
+
+    Returns
+    -------
+    datetime
+        The truncated datetime.
+    """
+
+    if not isinstance(dt, datetime):
+        dt = datetime.combine(dt, time.min, tzinfo=timezone.utc)
+    dt = dt.replace(minute=0, second=0, microsecond=0)
+    if interval_str in ("day", "week"):
+        dt = dt.replace(hour=0)
+    if interval_str == "week":
+        dt = dt - timedelta(days=dt.weekday())
+    return dt
+
+
+async def get_period_counts(
+    *,
+    user_id: int,
+    asession: AsyncSession,
+    start_date: date,
+    end_date: date,
+    names: list[str],
+    rolled_up_to: Optional[datetime],
+) -> tuple[dict[str, int], dict[str, int]]:
+    """Get the user's total counts over the current period and over the previous
+    one, with a single query. The current period is defined by `start_date` and
+    `end_date`. The previous period is defined as the same window in time before
+    the current period.
+
+    NB: Both periods include their start and exclude their end, like the hourly
+    rollups and the heatmap. Before the rollups, the stats cards excluded the start
+    and included the end instead.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user to retrieve the counts for.
+    asession
+        `AsyncSession` object for database transactions.
+    start_date
+        The start (inclusive) of the current period.
+    end_date
+        The end (exclusive) of the current period.
+    names
+        The names of the counts to retrieve (see `rollups.COUNT_COLUMNS`).
+    rolled_up_to
+        The watermark of the rollups (see `rollups.get_rolled_up_to`).
+
+    Returns
+    -------
+    tuple[dict[str, int], dict[str, int]]
+        The total of each count over the current and the previous period.
+    """
+
+    periods = {
+        "curr": (start_date, end_date),
+        "prev": (start_date - (end_date - start_date), start_date),
+    }
+    period_counts = []
+    for period, (period_start, period_end) in periods.items():
+        hourly_counts = get_hourly_counts(
+            user_id=user_id,
+            start_date=period_start,
+            end_date=period_end,
+            rolled_up_to=rolled_up_to,
+            name=f"{period}_hourly_counts",
+        )
+        period_counts.append(
+            select(
+                literal_column(f"'{period}'").label("period"),
+                *[hourly_counts.c[name] for name in names],
+            )
         )
+    all_counts = union_all(*period_counts).subquery("period_hourly_counts")
+    statement = select(
+        all_counts.c.period,
+        *[func.sum(all_counts.c[name]).label(name) for name in names],
+    ).group_by(all_counts.c.period)
+
+    rows = {row.period: row for row in (await asession.execute(statement)).all()}
+    totals = {
+        period: {
+            name: int(getattr(rows[period], name)) if period in rows else 0
+            for name in names
+        }
+        for period in periods
+    }
+    return totals["curr"], totals["prev"]
+
+
+async def get_timeseries_query(
+    user_id: int,
+    asession: AsyncSession,
+    start_date: date,
+    end_date: date,
+    frequency: TimeFrequency,
+) -> dict[str, dict[str, int]]:
+    """Retrieve the timeseries corresponding to escalated and not escalated queries
+    over the specified time period.
+
+    NB: The SQLAlchemy statement (see `get_timeseries_counts_query`) selects time
+    periods from `ts_labels` and sums the user's hourly counts of negative and
+    non-negative response feedback over each time period (the hourly counts are
+    truncated to the specified interval `interval_str`). Periods without feedback
+    have counts of 0.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user to retrieve the queries count timeseries query for.
+    asession
+        `AsyncSession` object for database transactions.
+    start_date
+        The starting date for the queries count timeseries query.
+    end_date
+        The ending date for the queries count timeseries query.
+    frequency
+        The frequency at which to retrieve the queries count timeseries.
 
-    return dict(escalated=escalated, not_escalated=not_escalated)
+    Returns
+    -------
+    dict[str, dict[str, int]]
+        Dictionary whose keys are "escalated" and "not_escalated" and whose values are
+        dictionaries containing the count of queries over time for each category.
+    """
+
+    return await get_timeseries_counts(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        frequency=frequency,
+        counts=QUERY_TIMESERIES_COUNTS,
+        rolled_up_to=await get_rolled_up_to(asession),
+    )
 
 
 async def get_timeseries_urgency(
@@ -359,13 +724,11 @@ async def get_timeseries_urgency(
     """Retrieve the timeseries corresponding to the count of urgent queries over time
     for the specified user.
 
-    NB: The SQLAlchemy statement below retrieves the count of urgent responses
-    (`n_urgent`) for each time_period from the `ts_labels` table, where the responses
-    are matched based on truncated dates, filtered by a specific user ID, and ordered
-    by the specified time period. The outer join with `UrgencyResponseDB` table is
-    based on matching truncated dates. The truncation is done using `func.date_trunc`
-    with `interval_str` (e.g., 'month', 'year', etc.), ensuring that dates are compared
-    at the same granularity.
+    NB: The SQLAlchemy statement (see `get_timeseries_counts_query`) sums the user's
+    hourly counts of urgent responses (`n_urgent`) over each time period from the
+    `ts_labels` table, ordered by time period. The hourly counts are matched to time
+    periods after truncation with `func.date_trunc` to `interval_str` (e.g., 'day',
+    'week', etc.).
 
     Parameters
     ----------
@@ -387,38 +750,16 @@ async def get_timeseries_urgency(
         Dictionary containing the count of urgent queries over time.
     """
 
-    interval_str, ts_labels = get_time_labels_query(frequency, start_date, end_date)
-
-    statement = (
-        select(
-            ts_labels.c.time_period,
-            func.coalesce(
-                func.count(
-                    case(
-                        (UrgencyResponseDB.is_urgent == true(), 1),
-                        else_=None,
-                    )
-                ),
-                0,
-            ).label("n_urgent"),
-        )
-        .select_from(ts_labels)
-        .outerjoin(
-            UrgencyResponseDB,
-            func.date_trunc(interval_str, UrgencyResponseDB.response_datetime_utc)
-            == func.date_trunc(interval_str, ts_labels.c.time_period),
-        )
-        .where(ResponseFeedbackDB.query.has(user_id=user_id))
-        .group_by(ts_labels.c.time_period)
-        .order_by(ts_labels.c.time_period)
+    urgency_ts = await get_timeseries_counts(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        frequency=frequency,
+        counts=URGENCY_TIMESERIES_COUNTS,
+        rolled_up_to=await get_rolled_up_to(asession),
     )
-
-    await asession.execute(statement)
-    result = await asession.execute(statement)
-    rows = result.fetchall()
-
-    format_str = "%Y-%m-%dT%H:%M:%S.000000Z"  # ISO 8601 format (required by frontend)
-    return {row.time_period.strftime(format_str): row.n_urgent for row in rows}
+    return urgency_ts["urgent"]
 
 
 def initialize_heatmap() -> dict[TimeHours, dict[Day, int]]:
@@ -461,52 +802,15 @@ async def get_query_count_stats(
         The statistics for question answering.
     """
 
-    # Total questions asked in this period
-    statement_combined = select(
-        func.sum(
-            case(
-                (
-                    (QueryDB.query_datetime_utc <= end_date)
-                    & (QueryDB.query_datetime_utc > start_date),
-                    1,
-                ),
-                else_=0,
-            )
-        ).label("current_period_count"),
-        func.sum(
-            case(
-                (
-                    (QueryDB.query_datetime_utc <= start_date)
-                    & (
-                        QueryDB.query_datetime_utc
-                        > start_date - (end_date - start_date)
-                    ),
-                    1,
-                ),
-                else_=0,
-            )
-        ).label("previous_period_count"),
-    ).where(QueryDB.user_id == user_id)
-
-    # Execute the combined statement
-    result = await asession.execute(statement_combined)
-    counts = result.fetchone()
-
-    n_questions_curr_period = (
-        counts.current_period_count if counts and counts.current_period_count else 0
-    )
-    n_questions_prev_period = (
-        counts.previous_period_count if counts and counts.previous_period_count else 0
-    )
-
-    # Percentage increase in questions asked
-    percent_increase = get_percentage_increase(
-        n_questions_curr_period, n_questions_prev_period
-    )
-
-    return QueryStats(
-        n_questions=n_questions_curr_period, percentage_increase=percent_increase
+    curr_counts, prev_counts = await get_period_counts(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        names=["n_queries"],
+        rolled_up_to=await get_rolled_up_to(asession),
     )
+    return _get_query_stats(curr_counts, prev_counts)
 
 
 async def get_response_feedback_stats(
@@ -538,55 +842,18 @@ async def get_response_feedback_stats(
         The statistics for response feedback.
     """
 
-    statement_combined = (
-        select(
-            ResponseFeedbackDB.feedback_sentiment,
-            func.sum(
-                case(
-                    (
-                        (ResponseFeedbackDB.feedback_datetime_utc <= end_date)
-                        & (ResponseFeedbackDB.feedback_datetime_utc > start_date),
-                        1,
-                    ),
-                    else_=0,
-                )
-            ).label("current_period_count"),
-            func.sum(
-                case(
-                    (
-                        (ResponseFeedbackDB.feedback_datetime_utc <= start_date)
-                        & (
-                            ResponseFeedbackDB.feedback_datetime_utc
-                            > start_date - (end_date - start_date)
-                        ),
-                        1,
-                    ),
-                    else_=0,
-                )
-            ).label("previous_period_count"),
-        )
-        .join(ResponseFeedbackDB.query)
-        .where(ResponseFeedbackDB.query.has(user_id=user_id))
-        .group_by(ResponseFeedbackDB.feedback_sentiment)
+    curr_counts, prev_counts = await get_period_counts(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        names=["n_response_feedback_positive", "n_response_feedback_negative"],
+        rolled_up_to=await get_rolled_up_to(asession),
     )
-
-    # Execute the combined statement
-    result = await asession.execute(statement_combined)
-    feedback_counts = result.fetchall()
-
-    feedback_curr_period_dict = {
-        row[0]: row[1] for row in feedback_counts if row[1] is not None
-    }
-    feedback_prev_period_dict = {
-        row[0]: row[2] for row in feedback_counts if row[2] is not None
-    }
-
-    feedback_stats = get_feedback_stats(
-        feedback_curr_period_dict, feedback_prev_period_dict
+    return ResponseFeedbackStats.model_validate(
+        _get_feedback_stats(curr_counts, prev_counts, "n_response_feedback")
     )
 
-    return ResponseFeedbackStats.model_validate(feedback_stats)
-
 
 async def get_content_feedback_stats(
     user_id: int, asession: AsyncSession, start_date: date, end_date: date
@@ -617,53 +884,18 @@ async def get_content_feedback_stats(
         The statistics for content feedback.
     """
 
-    statement_combined = (
-        select(
-            ContentFeedbackDB.feedback_sentiment,
-            func.sum(
-                case(
-                    (
-                        (ContentFeedbackDB.feedback_datetime_utc <= end_date)
-                        & (ContentFeedbackDB.feedback_datetime_utc > start_date),
-                        1,
-                    ),
-                    else_=0,
-                )
-            ).label("current_period_count"),
-            func.sum(
-                case(
-                    (
-                        (ContentFeedbackDB.feedback_datetime_utc <= start_date)
-                        & (
-                            ContentFeedbackDB.feedback_datetime_utc
-                            > start_date - (end_date - start_date)
-                        ),
-                        1,
-                    ),
-                    else_=0,
-                )
-            ).label("previous_period_count"),
-        )
-        .join(ContentFeedbackDB.content)
-        .where(ContentFeedbackDB.content.has(user_id=user_id))
-        .group_by(ContentFeedbackDB.feedback_sentiment)
+    curr_counts, prev_counts = await get_period_counts(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        names=["n_content_feedback_positive", "n_content_feedback_negative"],
+        rolled_up_to=await get_rolled_up_to(asession),
     )
-
-    result = await asession.execute(statement_combined)
-    feedback_counts = result.fetchall()
-
-    feedback_curr_period_dict = {
-        row[0]: row[1] for row in feedback_counts if row[1] is not None
-    }
-    feedback_prev_period_dict = {
-        row[0]: row[2] for row in feedback_counts if row[2] is not None
-    }
-    feedback_stats = get_feedback_stats(
-        feedback_curr_period_dict, feedback_prev_period_dict
+    return ContentFeedbackStats.model_validate(
+        _get_feedback_stats(curr_counts, prev_counts, "n_content_feedback")
     )
 
-    return ContentFeedbackStats.model_validate(feedback_stats)
-
 
 def get_feedback_stats(
     feedback_curr_period_dict: dict[str, int], feedback_prev_period_dict: dict[str, int]
@@ -731,56 +963,15 @@ async def get_urgency_stats(
         The statistics for urgency.
     """
 
-    statement_combined = (
-        select(
-            func.sum(
-                case(
-                    (
-                        (UrgencyResponseDB.response_datetime_utc <= end_date)
-                        & (UrgencyResponseDB.response_datetime_utc > start_date)
-                        & (UrgencyResponseDB.is_urgent == true()),
-                        1,
-                    ),
-                    else_=0,
-                )
-            ).label("current_period_count"),
-            func.sum(
-                case(
-                    (
-                        (UrgencyResponseDB.response_datetime_utc <= start_date)
-                        & (
-                            UrgencyResponseDB.response_datetime_utc
-                            > start_date - (end_date - start_date)
-                        )
-                        & (UrgencyResponseDB.is_urgent == true()),
-                        1,
-                    ),
-                    else_=0,
-                )
-            ).label("previous_period_count"),
-        )
-        .join(UrgencyResponseDB.query)
-        .where(UrgencyResponseDB.query.has(user_id=user_id))
-    )
-
-    # Execute the combined statement
-    result = await asession.execute(statement_combined)
-    counts = result.fetchone()
-
-    n_urgency_curr_period = (
-        counts.current_period_count if counts and counts.current_period_count else 0
-    )
-    n_urgency_prev_period = (
-        counts.previous_period_count if counts and counts.previous_period_count else 0
-    )
-
-    percentage_increase = get_percentage_increase(
-        n_urgency_curr_period, n_urgency_prev_period
-    )
-
-    return UrgencyStats(
-        n_urgent=n_urgency_curr_period, percentage_increase=percentage_increase
+    curr_counts, prev_counts = await get_period_counts(
+        user_id=user_id,
+        asession=asession,
+        start_date=start_date,
+        end_date=end_date,
+        names=["n_urgent"],
+        rolled_up_to=await get_rolled_up_to(asession),
     )
+    return _get_urgency_stats(curr_counts, prev_counts)
 
 
 def get_percentage_increase(n_curr: int, n_prev: int) -> float:
@@ -803,3 +994,42 @@ def get_percentage_increase(n_curr: int, n_prev: int) -> float:
         return 0.0
 
     return (n_curr - n_prev) / n_prev
+
+
+def _get_query_stats(
+    curr_counts: dict[str, int], prev_counts: dict[str, int]
+) -> QueryStats:
+    """Get the question answering statistics from the period counts."""
+
+    return QueryStats(
+        n_questions=curr_counts["n_queries"],
+        percentage_increase=get_percentage_increase(
+            curr_counts["n_queries"], prev_counts["n_queries"]
+        ),
+    )
+
+
+def _get_feedback_stats(
+    curr_counts: dict[str, int], prev_counts: dict[str, int], prefix: str
+) -> dict[str, int | float]:
+    """Get the feedback statistics from the period counts, for the counts starting
+    with `prefix` ("n_response_feedback" or "n_content_feedback").
+    """
+
+    return get_feedback_stats(
+        {sentiment: curr_counts[f"{prefix}_{sentiment}"] for sentiment in SENTIMENTS},
+        {sentiment: prev_counts[f"{prefix}_{sentiment}"] for sentiment in SENTIMENTS},
+    )
+
+
+def _get_urgency_stats(
+    curr_counts: dict[str, int], prev_counts: dict[str, int]
+) -> UrgencyStats:
+    """Get the urgency statistics from the period counts."""
+
+    return UrgencyStats(
+        n_urgent=curr_counts["n_urgent"],
+        percentage_increase=get_percentage_increase(
+            curr_counts["n_urgent"], prev_counts["n_urgent"]
+        ),
+    )
@@ -0,0 +1,485 @@
+"""This module contains the hourly rollups of the dashboard statistics and the
+background job maintaining them.
+
+Each rollup row holds the counts of one user's queries, response and content
+feedback, and urgency responses over one hour. The job periodically recomputes
+the hours since its last run (plus a lookback for late writes) up to the start of
+the current hour, and records that point as the watermark. Dashboard queries then
+read the rollups for the whole hours before the watermark and raw rows for the
+rest, i.e. the partial hours at both ends of the window.
+
+Hours are rolled up in chunks of `DASHBOARD_ROLLUP_CHUNK_HOURS`, one transaction
+each, and the watermark moves after each chunk. The first run backfills the whole
+history this way, from the earliest raw row.
+"""
+
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import (
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    Select,
+    case,
+    delete,
+    func,
+    insert,
+    literal_column,
+    or_,
+    select,
+    true,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql.expression import ColumnElement, Subquery
+
+from ..database import get_sqlalchemy_async_engine
+from ..models import Base
+from ..question_answer.models import ContentFeedbackDB, QueryDB, ResponseFeedbackDB
+from ..urgency_detection.models import UrgencyResponseDB
+from ..utils import setup_logger
+from .config import (
+    DASHBOARD_ROLLUP_CHUNK_HOURS,
+    DASHBOARD_ROLLUP_ENABLED,
+    DASHBOARD_ROLLUP_INTERVAL_SECONDS,
+    DASHBOARD_ROLLUP_LOOKBACK_HOURS,
+)
+
+logger = setup_logger()
+
+COUNT_COLUMNS = (
+    "n_queries",
+    "n_response_feedback_positive",
+    "n_response_feedback_negative",
+    "n_response_feedback_not_negative",
+    "n_content_feedback_positive",
+    "n_content_feedback_negative",
+    "n_urgency_responses",
+    "n_urgent",
+)
+
+# key of the transaction-level advisory lock held while rolling up, so that only
+# one worker does it at a time
+ROLLUP_LOCK_KEY = 7_264_215_021
+
+
+class DashboardHourlyRollupDB(Base):
+    """ORM for the hourly rollups of the dashboard statistics, per user."""
+
+    __tablename__ = "dashboard_hourly_rollup"
+
+    __table_args__ = (
+        # for the range of hours deleted by each refresh, across all users
+        Index("dashboard_hourly_rollup_hour_start_idx", "hour_start"),
+    )
+
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("user.user_id"), primary_key=True
+    )
+    hour_start: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
+    )
+    n_queries: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    n_response_feedback_positive: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+    n_response_feedback_negative: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+    n_response_feedback_not_negative: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+    n_content_feedback_positive: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+    n_content_feedback_negative: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0
+    )
+    n_urgency_responses: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    n_urgent: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class DashboardRollupStateDB(Base):
+    """ORM for the watermark of the dashboard rollups: all the hours before
+    `rolled_up_to` are rolled up. There is at most one row.
+    """
+
+    __tablename__ = "dashboard_rollup_state"
+
+    rollup_state_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    rolled_up_to: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+
+
+def get_raw_hourly_counts_query(
+    *, user_id: Optional[int], ranges: list[tuple[datetime, datetime]]
+) -> Select:
+    """Get the statement counting raw rows per user and hour.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user to count rows for, or `None` for all users.
+    ranges
+        The `[start, end)` time ranges of the rows to count.
+
+    Returns
+    -------
+    Select
+        The statement, with a `user_id` and an `hour_start` column and one column
+        per count in `COUNT_COLUMNS`.
+    """
+
+    def count_if(condition: ColumnElement) -> ColumnElement:
+        return func.count(case((condition, 1), else_=None))
+
+    sources = [
+        (QueryDB, QueryDB.query_datetime_utc, {"n_queries": func.count()}),
+        (
+            ResponseFeedbackDB,
+            ResponseFeedbackDB.feedback_datetime_utc,
+            {
+                "n_response_feedback_positive": count_if(
+                    ResponseFeedbackDB.feedback_sentiment == "positive"
+                ),
+                "n_response_feedback_negative": count_if(
+                    ResponseFeedbackDB.feedback_sentiment == "negative"
+                ),
+                "n_response_feedback_not_negative": count_if(
+                    ResponseFeedbackDB.feedback_sentiment != "negative"
+                ),
+            },
+        ),
+        (
+            ContentFeedbackDB,
+            ContentFeedbackDB.feedback_datetime_utc,
+            {
+                "n_content_feedback_positive": count_if(
+                    ContentFeedbackDB.feedback_sentiment == "positive"
+                ),
+                "n_content_feedback_negative": count_if(
+                    ContentFeedbackDB.feedback_sentiment == "negative"
+                ),
+            },
+        ),
+        (
+            UrgencyResponseDB,
+            UrgencyResponseDB.response_datetime_utc,
+            {
+                "n_urgency_responses": func.count(),
+                "n_urgent": count_if(UrgencyResponseDB.is_urgent == true()),
+            },
+        ),
+    ]
+
+    statements = []
+    for table, datetime_column, counts in sources:
+        hour_start = func.date_trunc("hour", datetime_column)
+        statement = (
+            select(
+                table.user_id.label("user_id"),
+                hour_start.label("hour_start"),
+                *[
+                    counts.get(name, literal_column("0")).label(name)
+                    for name in COUNT_COLUMNS
+                ],
+            )
+            .where(
+                or_(
+                    *[
+                        (datetime_column >= start) & (datetime_column < end)
+                        for start, end in ranges
+                    ]
+                )
+            )
+            .group_by(table.user_id, hour_start)
+        )
+        if user_id is not None:
+            statement = statement.where(table.user_id == user_id)
+        statements.append(statement)
+
+    counts_by_source = union_all(*statements).subquery("counts_by_source")
+    return select(
+        counts_by_source.c.user_id,
+        counts_by_source.c.hour_start,
+        *[func.sum(counts_by_source.c[name]).label(name) for name in COUNT_COLUMNS],
+    ).group_by(counts_by_source.c.user_id, counts_by_source.c.hour_start)
+
+
+def get_hourly_counts(
+    *,
+    user_id: int,
+    start_date: date,
+    end_date: date,
+    rolled_up_to: Optional[datetime],
+    name: str = "hourly_counts",
+) -> Subquery:
+    """Get the subquery of the user's counts per hour between the start and end
+    dates, from the rollups where possible and from raw rows otherwise.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user to get the counts for.
+    start_date
+        The start (inclusive) of the time window.
+    end_date
+        The end (exclusive) of the time window.
+    rolled_up_to
+        The watermark of the rollups (see `get_rolled_up_to`), or `None` to only
+        count raw rows.
+    name
+        The name of the subquery.
+
+    Returns
+    -------
+    Subquery
+        The subquery, with an `hour_start` column and one column per count in
+        `COUNT_COLUMNS`. An hour can appear more than once, so counts should be
+        summed.
+    """
+
+    start_date, end_date = _to_datetime(start_date), _to_datetime(end_date)
+    rollup_start = _ceil_hour(start_date)
+    rollup_end = min(rolled_up_to, end_date) if rolled_up_to else rollup_start
+
+    if rollup_start >= rollup_end:
+        return get_raw_hourly_counts_query(
+            user_id=user_id, ranges=[(start_date, end_date)]
+        ).subquery(name)
+
+    rollups = select(
+        DashboardHourlyRollupDB.user_id,
+        DashboardHourlyRollupDB.hour_start,
+        *[getattr(DashboardHourlyRollupDB, name) for name in COUNT_COLUMNS],
+    ).where(
+        (DashboardHourlyRollupDB.user_id == user_id)
+        & (DashboardHourlyRollupDB.hour_start >= rollup_start)
+        & (DashboardHourlyRollupDB.hour_start < rollup_end)
+    )
+    raw = get_raw_hourly_counts_query(
+        user_id=user_id,
+        ranges=[(start_date, rollup_start), (rollup_end, end_date)],
+    )
+    return union_all(rollups, raw).subquery(name)
+
+
+async def get_rolled_up_to(asession: AsyncSession) -> Optional[datetime]:
+    """Get the watermark of the rollups.
+
+    Parameters
+    ----------
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    Optional[datetime]
+        The time before which all hours are rolled up, or `None` if rollups are
+        disabled or haven't been computed yet.
+    """
+
+    if not is_dashboard_rollup_enabled():
+        return None
+    return await asession.scalar(select(DashboardRollupStateDB.rolled_up_to))
+
+
+async def refresh_dashboard_rollups(
+    asession: AsyncSession, now: Optional[datetime] = None
+) -> bool:
+    """Recompute the rollups of the hours since the watermark, minus the lookback,
+    up to the start of the current hour. On the first run, the hours since the
+    earliest raw row are computed.
+
+    The hours are computed in chunks of `DASHBOARD_ROLLUP_CHUNK_HOURS`, each in a
+    transaction of its own that moves the watermark to the end of the chunk.
+
+    Parameters
+    ----------
+    asession
+        `AsyncSession` object for database transactions.
+    now
+        The current time. Defaults to `datetime.now(timezone.utc)`.
+
+    Returns
+    -------
+    bool
+        Whether the rollups were refreshed up to the current hour, i.e. no other
+        worker was refreshing them.
+    """
+
+    rollup_end = _floor_hour(now or datetime.now(timezone.utc))
+    chunk_size = timedelta(hours=int(DASHBOARD_ROLLUP_CHUNK_HOURS))
+    is_first_chunk = True
+
+    while True:
+        locked = await asession.scalar(
+            select(func.pg_try_advisory_xact_lock(ROLLUP_LOCK_KEY))
+        )
+        if not locked:
+            await asession.rollback()
+            return False
+
+        rolled_up_to = await asession.scalar(
+            select(DashboardRollupStateDB.rolled_up_to)
+        )
+        if rolled_up_to is None:
+            earliest = await _get_earliest_raw_datetime(asession)
+            chunk_start = (
+                min(_floor_hour(earliest), rollup_end) if earliest else rollup_end
+            )
+        elif is_first_chunk:
+            chunk_start = min(rolled_up_to, rollup_end) - timedelta(
+                hours=int(DASHBOARD_ROLLUP_LOOKBACK_HOURS)
+            )
+        elif rolled_up_to >= rollup_end:
+            # another worker has finished the refresh in between the chunks
+            await asession.rollback()
+            return True
+        else:
+            chunk_start = rolled_up_to
+        chunk_end = min(chunk_start + chunk_size, rollup_end)
+
+        await asession.execute(
+            delete(DashboardHourlyRollupDB).where(
+                (DashboardHourlyRollupDB.hour_start >= chunk_start)
+                & (DashboardHourlyRollupDB.hour_start < chunk_end)
+            )
+        )
+        await asession.execute(
+            insert(DashboardHourlyRollupDB).from_select(
+                ["user_id", "hour_start", *COUNT_COLUMNS],
+                get_raw_hourly_counts_query(
+                    user_id=None, ranges=[(chunk_start, chunk_end)]
+                ),
+            )
+        )
+        upsert = pg_insert(DashboardRollupStateDB).values(
+            rollup_state_id=1, rolled_up_to=chunk_end
+        )
+        await asession.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[DashboardRollupStateDB.rollup_state_id],
+                set_={"rolled_up_to": upsert.excluded.rolled_up_to},
+            )
+        )
+        await asession.commit()
+
+        if chunk_end >= rollup_end:
+            return True
+        is_first_chunk = False
+
+
+async def _get_earliest_raw_datetime(asession: AsyncSession) -> Optional[datetime]:
+    """Get the time of the earliest raw row counted in the rollups, if any."""
+    datetime_columns = [
+        QueryDB.query_datetime_utc,
+        ResponseFeedbackDB.feedback_datetime_utc,
+        ContentFeedbackDB.feedback_datetime_utc,
+        UrgencyResponseDB.response_datetime_utc,
+    ]
+    return await asession.scalar(
+        select(
+            func.least(
+                *[
+                    select(func.min(column)).scalar_subquery()
+                    for column in datetime_columns
+                ]
+            )
+        )
+    )
+
+
+class DashboardRollupJob:
+    """
+    Periodically refreshes the dashboard rollups in the background.
+    """
+
+    def __init__(self, interval_seconds: float) -> None:
+        """
+        Initialize the job
+        """
+        self.interval_seconds = interval_seconds
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    def start(self) -> None:
+        """
+        Start refreshing the rollups periodically
+        """
+        if self._worker is None:
+            self._stopping = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop refreshing the rollups
+        """
+        if self._worker is None:
+            return
+        self._stopping.set()
+        await self._worker
+        self._worker = None
+
+    async def _run(self) -> None:
+        """
+        Refresh the rollups now and then every `interval_seconds` until stopped
+        """
+        while not self._stopping.is_set():
+            try:
+                async with AsyncSession(
+                    get_sqlalchemy_async_engine(), expire_on_commit=False
+                ) as asession:
+                    await refresh_dashboard_rollups(asession)
+            except SQLAlchemyError as e:
+                logger.error(f"Dashboard rollup refresh failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+def _to_datetime(dt: date) -> datetime:
+    """Convert a date to a datetime at midnight UTC, leaving datetimes as they are."""
+    if isinstance(dt, datetime):
+        return dt
+    return datetime.combine(dt, time.min, tzinfo=timezone.utc)
+
+
+def _floor_hour(dt: datetime) -> datetime:
+    """Truncate a datetime to the hour."""
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(dt: datetime) -> datetime:
+    """Round a datetime up to the hour."""
+    floor = _floor_hour(dt)
+    return floor if floor == dt else floor + timedelta(hours=1)
+
+
+_ROLLUP_JOB = DashboardRollupJob(
+    interval_seconds=float(DASHBOARD_ROLLUP_INTERVAL_SECONDS)
+)
+
+
+def is_dashboard_rollup_enabled() -> bool:
+    """Whether the dashboard statistics are read from hourly rollups."""
+
+    return DASHBOARD_ROLLUP_ENABLED == "True"
+
+
+def get_dashboard_rollup_job() -> DashboardRollupJob:
+    """Return the global dashboard rollup job.
+
+    :returns:
+        The global dashboard rollup job.
+    """
+
+    return _ROLLUP_JOB
@@ -1,17 +1,25 @@
 """This module contains the FastAPI router for the dashboard endpoints."""
 
+import asyncio
 from datetime import date, datetime, timedelta, timezone
 from typing import Annotated
 
 from dateutil.relativedelta import relativedelta
 from fastapi import APIRouter, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.requests import Request
 
 from ..auth.dependencies import get_current_user
-from ..database import get_async_session
 from ..users.models import UserDB
 from ..utils import setup_logger
-from .models import get_heatmap, get_stats_cards, get_timeseries, get_top_content
+from .cache import cache_overview, get_cached_overview, is_dashboard_cache_enabled
+from .models import (
+    get_top_content,
+    query_heatmap,
+    query_stats_cards,
+    query_timeseries,
+    run_in_new_session,
+)
+from .rollups import get_rolled_up_to
 from .schemas import DashboardOverview, TimeFrequency
 
 TAG_METADATA = {
@@ -26,7 +34,7 @@ logger = setup_logger()
 @router.get("/overview/day", response_model=DashboardOverview)
 async def retrieve_overview_day(
     user_db: Annotated[UserDB, Depends(get_current_user)],
-    asession: AsyncSession = Depends(get_async_session),
+    request: Request,
 ) -> DashboardOverview:
     """
     Retrieve all question answer statistics for the last day.
@@ -34,9 +42,10 @@ async def retrieve_overview_day(
     today = datetime.now(timezone.utc)
     day_ago = today - timedelta(days=1)
 
-    stats = await retrieve_overview(
+    stats = await retrieve_cached_overview(
+        request=request,
         user_id=user_db.user_id,
-        asession=asession,
+        period="day",
         start_date=day_ago,
         end_date=today,
         frequency=TimeFrequency.Hour,
@@ -48,7 +57,7 @@ async def retrieve_overview_day(
 @router.get("/overview/week", response_model=DashboardOverview)
 async def retrieve_overview_week(
     user_db: Annotated[UserDB, Depends(get_current_user)],
-    asession: AsyncSession = Depends(get_async_session),
+    request: Request,
 ) -> DashboardOverview:
     """
     Retrieve all question answer statistics for the last week.
@@ -56,9 +65,10 @@ async def retrieve_overview_week(
     today = datetime.now(timezone.utc)
     week_ago = today - timedelta(days=7)
 
-    stats = await retrieve_overview(
+    stats = await retrieve_cached_overview(
+        request=request,
         user_id=user_db.user_id,
-        asession=asession,
+        period="week",
         start_date=week_ago,
         end_date=today,
         frequency=TimeFrequency.Day,
@@ -70,7 +80,7 @@ async def retrieve_overview_week(
 @router.get("/overview/month", response_model=DashboardOverview)
 async def retrieve_overview_month(
     user_db: Annotated[UserDB, Depends(get_current_user)],
-    asession: AsyncSession = Depends(get_async_session),
+    request: Request,
 ) -> DashboardOverview:
     """
     Retrieve all question answer statistics for the last month.
@@ -78,9 +88,10 @@ async def retrieve_overview_month(
     today = datetime.now(timezone.utc)
     month_ago = today + relativedelta(months=-1)
 
-    stats = await retrieve_overview(
+    stats = await retrieve_cached_overview(
+        request=request,
         user_id=user_db.user_id,
-        asession=asession,
+        period="month",
         start_date=month_ago,
         end_date=today,
         frequency=TimeFrequency.Day,
@@ -92,7 +103,7 @@ async def retrieve_overview_month(
 @router.get("/overview/year", response_model=DashboardOverview)
 async def retrieve_overview_year(
     user_db: Annotated[UserDB, Depends(get_current_user)],
-    asession: AsyncSession = Depends(get_async_session),
+    request: Request,
 ) -> DashboardOverview:
     """
     Retrieve all question answer statistics for the last year.
@@ -100,9 +111,10 @@ async def retrieve_overview_year(
     today = datetime.now(timezone.utc)
     year_ago = today + relativedelta(years=-1)
 
-    stats = await retrieve_overview(
+    stats = await retrieve_cached_overview(
+        request=request,
         user_id=user_db.user_id,
-        asession=asession,
+        period="year",
         start_date=year_ago,
         end_date=today,
         frequency=TimeFrequency.Week,
@@ -111,30 +123,32 @@ async def retrieve_overview_year(
     return stats
 
 
-async def retrieve_overview(
+async def retrieve_cached_overview(
+    *,
+    request: Request,
     user_id: int,
-    asession: AsyncSession,
+    period: str,
     start_date: date,
     end_date: date,
     frequency: TimeFrequency,
-    top_n: int = 4,
 ) -> DashboardOverview:
-    """Retrieve all question answer statistics.
+    """Retrieve all question answer statistics for the period, from the cache if
+    they were retrieved recently.
 
     Parameters
     ----------
+    request
+        The request object.
     user_id
         The ID of the user to retrieve the statistics for.
-    asession
-        `AsyncSession` object for database transactions.
+    period
+        The name of the period, used as part of the cache key.
     start_date
         The starting date for the statistics.
     end_date
         The ending date for the statistics.
     frequency
         The frequency at which to retrieve the statistics.
-    top_n
-        The number of top content to retrieve.
 
     Returns
     -------
@@ -142,32 +156,68 @@ async def retrieve_overview(
         The dashboard overview statistics.
     """
 
-    stats = await get_stats_cards(
-        user_id=user_id,
-        asession=asession,
-        start_date=start_date,
-        end_date=end_date,
-    )
+    use_cache = is_dashboard_cache_enabled()
+    if use_cache:
+        overview = await get_cached_overview(request.app.state.redis, user_id, period)
+        if overview is not None:
+            return overview
 
-    heatmap = await get_heatmap(
+    overview = await retrieve_overview(
         user_id=user_id,
-        asession=asession,
         start_date=start_date,
         end_date=end_date,
+        frequency=frequency,
     )
 
-    time_series = await get_timeseries(
+    if use_cache:
+        await cache_overview(request.app.state.redis, user_id, period, overview)
+    return overview
+
+
+async def retrieve_overview(
+    user_id: int,
+    start_date: date,
+    end_date: date,
+    frequency: TimeFrequency,
+    top_n: int = 4,
+) -> DashboardOverview:
+    """Retrieve all question answer statistics.
+
+    The watermark of the rollups is read first. The stats cards, heatmap, time
+    series and top content are then queried concurrently, with one query each in
+    its own session (see `run_in_new_session`).
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user to retrieve the statistics for.
+    start_date
+        The starting date for the statistics.
+    end_date
+        The ending date for the statistics.
+    frequency
+        The frequency at which to retrieve the statistics.
+    top_n
+        The number of top content to retrieve.
+
+    Returns
+    -------
+    DashboardOverview
+        The dashboard overview statistics.
+    """
+
+    rolled_up_to = await run_in_new_session(get_rolled_up_to)
+    kwargs = dict(
         user_id=user_id,
-        asession=asession,
         start_date=start_date,
         end_date=end_date,
-        frequency=frequency,
+        rolled_up_to=rolled_up_to,
     )
-
-    top_content = await get_top_content(
-        user_id=user_id,
-        asession=asession,
-        top_n=top_n,
+    stats, heatmap, time_series, top_content = await asyncio.gather(
+        run_in_new_session(query_stats_cards, **kwargs),
+        run_in_new_session(query_heatmap, **kwargs),
+        run_in_new_session(query_timeseries, frequency=frequency, **kwargs),
+        run_in_new_session(get_top_content, user_id=user_id, top_n=top_n),
     )
 
     return DashboardOverview(
@@ -0,0 +1,355 @@
+"""This module contains the streaming exports of the data API.
+
+Rows are read from a server-side cursor in batches of `DATA_API_EXPORT_BATCH_SIZE`
+and each batch is serialized and sent before the next one is fetched, so memory use
+doesn't grow with the number of rows exported.
+
+Columnar (Arrow IPC and Parquet) exports have one column per field of the exported
+model, with nested models as structs, so that the columns stay in sync with the
+JSON exports. Each batch is written as one record batch / row group.
+"""
+
+import csv
+import io
+import json
+import types
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    List,
+    Sequence,
+    Type,
+    Union,
+    get_args,
+    get_origin,
+)
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import DATA_API_EXPORT_BATCH_SIZE
+from ..database import get_sqlalchemy_async_engine
+from .schemas import ExportFormat
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+COLUMNAR_EXPORT_FORMATS = (ExportFormat.ARROW, ExportFormat.PARQUET)
+
+
+async def stream_models(
+    statement: Select, convert: Callable[[Any], BaseModel]
+) -> AsyncGenerator[List[BaseModel], None]:
+    """Stream the rows selected by the statement in batches, converted to models.
+
+    The rows are read in a session of their own, since the request's session is
+    closed before a streaming response is sent. Eager loads of relationships must
+    use `selectinload`, which loads them per batch.
+
+    Parameters
+    ----------
+    statement
+        The statement selecting the ORM objects.
+    convert
+        The function converting an ORM object to a model.
+
+    Yields
+    ------
+    List[BaseModel]
+        The converted models of a batch of rows.
+    """
+
+    async with AsyncSession(
+        get_sqlalchemy_async_engine(), expire_on_commit=False
+    ) as asession:
+        result = await asession.stream_scalars(
+            statement.execution_options(yield_per=int(DATA_API_EXPORT_BATCH_SIZE))
+        )
+        async for partition in result.partitions():
+            yield [convert(row) for row in partition]
+            # don't keep the exported rows around in the identity map
+            asession.expunge_all()
+
+
+def to_ndjson(models: Sequence[BaseModel]) -> str:
+    """Serialize the models as newline-delimited JSON."""
+
+    return "".join(model.model_dump_json() + "\n" for model in models)
+
+
+def to_csv(rows: Sequence[Sequence[Any]]) -> str:
+    """Serialize the rows as CSV. Nested values are serialized as JSON."""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        [
+            json.dumps(value) if isinstance(value, (dict, list)) else value
+            for value in row
+        ]
+        for row in rows
+    )
+    return buffer.getvalue()
+
+
+async def stream_export(
+    statement: Select,
+    convert: Callable[[Any], BaseModel],
+    model_type: Type[BaseModel],
+    export_format: ExportFormat,
+) -> AsyncGenerator[str, None]:
+    """Stream the rows selected by the statement as NDJSON or CSV.
+
+    Parameters
+    ----------
+    statement
+        The statement selecting the ORM objects.
+    convert
+        The function converting an ORM object to a model.
+    model_type
+        The type of the models, whose fields are the CSV columns.
+    export_format
+        The format of the export, either NDJSON or CSV.
+
+    Yields
+    ------
+    str
+        The serialized rows of a batch.
+    """
+
+    columns = list(model_type.model_fields)
+    if export_format == ExportFormat.CSV:
+        yield to_csv([columns])
+
+    async for models in stream_models(statement, convert):
+        if export_format == ExportFormat.CSV:
+            yield to_csv(
+                [
+                    [dumped[column] for column in columns]
+                    for dumped in (model.model_dump(mode="json") for model in models)
+                ]
+            )
+        else:
+            yield to_ndjson(models)
+
+
+def get_arrow_type(annotation: Any) -> pa.DataType:
+    """Get the Arrow type of a model field annotation.
+
+    Dictionaries and untyped lists are free-form, so they are stored as JSON
+    strings.
+
+    Parameters
+    ----------
+    annotation
+        The type annotation of the field.
+
+    Returns
+    -------
+    pa.DataType
+        The Arrow type of the field.
+    """
+
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        # optional fields are nullable, which all Arrow fields are
+        (annotation,) = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return get_arrow_type(annotation)
+    if origin is list:
+        return pa.list_(get_arrow_type(get_args(annotation)[0]))
+    if origin is dict or annotation in (dict, list):
+        return pa.string()
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return pa.struct(get_arrow_schema(annotation))
+    if annotation is bool:
+        return pa.bool_()
+    if annotation is int:
+        return pa.int64()
+    if annotation is float:
+        return pa.float64()
+    if annotation is str:
+        return pa.string()
+    if annotation is datetime:
+        return pa.timestamp("us", tz="UTC")
+    raise TypeError(f"Fields of type {annotation} can't be exported to Arrow")
+
+
+def get_arrow_schema(model_type: Type[BaseModel]) -> pa.Schema:
+    """Get the Arrow schema of a model, with a column per field."""
+
+    return pa.schema(
+        [
+            pa.field(name, get_arrow_type(field.annotation))
+            for name, field in model_type.model_fields.items()
+        ]
+    )
+
+
+def to_arrow_value(value: Any, arrow_type: pa.DataType) -> Any:
+    """Convert a model, or a value of one of its fields, to its Arrow value.
+
+    Parameters
+    ----------
+    value
+        The model or value to convert.
+    arrow_type
+        The Arrow type of the value.
+
+    Returns
+    -------
+    Any
+        The value that `pyarrow` converts to the Arrow type.
+    """
+
+    if value is None:
+        return None
+    if pa.types.is_struct(arrow_type):
+        return {
+            field.name: to_arrow_value(getattr(value, field.name), field.type)
+            for field in arrow_type
+        }
+    if pa.types.is_list(arrow_type):
+        return [to_arrow_value(item, arrow_type.value_type) for item in value]
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+class ChunkedSink(io.RawIOBase):
+    """A file that keeps what is written to it until it is popped.
+
+    Arrow writers get their position from the file, so it is tracked separately
+    from the chunks that are still kept.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the sink."""
+
+        super().__init__()
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        """The sink is writable."""
+
+        return True
+
+    def write(self, data: Any) -> int:
+        """Keep the data written to the sink."""
+
+        chunk = bytes(data)
+        self.chunks.append(chunk)
+        self.position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        """Return the number of bytes written to the sink."""
+
+        return self.position
+
+    def pop(self) -> bytes:
+        """Return and forget the data written since the last pop."""
+
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+async def stream_columnar_export(
+    statement: Select,
+    convert: Callable[[Any], BaseModel],
+    model_type: Type[BaseModel],
+    export_format: ExportFormat,
+) -> AsyncGenerator[bytes, None]:
+    """Stream the rows selected by the statement as an Arrow IPC stream or a Parquet
+    file.
+
+    Parameters
+    ----------
+    statement
+        The statement selecting the ORM objects.
+    convert
+        The function converting an ORM object to a model.
+    model_type
+        The type of the models, whose fields are the columns.
+    export_format
+        The format of the export, either Arrow or Parquet.
+
+    Yields
+    ------
+    bytes
+        The serialized rows of a batch.
+    """
+
+    schema = get_arrow_schema(model_type)
+    row_type = pa.struct(schema)
+    sink = ChunkedSink()
+    writer = (
+        pq.ParquetWriter(sink, schema, compression="zstd")
+        if export_format == ExportFormat.PARQUET
+        else pa.ipc.new_stream(sink, schema)
+    )
+
+    async for models in stream_models(statement, convert):
+        writer.write_batch(
+            pa.RecordBatch.from_pylist(
+                [to_arrow_value(model, row_type) for model in models], schema=schema
+            )
+        )
+        yield sink.pop()
+
+    # the Parquet footer, or the end-of-stream marker of Arrow IPC
+    writer.close()
+    yield sink.pop()
+
+
+def get_export_response(
+    statement: Select,
+    convert: Callable[[Any], BaseModel],
+    model_type: Type[BaseModel],
+    export_format: ExportFormat,
+    filename: str,
+) -> StreamingResponse:
+    """Get a response streaming the rows selected by the statement as a file.
+
+    Parameters
+    ----------
+    statement
+        The statement selecting the ORM objects.
+    convert
+        The function converting an ORM object to a model.
+    model_type
+        The type of the models.
+    export_format
+        The format of the export.
+    filename
+        The name of the exported file, without extension.
+
+    Returns
+    -------
+    StreamingResponse
+        The streaming response.
+    """
+
+    return StreamingResponse(
+        (
+            stream_columnar_export(statement, convert, model_type, export_format)
+            if export_format in COLUMNAR_EXPORT_FORMATS
+            else stream_export(statement, convert, model_type, export_format)
+        ),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{filename}.{export_format.value}"'
+            )
+        },
+    )
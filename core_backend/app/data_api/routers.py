@@ -1,28 +1,40 @@
-from datetime import date, datetime, timezone
-from typing import Annotated, List
+from datetime import date, datetime, timedelta, timezone
+from typing import Annotated, Any, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload
 
 from ..auth.dependencies import authenticate_key
-from ..contents.models import ContentDB
+from ..catalog import get_not_modified_response
+from ..config import (
+    DATA_API_MAX_PAGE_SIZE,
+    DATA_API_SYNC_OVERLAP_SECONDS,
+    DATA_API_TOMBSTONE_RETENTION_DAYS,
+)
+from ..contents.models import CONTENT_WITHOUT_EMBEDDING, ContentDB
 from ..contents.schemas import ContentRetrieve
 from ..database import get_async_session
 from ..question_answer.models import QueryDB
+from ..tombstones import get_deleted_record_ids, get_tombstone_retention_start
 from ..urgency_detection.models import UrgencyQueryDB
 from ..urgency_rules.models import UrgencyRuleDB
 from ..urgency_rules.schemas import UrgencyRuleRetrieve
-from ..users.models import UserDB
+from ..users.schemas import UserIdentity
 from ..utils import setup_logger
+from .exports import get_export_response
 from .schemas import (
+    ContentChanges,
     ContentFeedbackExtract,
+    ExportFormat,
     QueryExtract,
     QueryResponseExtract,
     ResponseFeedbackExtract,
     UrgencyQueryExtract,
     UrgencyQueryResponseExtract,
+    UrgencyRuleChanges,
 )
 
 logger = setup_logger()
@@ -33,24 +45,75 @@ router = APIRouter(
     tags=["Data API"],
 )
 
+StartDate = Annotated[
+    datetime | date,
+    Query(
+        description=(
+            "Can be date or UTC datetime. "
+            "Example: `2021-01-01` or `2021-01-01T00:00:00`"
+        ),
+    ),
+]
+EndDate = StartDate
+AfterId = Annotated[
+    Optional[int],
+    Query(
+        description=(
+            "Only return records with a greater ID. Pass the ID of the last record "
+            "of the previous page to get the next page."
+        ),
+    ),
+]
+Limit = Annotated[
+    Optional[int],
+    Query(
+        ge=1,
+        le=int(DATA_API_MAX_PAGE_SIZE),
+        description="Max number of records to return. By default, all are returned.",
+    ),
+]
+ChangesSince = Annotated[
+    datetime,
+    Query(
+        description=(
+            "Only return the changes made after this UTC datetime or Unix timestamp. "
+            "Pass the `next_changes_since` of the previous sync to get the changes "
+            "made since. Changes may be returned by more than one sync, so they "
+            "should be applied idempotently. Deletions are only reported for "
+            "`DATA_API_TOMBSTONE_RETENTION_DAYS`: an earlier `changes_since` gets a "
+            "410 response, and all the records must be fetched again."
+        ),
+    ),
+]
+Format = Annotated[
+    ExportFormat, Query(alias="format", description="The format of the export.")
+]
+
 
 @router.get("/contents", response_model=List[ContentRetrieve])
 async def get_contents(
-    user_db: Annotated[UserDB, Depends(authenticate_key)],
+    user_db: Annotated[UserIdentity, Depends(authenticate_key)],
+    request: Request,
+    response: Response,
+    after_id: AfterId = None,
+    limit: Limit = None,
     asession: AsyncSession = Depends(get_async_session),
-) -> List[ContentRetrieve]:
+) -> List[ContentRetrieve] | Response:
     """
-    Get all contents for a user.
+    Get all contents for a user, ordered by ID.
+
+    Use `after_id` and `limit` to get the contents page by page. Send the `ETag` of
+    the response back in `If-None-Match` to get a 304 response if the contents
+    haven't changed.
     """
+    not_modified = await get_not_modified_response(request, response, user_db.user_id)
+    if not_modified is not None:
+        return not_modified
 
-    result = await asession.execute(
-        select(ContentDB)
-        .filter(ContentDB.user_id == user_db.user_id)
-        .options(
-            joinedload(ContentDB.content_tags),
-        )
+    statement = paginate(
+        get_contents_statement(user_db.user_id), ContentDB.content_id, after_id, limit
     )
-    contents = result.unique().scalars().all()
+    contents = (await asession.scalars(statement)).all()
     contents_responses = [
         convert_content_to_pydantic_model(content) for content in contents
     ]
@@ -58,6 +121,73 @@ async def get_contents(
     return contents_responses
 
 
+@router.get("/contents/export", response_class=StreamingResponse)
+async def export_contents(
+    user_db: Annotated[UserIdentity, Depends(authenticate_key)],
+    export_format: Format = ExportFormat.NDJSON,
+) -> StreamingResponse:
+    """
+    Stream all contents for a user as a NDJSON, CSV, Arrow IPC or Parquet file.
+    """
+
+    return get_export_response(
+        get_contents_statement(user_db.user_id),
+        convert_content_to_pydantic_model,
+        ContentRetrieve,
+        export_format,
+        filename="contents",
+    )
+
+
+@router.get("/contents/changes", response_model=ContentChanges)
+async def get_content_changes(
+    user_db: Annotated[UserIdentity, Depends(authenticate_key)],
+    changes_since: ChangesSince,
+    asession: AsyncSession = Depends(get_async_session),
+) -> ContentChanges:
+    """
+    Get the contents created, updated or archived, and the IDs of the contents
+    deleted, since `changes_since`.
+    """
+
+    changes_since, next_changes_since = get_sync_range(changes_since)
+    contents = (
+        await asession.scalars(
+            get_contents_statement(user_db.user_id).filter(
+                ContentDB.updated_datetime_utc > changes_since
+            )
+        )
+    ).all()
+    deleted_content_ids = await get_deleted_record_ids(
+        user_id=user_db.user_id,
+        record_type="content",
+        deleted_since=changes_since,
+        asession=asession,
+    )
+
+    return ContentChanges(
+        contents=[convert_content_to_pydantic_model(content) for content in contents],
+        deleted_content_ids=deleted_content_ids,
+        next_changes_since=next_changes_since,
+    )
+
+
+def get_contents_statement(user_id: int) -> Select:
+    """
+    Get the statement selecting all contents for a user, ordered by ID
+    """
+
+    return (
+        select(ContentDB)
+        .filter(ContentDB.user_id == user_id)
+        .options(
+            CONTENT_WITHOUT_EMBEDDING,
+            selectinload(ContentDB.content_tags),
+        )
+        .order_by(ContentDB.content_id)
+    )
+
+
 def convert_content_to_pydantic_model(content: ContentDB) -> ContentRetrieve:
     """
     Convert a ContentDB object to a ContentRetrieve object
@@ -80,12 +210,18 @@ def convert_content_to_pydantic_model(content: ContentDB) -> ContentRetrieve:
 
 @router.get("/urgency-rules", response_model=List[UrgencyRuleRetrieve])
 async def get_urgency_rules(
-    user_db: Annotated[UserDB, Depends(authenticate_key)],
+    user_db: Annotated[UserIdentity, Depends(authenticate_key)],
+    request: Request,
+    response: Response,
     asession: AsyncSession = Depends(get_async_session),
-) -> List[UrgencyRuleRetrieve]:
+) -> List[UrgencyRuleRetrieve] | Response:
     """
-    Get all urgency rules for a user.
+    Get all urgency rules for a user. Send the `ETag` of the response back in
+    `If-None-Match` to get a 304 response if the rules haven't changed.
     """
+    not_modified = await get_not_modified_response(request, response, user_db.user_id)
+    if not_modified is not None:
+        return not_modified
 
     result = await asession.execute(
         select(UrgencyRuleDB).filter(UrgencyRuleDB.user_id == user_db.user_id)
@@ -99,90 +235,199 @@ async def get_urgency_rules(
     return urgency_rules_responses
 
 
+@router.get("/urgency-rules/changes", response_model=UrgencyRuleChanges)
+async def get_urgency_rule_changes(
+    user_db: Annotated[UserIdentity, Depends(authenticate_key)],
+    changes_since: ChangesSince,
+    asession: AsyncSession = Depends(get_async_session),
+) -> UrgencyRuleChanges:
+    """
+    Get the urgency rules created or updated, and the IDs of the urgency rules
+    deleted, since `changes_since`.
+    """
+
+    changes_since, next_changes_since = get_sync_range(changes_since)
+    urgency_rules = (
+        await asession.scalars(
+            select(UrgencyRuleDB)
+            .filter(UrgencyRuleDB.user_id == user_db.user_id)
+            .filter(UrgencyRuleDB.updated_datetime_utc > changes_since)
+            .order_by(UrgencyRuleDB.urgency_rule_id)
+        )
+    ).all()
+    deleted_urgency_rule_ids = await get_deleted_record_ids(
+        user_id=user_db.user_id,
+        record_type="urgency_rule",
+        deleted_since=changes_since,
+        asession=asession,
+    )
+
+    return UrgencyRuleChanges(
+        urgency_rules=[
+            UrgencyRuleRetrieve.model_validate(urgency_rule)
+            for urgency_rule in urgency_rules
+        ],
+        deleted_urgency_rule_ids=deleted_urgency_rule_ids,
+        next_changes_since=next_changes_since,
+    )
+
+
 @router.get("/queries", response_model=List[QueryExtract])
 async def get_queries(
-    start_date: Annotated[
-        datetime | date,
-        Query(
-            description=(
-                "Can be date or UTC datetime. "
-                "Example: `2021-01-01` or `2021-01-01T00:00:00`"
-            ),
-        ),
-    ],
-    end_date: Annotated[
-        datetime | date,
-        Query(
-            description=(
-                "Can be date or UTC datetime. "
-                "Example: `2021-01-01` or `2021-01-01T00:00:00`"
-            ),
-        ),
-    ],
-    user_db: Annotated[UserDB, Depends(authenticate_key)],
+    start_date: StartDate,
+    end_date: EndDate,
+    user_db: Annotated[UserIdentity, Depends(authenticate_key)],
+    after_id: AfterId = None,
+    limit: Limit = None,
     asession: AsyncSession = Depends(get_async_session),
 ) -> List[QueryExtract]:
     """
-    Get all queries including child records for a user between a start and end date.
+    Get all queries including child records for a user between a start and end date,
+    ordered by ID.
 
     Note that the `start_date` and `end_date` can be provided as a date
-    or datetime object.
+    or datetime object. Use `after_id` and `limit` to get the queries page by page.
 
     """
-    if isinstance(start_date, date):
-        start_date = datetime.combine(start_date, datetime.min.time())
-    if isinstance(end_date, date):
-        end_date = datetime.combine(end_date, datetime.max.time())
 
-    start_date = start_date.replace(tzinfo=timezone.utc)
-    end_date = end_date.replace(tzinfo=timezone.utc)
+    statement = paginate(
+        get_queries_statement(user_db.user_id, start_date, end_date),
+        QueryDB.query_id,
+        after_id,
+        limit,
+    )
+    queries = (await asession.scalars(statement)).all()
+    queries_responses = [convert_query_to_pydantic_model(query) for query in queries]
 
-    result = await asession.execute(
+    return queries_responses
+
+
+@router.get("/queries/export", response_class=StreamingResponse)
+async def export_queries(
+    start_date: StartDate,
+    end_date: EndDate,
+    user_db: Annotated[UserIdentity, Depends(authenticate_key)],
+    export_format: Format = ExportFormat.NDJSON,
+) -> StreamingResponse:
+    """
+    Stream all queries including child records for a user between a start and end
+    date as a NDJSON, CSV, Arrow IPC or Parquet file. In CSV files, child records are
+    JSON-encoded, while in Arrow IPC and Parquet files they are lists of structs.
+    """
+
+    return get_export_response(
+        get_queries_statement(user_db.user_id, start_date, end_date),
+        convert_query_to_pydantic_model,
+        QueryExtract,
+        export_format,
+        filename="queries",
+    )
+
+
+def get_queries_statement(
+    user_id: int, start_date: datetime | date, end_date: datetime | date
+) -> Select:
+    """
+    Get the statement selecting all queries including child records for a user
+    between a start and end date, ordered by ID
+    """
+
+    start_date, end_date = get_datetime_range(start_date, end_date)
+
+    return (
         select(QueryDB)
         .filter(QueryDB.query_datetime_utc.between(start_date, end_date))
-        .filter(QueryDB.user_id == user_db.user_id)
+        .filter(QueryDB.user_id == user_id)
         .options(
-            joinedload(QueryDB.response_feedback),
-            joinedload(QueryDB.content_feedback),
-            joinedload(QueryDB.response),
+            selectinload(QueryDB.response_feedback),
+            selectinload(QueryDB.content_feedback),
+            selectinload(QueryDB.response),
         )
+        .order_by(QueryDB.query_id)
     )
-    queries = result.unique().scalars().all()
-    queries_responses = [convert_query_to_pydantic_model(query) for query in queries]
-
-    return queries_responses
 
 
 @router.get("/urgency-queries", response_model=List[UrgencyQueryExtract])
 async def get_urgency_queries(
-    start_date: Annotated[
-        datetime | date,
-        Query(
-            description=(
-                "Can be date or UTC datetime. "
-                "Example: `2021-01-01` or `2021-01-01T00:00:00`"
-            ),
-        ),
-    ],
-    end_date: Annotated[
-        datetime | date,
-        Query(
-            description=(
-                "Can be date or UTC datetime. "
-                "Example: `2021-01-01` or `2021-01-01T00:00:00`"
-            ),
-        ),
-    ],
-    user_db: Annotated[UserDB, Depends(authenticate_key)],
+    start_date: StartDate,
+    end_date: EndDate,
+    user_db: Annotated[UserIdentity, Depends(authenticate_key)],
+    after_id: AfterId = None,
+    limit: Limit = None,
     asession: AsyncSession = Depends(get_async_session),
 ) -> List[UrgencyQueryExtract]:
     """
     Get all urgency queries including child records for a user between
-    a start and end date.
+    a start and end date, ordered by ID.
 
     Note that the `start_date` and `end_date` can be provided as a date
-    or datetime object.
+    or datetime object. Use `after_id` and `limit` to get the urgency queries page
+    by page.
+
+    """
+
+    statement = paginate(
+        get_urgency_queries_statement(user_db.user_id, start_date, end_date),
+        UrgencyQueryDB.urgency_query_id,
+        after_id,
+        limit,
+    )
+    urgency_queries = (await asession.scalars(statement)).all()
+    urgency_queries_responses = [
+        convert_urgency_query_to_pydantic_model(query) for query in urgency_queries
+    ]
+
+    return urgency_queries_responses
 
+
+@router.get("/urgency-queries/export", response_class=StreamingResponse)
+async def export_urgency_queries(
+    start_date: StartDate,
+    end_date: EndDate,
+    user_db: Annotated[UserIdentity, Depends(authenticate_key)],
+    export_format: Format = ExportFormat.NDJSON,
+) -> StreamingResponse:
+    """
+    Stream all urgency queries including child records for a user between a start
+    and end date as a NDJSON, CSV, Arrow IPC or Parquet file. In CSV files, child
+    records are JSON-encoded, while in Arrow IPC and Parquet files they are structs.
+    """
+
+    return get_export_response(
+        get_urgency_queries_statement(user_db.user_id, start_date, end_date),
+        convert_urgency_query_to_pydantic_model,
+        UrgencyQueryExtract,
+        export_format,
+        filename="urgency-queries",
+    )
+
+
+def get_urgency_queries_statement(
+    user_id: int, start_date: datetime | date, end_date: datetime | date
+) -> Select:
+    """
+    Get the statement selecting all urgency queries including child records for a
+    user between a start and end date, ordered by ID
+    """
+
+    start_date, end_date = get_datetime_range(start_date, end_date)
+
+    return (
+        select(UrgencyQueryDB)
+        .filter(UrgencyQueryDB.message_datetime_utc.between(start_date, end_date))
+        .filter(UrgencyQueryDB.user_id == user_id)
+        .options(
+            selectinload(UrgencyQueryDB.response),
+        )
+        .order_by(UrgencyQueryDB.urgency_query_id)
+    )
+
+
+def get_datetime_range(
+    start_date: datetime | date, end_date: datetime | date
+) -> Tuple[datetime, datetime]:
+    """
+    Convert the start and end dates of a date filter to UTC datetimes
     """
 
     if isinstance(start_date, date):
@@ -193,20 +438,48 @@ async def get_urgency_queries(
     start_date = start_date.replace(tzinfo=timezone.utc)
     end_date = end_date.replace(tzinfo=timezone.utc)
 
-    result = await asession.execute(
-        select(UrgencyQueryDB)
-        .filter(UrgencyQueryDB.message_datetime_utc.between(start_date, end_date))
-        .filter(UrgencyQueryDB.user_id == user_db.user_id)
-        .options(
-            joinedload(UrgencyQueryDB.response),
+    return start_date, end_date
+
+
+def get_sync_range(changes_since: datetime) -> Tuple[datetime, datetime]:
+    """
+    Get the UTC start of the changes to return, and the `changes_since` of the next
+    sync, which overlaps the current one by `DATA_API_SYNC_OVERLAP_SECONDS`.
+
+    Raise a 410 error if deletions since `changes_since` may have been pruned.
+    """
+
+    if changes_since.tzinfo is None:
+        changes_since = changes_since.replace(tzinfo=timezone.utc)
+    if changes_since < get_tombstone_retention_start():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=(
+                "Deletions are only reported for the last "
+                f"{DATA_API_TOMBSTONE_RETENTION_DAYS} days. Fetch all the records "
+                "again, then sync changes from the time of that fetch."
+            ),
         )
+    next_changes_since = datetime.now(timezone.utc) - timedelta(
+        seconds=float(DATA_API_SYNC_OVERLAP_SECONDS)
     )
-    urgency_queries = result.unique().scalars().all()
-    urgency_queries_responses = [
-        convert_urgency_query_to_pydantic_model(query) for query in urgency_queries
-    ]
 
-    return urgency_queries_responses
+    return changes_since, max(changes_since, next_changes_since)
+
+
+def paginate(
+    statement: Select, id_column: Any, after_id: Optional[int], limit: Optional[int]
+) -> Select:
+    """
+    Restrict a statement ordered by `id_column` to a page of records, using keyset
+    pagination so that later pages are as fast to get as the first
+    """
+
+    if after_id is not None:
+        statement = statement.filter(id_column > after_id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
 
 
 def convert_urgency_query_to_pydantic_model(
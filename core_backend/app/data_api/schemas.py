@@ -1,8 +1,12 @@
 from datetime import datetime
+from enum import Enum
 from typing import Dict, List
 
 from pydantic import BaseModel, ConfigDict
 
+from ..contents.schemas import ContentRetrieve
+from ..urgency_rules.schemas import UrgencyRuleRetrieve
+
 
 class QueryResponseExtract(BaseModel):
     """
@@ -108,3 +112,34 @@ class UrgencyQueryExtract(BaseModel):
     message_text: str
     message_datetime_utc: datetime
     response: UrgencyQueryResponseExtract | None
+
+
+class ExportFormat(str, Enum):
+    """
+    Formats of the streaming data exports
+    """
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+    ARROW = "arrow"
+    PARQUET = "parquet"
+
+
+class ContentChanges(BaseModel):
+    """
+    Model for the changes to the contents since a given time
+    """
+
+    contents: List[ContentRetrieve]
+    deleted_content_ids: List[int]
+    next_changes_since: datetime
+
+
+class UrgencyRuleChanges(BaseModel):
+    """
+    Model for the changes to the urgency rules since a given time
+    """
+
+    urgency_rules: List[UrgencyRuleRetrieve]
+    deleted_urgency_rule_ids: List[int]
+    next_changes_since: datetime
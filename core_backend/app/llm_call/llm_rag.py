@@ -2,14 +2,16 @@
 Augmented Generation (RAG).
 """
 
-from typing import Optional
+import json
+import re
+from typing import AsyncIterator, Optional
 
 from pydantic import ValidationError
 
 from ..config import LITELLM_MODEL_GENERATION
 from ..utils import setup_logger
-from .llm_prompts import RAG, IdentifiedLanguage
-from .utils import _ask_llm_async, remove_json_markdown
+from .llm_prompts import RAG, RAG_FAILURE_MESSAGE, IdentifiedLanguage
+from .utils import _ask_llm_async, _ask_llm_stream_async, remove_json_markdown
 
 logger = setup_logger("RAG")
 
@@ -50,6 +52,149 @@ async def get_llm_rag_answer(
         json=True,
     )
 
+    return _parse_rag_output(result)
+
+
+def stream_llm_rag_answer(
+    question: str,
+    context: str,
+    original_language: IdentifiedLanguage,
+    metadata: Optional[dict] = None,
+) -> "RAGAnswerStream":
+    """Get a streamed answer from the LLM model using RAG.
+
+    Uses the same prompt as `get_llm_rag_answer`. Iterating over the returned
+    stream yields the "answer" field as it is generated; the full `RAG` response is
+    available as `.rag` once the stream is exhausted.
+
+    Parameters
+    ----------
+    question
+        The question to ask the LLM model.
+    context
+        The context to provide to the LLM model.
+    original_language
+        The language of the response.
+    metadata
+        Additional metadata to provide to the LLM model.
+
+    Returns
+    -------
+    RAGAnswerStream
+        The streamed response from the LLM model.
+    """
+
+    metadata = metadata or {}
+    prompt = RAG.prompt.format(context=context, original_language=original_language)
+
+    chunks = _ask_llm_stream_async(
+        user_message=question,
+        system_message=prompt,
+        litellm_model=LITELLM_MODEL_GENERATION,
+        metadata=metadata,
+        json=True,
+    )
+    return RAGAnswerStream(chunks)
+
+
+class RAGAnswerStream:
+    """
+    Extracts the "answer" field from a RAG JSON response while it is streamed.
+
+    Text is held back while it could still turn out to be `RAG_FAILURE_MESSAGE`, so
+    the failure message is never streamed. If the LLM does not produce the expected
+    JSON, nothing is streamed and the raw output becomes the answer, as in
+    `get_llm_rag_answer`.
+    """
+
+    ANSWER_START = re.compile(r'"answer"\s*:\s*"')
+
+    def __init__(self, chunks: AsyncIterator[str]) -> None:
+        """
+        Initialize the stream
+        """
+        self.chunks = chunks
+        self.rag: Optional[RAG] = None
+        self._raw = ""
+        self._answer_start: Optional[int] = None
+        self._answer_end: Optional[int] = None
+        self._pos = 0
+        self._answer = ""
+        self._n_yielded = 0
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        """
+        Yield the answer as it is generated
+        """
+        async for chunk in self.chunks:
+            self._raw += chunk
+            self._parse_answer()
+            if self._answer and not RAG_FAILURE_MESSAGE.startswith(self._answer):
+                if self._n_yielded < len(self._answer):
+                    yield self._answer[self._n_yielded :]
+                    self._n_yielded = len(self._answer)
+
+        self.rag = _parse_rag_output(self._raw)
+        answer = self.rag.answer
+        if answer != RAG_FAILURE_MESSAGE and answer.startswith(
+            self._answer[: self._n_yielded]
+        ):
+            if self._n_yielded < len(answer):
+                yield answer[self._n_yielded :]
+                self._n_yielded = len(answer)
+
+    def _parse_answer(self) -> None:
+        """
+        Decode as much of the (possibly incomplete) answer string as possible
+        """
+        if self._answer_end is not None:
+            return
+        if self._answer_start is None:
+            match = self.ANSWER_START.search(self._raw)
+            if match is None:
+                return
+            self._answer_start = self._pos = match.end()
+
+        while self._pos < len(self._raw):
+            char = self._raw[self._pos]
+            if char == '"':
+                self._answer_end = self._pos
+                return
+            if char != "\\":
+                self._answer += char
+                self._pos += 1
+                continue
+            # wait for the rest of an escape sequence before decoding it, including
+            # the low half of a UTF-16 surrogate pair
+            length = 2
+            if self._raw[self._pos + 1 : self._pos + 2] == "u":
+                high = self._raw[self._pos + 2 : self._pos + 4].lower()
+                length = 12 if high in ("d8", "d9", "da", "db") else 6
+            escape = self._raw[self._pos : self._pos + length]
+            if len(escape) < length:
+                return
+            try:
+                self._answer += json.loads(f'"{escape}"')
+            except json.JSONDecodeError:
+                self._answer += escape
+            self._pos += length
+
+
+def _parse_rag_output(result: str) -> RAG:
+    """Parse the RAG JSON output of the LLM model.
+
+    Parameters
+    ----------
+    result
+        The raw output of the LLM model.
+
+    Returns
+    -------
+    RAG
+        The parsed response. If the output is not valid JSON, it is used as the
+        answer as is.
+    """
+
     result = remove_json_markdown(result)
 
     try:
@@ -2,8 +2,9 @@
 These are functions that can be used to parse the input questions.
 """
 
+import asyncio
 from functools import wraps
-from typing import Any, Callable, Optional, Tuple
+from typing import Any, Awaitable, Callable, Optional, Tuple
 
 from ..config import (
     LITELLM_MODEL_LANGUAGE_DETECT,
@@ -446,3 +447,167 @@ async def _paraphrase_question(
             )
         )
         return query_refined, error_response
+
+
+def run_input_rails__before(func: Callable) -> Callable:
+    """
+    Decorator to run the input rails concurrently with the embeddings search.
+
+    This replaces chaining `identify_language__before`, `classify_safety__before`,
+    `translate_question__before` and `paraphrase_question__before`, which wait on
+    each LLM call in turn.
+    """
+
+    @wraps(func)
+    async def wrapper(
+        query_refined: QueryRefined,
+        response: QueryResponse | QueryResponseError,
+        *args: Any,
+        **kwargs: Any,
+    ) -> QueryResponse | QueryResponseError:
+        """
+        Wrapper function to run the input rails and the search.
+        """
+
+        async def search(
+            query_refined: QueryRefined,
+            response: QueryResponse | QueryResponseError,
+        ) -> QueryResponse | QueryResponseError:
+            return await func(query_refined, response, *args, **kwargs)
+
+        return await _run_input_rails(query_refined, response, search)
+
+    return wrapper
+
+
+async def _run_input_rails(
+    query_refined: QueryRefined,
+    response: QueryResponse | QueryResponseError,
+    search: Callable[
+        [QueryRefined, QueryResponse | QueryResponseError],
+        Awaitable[QueryResponse | QueryResponseError],
+    ],
+) -> QueryResponse | QueryResponseError:
+    """
+    Runs the input rails and the search with as much concurrency as the rails allow.
+
+    1. Language identification, safety classification and a speculative
+        paraphrase -> search chain are started at the same time. Each works on its
+        own copy of the query and response objects.
+    2. If any rail fails, the outstanding rails are cancelled and the search is run
+        on the current query text so that the error response still carries search
+        results.
+    3. If the question is in English, the speculative chain's result is used.
+        Otherwise the chain is discarded and translate -> paraphrase -> search is run
+        in order.
+
+    The speculative chain is only cancelled while it is paraphrasing. Once it has
+    started searching it is allowed to finish, since the search shares the database
+    session with any search that follows.
+
+    `query_refined` is updated in place so that the output rails see the refined
+    query.
+    """
+
+    if isinstance(response, QueryResponseError):
+        return await search(query_refined, response)
+
+    def _new_metadata() -> dict:
+        return create_langfuse_metadata(
+            query_id=response.query_id, user_id=query_refined.user_id
+        )
+
+    search_started = asyncio.Event()
+
+    async def _paraphrase_and_search(
+        query: QueryRefined, query_response: QueryResponse | QueryResponseError
+    ) -> Tuple[QueryRefined, QueryResponse | QueryResponseError]:
+        query, query_response = await _paraphrase_question(
+            query, query_response, metadata=_new_metadata()
+        )
+        search_started.set()
+        return query, await search(query, query_response)
+
+    language_task = asyncio.create_task(
+        _identify_language(*_copy_rail_inputs(query_refined, response), _new_metadata())
+    )
+    safety_task = asyncio.create_task(
+        _classify_safety(*_copy_rail_inputs(query_refined, response), _new_metadata())
+    )
+    speculative_task = asyncio.create_task(
+        _paraphrase_and_search(*_copy_rail_inputs(query_refined, response))
+    )
+    rail_tasks = [language_task, safety_task]
+
+    try:
+        pending = set(rail_tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            if any(isinstance(t.result()[1], QueryResponseError) for t in done):
+                break
+
+        # Merge the rails that have finished. The first error in rail order wins.
+        debug_info = dict(response.debug_info)
+        rail_error: QueryResponseError | None = None
+        for task in rail_tasks:
+            if not task.done():
+                continue
+            rail_query, rail_response = task.result()
+            debug_info.update(rail_response.debug_info)
+            if task is language_task:
+                query_refined.original_language = rail_query.original_language
+            if isinstance(rail_response, QueryResponseError) and rail_error is None:
+                rail_error = rail_response
+
+        if rail_error is not None:
+            await _discard_speculative_task(speculative_task, search_started)
+            rail_error.debug_info = debug_info
+            return await search(query_refined, rail_error)
+
+        if query_refined.original_language == IdentifiedLanguage.ENGLISH:
+            speculative_query, speculative_response = await speculative_task
+            query_refined.query_text = speculative_query.query_text
+            speculative_response.debug_info = {
+                **debug_info,
+                **speculative_response.debug_info,
+            }
+            return speculative_response
+
+        await _discard_speculative_task(speculative_task, search_started)
+        response.debug_info = debug_info
+        query_refined, response = await _translate_question(
+            query_refined, response, metadata=_new_metadata()
+        )
+        query_refined, response = await _paraphrase_question(
+            query_refined, response, metadata=_new_metadata()
+        )
+        return await search(query_refined, response)
+    finally:
+        for task in rail_tasks:
+            task.cancel()
+        await asyncio.gather(*rail_tasks, return_exceptions=True)
+        await _discard_speculative_task(speculative_task, search_started)
+
+
+async def _discard_speculative_task(
+    task: asyncio.Task, search_started: asyncio.Event
+) -> None:
+    """
+    Cancels the speculative paraphrase -> search chain if it hasn't started
+    searching yet and waits for it to finish either way.
+    """
+    if not search_started.is_set():
+        task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def _copy_rail_inputs(
+    query_refined: QueryRefined,
+    response: QueryResponse | QueryResponseError,
+) -> Tuple[QueryRefined, QueryResponse | QueryResponseError]:
+    """
+    Copies the query and response objects so concurrent rails don't share state.
+    """
+    return query_refined.model_copy(deep=True), response.model_copy(deep=True)
@@ -3,7 +3,7 @@ These are functions to check the LLM response
 """
 
 from functools import wraps
-from typing import Any, Callable, Optional, TypedDict
+from typing import Any, AsyncIterator, Callable, Optional, TypedDict
 
 import aiohttp
 from pydantic import ValidationError
@@ -23,8 +23,8 @@ from ..question_answer.schemas import (
 from ..question_answer.utils import get_context_string_from_search_results
 from ..utils import create_langfuse_metadata, get_http_client, setup_logger
 from ..voice_api.voice_components import generate_speech
-from .llm_prompts import RAG_FAILURE_MESSAGE, AlignmentScore
-from .llm_rag import get_llm_rag_answer
+from .llm_prompts import RAG, RAG_FAILURE_MESSAGE, AlignmentScore, IdentifiedLanguage
+from .llm_rag import get_llm_rag_answer, stream_llm_rag_answer
 from .utils import (
     _ask_llm_async,
     remove_json_markdown,
@@ -103,6 +103,66 @@ async def _generate_llm_response(
         original_language=query_refined.original_language,
         metadata=metadata,
     )
+    return await _apply_rag_response(
+        query_refined, response, rag_response, query_refined.original_language
+    )
+
+
+async def stream_llm_response(
+    query_refined: QueryRefined,
+    response: QueryResponse | QueryResponseError,
+    metadata: Optional[dict] = None,
+) -> AsyncIterator[str | QueryResponse | QueryResponseError]:
+    """
+    Streaming version of `_generate_llm_response` followed by `_check_align_score`.
+
+    Yields the LLM answer as it is generated, then the final response (including
+    the alignment score check) as the last item. If there is nothing to generate,
+    only the response is yielded.
+    """
+    if (
+        isinstance(response, QueryResponseError)
+        or response.search_results is None
+        or query_refined.original_language is None
+    ):
+        yield response
+        return
+
+    context = get_context_string_from_search_results(response.search_results)
+    rag_stream = stream_llm_rag_answer(
+        # use the original query text
+        question=query_refined.query_text_original,
+        context=context,
+        original_language=query_refined.original_language,
+        metadata=metadata,
+    )
+    async for token in rag_stream:
+        yield token
+
+    rag_response = rag_stream.rag
+    if rag_response is None:
+        logger.warning("The RAG stream ended without a parsed answer.")
+        rag_response = RAG(extracted_info=[], answer=RAG_FAILURE_MESSAGE)
+    response = await _apply_rag_response(
+        query_refined, response, rag_response, query_refined.original_language
+    )
+    response = await _check_align_score(response, metadata)
+    yield response
+
+
+async def _apply_rag_response(
+    query_refined: QueryRefined,
+    response: QueryResponse,
+    rag_response: RAG,
+    original_language: IdentifiedLanguage,
+) -> QueryResponse | QueryResponseError:
+    """
+    Add the RAG answer (and speech, if requested) to the response, or turn it into
+    an error if the LLM failed to answer.
+
+    `original_language` is the query's identified language, which callers have
+    already checked is set.
+    """
     tts_save_path = f"response_{response.query_id}.mp3"
 
     if rag_response.answer != RAG_FAILURE_MESSAGE:
@@ -113,7 +173,7 @@ async def _generate_llm_response(
             try:
                 tts_file_path = await generate_speech(
                     text=rag_response.answer,
-                    language=query_refined.original_language,
+                    language=original_language,
                     save_path=tts_save_path,
                 )
                 response.tts_file = tts_file_path
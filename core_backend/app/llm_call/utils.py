@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from litellm import acompletion
 
@@ -52,6 +52,56 @@ async def _ask_llm_async(
     return llm_response_raw.choices[0].message.content
 
 
+async def _ask_llm_stream_async(
+    user_message: str,
+    system_message: str,
+    litellm_model: Optional[str] = LITELLM_MODEL_DEFAULT,
+    litellm_endpoint: Optional[str] = LITELLM_ENDPOINT,
+    metadata: Optional[dict] = None,
+    json: bool = False,
+) -> AsyncIterator[str]:
+    """
+    Streaming version of `_ask_llm_async`. Yields the content of the LLM response
+    as it is generated.
+    """
+    if metadata is not None:
+        metadata["generation_name"] = litellm_model
+
+    extra_kwargs = {}
+    if json:
+        extra_kwargs["response_format"] = {"type": "json_object"}
+
+    messages = [
+        {
+            "content": system_message,
+            "role": "system",
+        },
+        {
+            "content": user_message,
+            "role": "user",
+        },
+    ]
+    logger.info(
+        f"LLM streaming input: 'model': {litellm_model}, 'endpoint': {litellm_endpoint}"
+    )
+
+    llm_response_stream = await acompletion(
+        model=litellm_model,
+        messages=messages,
+        temperature=0,
+        max_tokens=1024,
+        api_base=litellm_endpoint,
+        api_key=LITELLM_API_KEY,
+        metadata=metadata,
+        stream=True,
+        **extra_kwargs,
+    )
+    async for chunk in llm_response_stream:
+        content = chunk.choices[0].delta.content
+        if content:
+            yield content
+
+
 def remove_json_markdown(text: str) -> str:
     """Remove json markdown from text."""
 
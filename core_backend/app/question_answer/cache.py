@@ -0,0 +1,299 @@
+"""This module contains the Redis-backed response cache for the search endpoint.
+
+Cache entries are keyed on the user ID, the normalized query text and the
+`generate_llm_response` flag. Each user has a cache version number in Redis that is
+part of every key, so all of a user's entries are invalidated at once by incrementing
+it whenever their content changes.
+
+Optionally, a query that misses the exact-match cache can still hit a previous
+entry whose query embedding is within `SEARCH_CACHE_SEMANTIC_MAX_DISTANCE` cosine
+distance of its own.
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from redis import asyncio as aioredis
+
+from ..utils import embedding, setup_logger
+from .config import (
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_SEMANTIC_MAX_DISTANCE,
+    SEARCH_CACHE_SEMANTIC_MAX_ENTRIES,
+    SEARCH_CACHE_TTL_SECONDS,
+)
+from .schemas import QueryBase, QueryResponse, QueryResponseError
+
+logger = setup_logger()
+
+CACHED_RESPONSE_FIELDS = {"llm_response", "search_results", "debug_info"}
+
+
+def is_search_cache_enabled(user_query: QueryBase) -> bool:
+    """Check if the search response cache applies to the query.
+
+    Responses with a TTS file are never cached since the file is generated per query.
+
+    Parameters
+    ----------
+    user_query
+        The user query object.
+
+    Returns
+    -------
+    bool
+        Specifies whether the cache should be used for the query.
+    """
+
+    return SEARCH_CACHE_ENABLED == "True" and not user_query.generate_tts
+
+
+def normalize_query_text(query_text: str) -> str:
+    """Normalize the query text for use as a cache key.
+
+    The text is lowercased, runs of whitespace are collapsed and trailing
+    punctuation is removed.
+
+    Parameters
+    ----------
+    query_text
+        The query text to normalize.
+
+    Returns
+    -------
+    str
+        The normalized query text.
+    """
+
+    normalized_text = " ".join(query_text.lower().split())
+    return re.sub(r"[\s.?!]+$", "", normalized_text)
+
+
+@dataclass
+class SearchCacheKey:
+    """Where a query's response is cached.
+
+    The key is read once, before the lookup and the search, so that a response
+    computed while the user's content changes is stored under the old cache version
+    and is never served after the change.
+    """
+
+    prefix: str
+    normalized_text: str
+    text_hash: str
+    query_embedding: Optional[np.ndarray] = None
+
+
+async def get_search_cache_key(
+    redis: aioredis.Redis, user_id: int, user_query: QueryBase
+) -> SearchCacheKey:
+    """Get the cache key for the query under the user's current cache version.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    user_id
+        The ID of the user making the query.
+    user_query
+        The user query object.
+
+    Returns
+    -------
+    SearchCacheKey
+        The cache key for the query.
+    """
+
+    normalized_text = normalize_query_text(user_query.query_text)
+    return SearchCacheKey(
+        prefix=await _get_key_prefix(redis, user_id, user_query.generate_llm_response),
+        normalized_text=normalized_text,
+        text_hash=_hash_text(normalized_text),
+    )
+
+
+async def get_cached_search_response(
+    *,
+    redis: aioredis.Redis,
+    cache_key: SearchCacheKey,
+    response_template: QueryResponse,
+    metadata: Optional[dict] = None,
+) -> QueryResponse | None:
+    """Look up a cached response for the query.
+
+    The query embedding computed for a semantic lookup is kept on `cache_key` so it
+    can be reused when the response is stored.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    cache_key
+        The cache key for the query.
+    response_template
+        The placeholder response object for the query. Its query ID, session ID and
+        feedback secret key are kept in the returned response.
+    metadata
+        Metadata for `LiteLLM` embedding API, used for semantic lookups.
+
+    Returns
+    -------
+    QueryResponse | None
+        The cached response if there is a hit, otherwise `None`.
+    """
+
+    prefix = cache_key.prefix
+    cache_hit = "exact"
+
+    cached = await redis.get(f"{prefix}:response:{cache_key.text_hash}")
+    if cached is None and SEARCH_CACHE_SEMANTIC_MAX_DISTANCE is not None:
+        text_hash = await _find_semantic_match(
+            redis=redis, cache_key=cache_key, metadata=metadata
+        )
+        if text_hash is not None:
+            cached = await redis.get(f"{prefix}:response:{text_hash}")
+            cache_hit = "semantic"
+    if cached is None:
+        return None
+
+    cached_fields = json.loads(cached)
+    cached_fields["debug_info"]["cache_hit"] = cache_hit
+    return QueryResponse(
+        query_id=response_template.query_id,
+        session_id=response_template.session_id,
+        feedback_secret_key=response_template.feedback_secret_key,
+        tts_file=None,
+        **cached_fields,
+    )
+
+
+async def cache_search_response(
+    *,
+    redis: aioredis.Redis,
+    cache_key: SearchCacheKey,
+    response: QueryResponse | QueryResponseError,
+    metadata: Optional[dict] = None,
+) -> None:
+    """Save a search response to the cache. Error responses are not cached.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    cache_key
+        The cache key for the query, as read before the search was run.
+    response
+        The response to cache.
+    metadata
+        Metadata for `LiteLLM` embedding API, used for semantic lookups.
+    """
+
+    if type(response) is not QueryResponse:
+        return
+
+    prefix = cache_key.prefix
+    ttl = int(SEARCH_CACHE_TTL_SECONDS)
+
+    await redis.set(
+        f"{prefix}:response:{cache_key.text_hash}",
+        response.model_dump_json(include=CACHED_RESPONSE_FIELDS),
+        ex=ttl,
+    )
+
+    if SEARCH_CACHE_SEMANTIC_MAX_DISTANCE is not None:
+        embeddings_key = f"{prefix}:embeddings"
+        if await redis.hlen(embeddings_key) >= int(SEARCH_CACHE_SEMANTIC_MAX_ENTRIES):
+            return
+        query_embedding = await _get_query_embedding(cache_key, metadata)
+        await redis.hset(embeddings_key, cache_key.text_hash, query_embedding.tobytes())
+        await redis.expire(embeddings_key, ttl)
+
+
+async def invalidate_search_cache(redis: aioredis.Redis, user_id: int) -> None:
+    """Invalidate all cached search responses for the user.
+
+    Parameters
+    ----------
+    redis
+        The Redis connection.
+    user_id
+        The ID of the user whose cache is invalidated.
+    """
+
+    await redis.incr(f"search-cache-version:{user_id}")
+
+
+async def _get_key_prefix(
+    redis: aioredis.Redis, user_id: int, generate_llm_response: bool
+) -> str:
+    """Get the key prefix for the user's current cache version."""
+
+    cached_version = await redis.get(f"search-cache-version:{user_id}")
+    version = int(cached_version) if cached_version is not None else 0
+    return f"search-cache:{user_id}:{version}:{int(generate_llm_response)}"
+
+
+def _hash_text(text: str) -> str:
+    """Hash the normalized query text."""
+
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+async def _get_query_embedding(
+    cache_key: SearchCacheKey, metadata: Optional[dict] = None
+) -> np.ndarray:
+    """Get the normalized float32 embedding of the query text, computing it at most
+    once per cache key."""
+
+    if cache_key.query_embedding is None:
+        metadata = dict(metadata or {})
+        metadata["generation_name"] = "search_cache"
+        query_embedding = np.asarray(
+            await embedding(cache_key.normalized_text, metadata=metadata),
+            dtype=np.float32,
+        )
+        cache_key.query_embedding = query_embedding / np.linalg.norm(query_embedding)
+    return cache_key.query_embedding
+
+
+async def _find_semantic_match(
+    *,
+    redis: aioredis.Redis,
+    cache_key: SearchCacheKey,
+    metadata: Optional[dict] = None,
+) -> str | None:
+    """Find the cached query closest to the query text, if it is close enough.
+
+    Returns
+    -------
+    str | None
+        The hash of the matching cached query text, otherwise `None`.
+    """
+
+    cached_embeddings = await redis.hgetall(f"{cache_key.prefix}:embeddings")
+    if not cached_embeddings:
+        return None
+
+    text_hashes = [_decode(text_hash) for text_hash in cached_embeddings.keys()]
+    matrix = np.vstack(
+        [np.frombuffer(v, dtype=np.float32) for v in cached_embeddings.values()]
+    )
+    query_embedding = await _get_query_embedding(cache_key, metadata)
+    distances = 1.0 - matrix @ query_embedding
+
+    best = int(np.argmin(distances))
+    max_distance = SEARCH_CACHE_SEMANTIC_MAX_DISTANCE
+    if max_distance is None or distances[best] > float(max_distance):
+        return None
+    logger.info(f"Semantic search cache hit with distance {distances[best]:.4f}")
+    return text_hashes[best]
+
+
+def _decode(value: bytes | str) -> str:
+    """Decode a Redis hash field name."""
+
+    return value.decode() if isinstance(value, bytes) else value
@@ -2,3 +2,22 @@ import os
 
 # Functionality variables
 N_TOP_CONTENT = os.environ.get("N_TOP_CONTENT", "4")
+
+# Search response cache
+SEARCH_CACHE_ENABLED = os.environ.get("SEARCH_CACHE_ENABLED", "False")
+SEARCH_CACHE_TTL_SECONDS = os.environ.get("SEARCH_CACHE_TTL_SECONDS", 60 * 60 * 24)
+# Max cosine distance between query embeddings for a semantic cache hit. Semantic
+# hits are disabled if this is not set.
+SEARCH_CACHE_SEMANTIC_MAX_DISTANCE = os.environ.get(
+    "SEARCH_CACHE_SEMANTIC_MAX_DISTANCE", None
+)
+# Max number of query embeddings kept per user for semantic cache hits
+SEARCH_CACHE_SEMANTIC_MAX_ENTRIES = os.environ.get(
+    "SEARCH_CACHE_SEMANTIC_MAX_ENTRIES", 1000
+)
+
+# Batch search
+# Max number of queries per /search-batch request
+SEARCH_BATCH_MAX_SIZE = os.environ.get("SEARCH_BATCH_MAX_SIZE", 100)
+# Max number of queries of a batch going through the guardrails at the same time
+SEARCH_BATCH_CONCURRENCY = os.environ.get("SEARCH_BATCH_CONCURRENCY", 8)
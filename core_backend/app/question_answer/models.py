@@ -126,6 +126,47 @@ async def save_user_query_to_db(
     return user_query_db
 
 
+async def save_user_queries_to_db(
+    user_id: int,
+    user_queries: List[QueryBase],
+    asession: AsyncSession,
+) -> List[QueryDB]:
+    """Saves user queries to the database in a single transaction.
+
+    Parameters
+    ----------
+    user_id
+        The user ID for the organization.
+    user_queries
+        The end user queries.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    List[QueryDB]
+        The user query database objects, in the same order.
+    """
+
+    query_datetime_utc = datetime.now(timezone.utc)
+    user_query_dbs = [
+        QueryDB(
+            user_id=user_id,
+            session_id=user_query.session_id,
+            feedback_secret_key=generate_secret_key(),
+            query_text=user_query.query_text,
+            query_generate_llm_response=user_query.generate_llm_response,
+            query_metadata=user_query.query_metadata,
+            query_datetime_utc=query_datetime_utc,
+        )
+        for user_query in user_queries
+    ]
+    asession.add_all(user_query_dbs)
+    # the IDs are set by the flush, and the session doesn't expire them on commit
+    await asession.commit()
+    return user_query_dbs
+
+
 async def check_secret_key_match(
     secret_key: str, query_id: int, asession: AsyncSession
 ) -> bool:
@@ -209,6 +250,32 @@ async def save_query_response_to_db(
     asession
         `AsyncSession` object for database transactions.
 
+    Returns
+    -------
+    QueryResponseDB
+        The user query response database object.
+    """
+    user_query_responses_db = build_query_response_db(user_query_db, response)
+
+    asession.add(user_query_responses_db)
+    await asession.commit()
+    await asession.refresh(user_query_responses_db)
+    return user_query_responses_db
+
+
+def build_query_response_db(
+    user_query_db: QueryDB,
+    response: QueryResponse | QueryResponseError,
+) -> QueryResponseDB:
+    """Builds the (unsaved) database object for the user query response.
+
+    Parameters
+    ----------
+    user_query_db
+        The user query database object.
+    response
+        The query response object.
+
     Returns
     -------
     QueryResponseDB
@@ -243,9 +310,6 @@ async def save_query_response_to_db(
     else:
         raise ValueError("Invalid response type.")
 
-    asession.add(user_query_responses_db)
-    await asession.commit()
-    await asession.refresh(user_query_responses_db)
     return user_query_responses_db
 
 
@@ -312,16 +376,40 @@ async def save_content_for_query_to_db(
     if contents is None:
         return
 
-    for content in contents.values():
-        content_for_query_db = QueryResponseContentDB(
+    asession.add_all(
+        build_content_for_query_dbs(
+            user_id=user_id,
+            session_id=session_id,
+            query_id=query_id,
+            contents=contents,
+        )
+    )
+    await asession.commit()
+
+
+def build_content_for_query_dbs(
+    user_id: int,
+    session_id: int | None,
+    query_id: int,
+    contents: dict[int, QuerySearchResult] | None,
+) -> list[QueryResponseContentDB]:
+    """
+    Builds the (unsaved) database objects for the content returned for a query.
+    """
+
+    if contents is None:
+        return []
+
+    return [
+        QueryResponseContentDB(
             user_id=user_id,
             session_id=session_id,
             query_id=query_id,
             content_id=content.id,
             created_datetime_utc=datetime.now(timezone.utc),
         )
-        asession.add(content_for_query_db)
-    await asession.commit()
+        for content in contents.values()
+    ]
 
 
 class ResponseFeedbackDB(Base):
@@ -2,47 +2,67 @@
 endpoints.
 """
 
+import asyncio
+import json
 import os
-from typing import Tuple
-
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
-from fastapi.responses import JSONResponse
+from typing import AsyncIterator, Dict, List, Tuple
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.requests import Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..auth.dependencies import authenticate_key, rate_limiter
+from ..auth.dependencies import authenticate_key, consume_api_calls, rate_limiter
 from ..config import SPEECH_ENDPOINT
 from ..contents.models import (
+    ContentCounter,
     get_similar_content_async,
-    increment_query_count,
-    update_votes_in_db,
+    get_similar_content_batch_async,
 )
 from ..database import get_async_session
-from ..llm_call.process_input import (
-    classify_safety__before,
-    identify_language__before,
-    paraphrase_question__before,
-    translate_question__before,
-)
+from ..llm_call.process_input import run_input_rails__before
 from ..llm_call.process_output import (
     check_align_score__after,
     generate_llm_response__after,
+    stream_llm_response,
 )
-from ..users.models import UserDB
+from ..schemas import FeedbackSentiment, QuerySearchResult
+from ..users.schemas import UserIdentity
 from ..utils import create_langfuse_metadata, get_http_client, setup_logger
-from .config import N_TOP_CONTENT
+from ..write_behind import get_write_behind_queue
+from .cache import (
+    cache_search_response,
+    get_cached_search_response,
+    get_search_cache_key,
+    is_search_cache_enabled,
+)
+from .config import N_TOP_CONTENT, SEARCH_BATCH_CONCURRENCY
 from .models import (
     QueryDB,
+    build_content_for_query_dbs,
+    build_query_response_db,
     check_secret_key_match,
     save_content_feedback_to_db,
-    save_content_for_query_to_db,
-    save_query_response_to_db,
     save_response_feedback_to_db,
+    save_user_queries_to_db,
     save_user_query_to_db,
 )
 from .schemas import (
     ContentFeedback,
     QueryBase,
+    QueryBatch,
+    QueryBatchResponse,
     QueryRefined,
     QueryResponse,
     QueryResponseError,
@@ -51,6 +71,11 @@ from .schemas import (
 
 logger = setup_logger()
 
+VOTE_COUNTERS: dict[FeedbackSentiment, ContentCounter] = {
+    FeedbackSentiment.POSITIVE: "positive_votes",
+    FeedbackSentiment.NEGATIVE: "negative_votes",
+}
+
 
 TAG_METADATA = {
     "name": "Question-answering and feedback",
@@ -64,6 +89,12 @@ router = APIRouter(
     tags=[TAG_METADATA["name"]],
 )
 
+# Batch endpoints count one API call per item instead of one per request
+batch_router = APIRouter(
+    dependencies=[Depends(authenticate_key)],
+    tags=[TAG_METADATA["name"]],
+)
+
 
 @router.post(
     "/stt-llm-response",
@@ -84,7 +115,7 @@ async def stt_llm_response(
     file: UploadFile = File(...),
     exclude_archived: bool = Form(True),
     asession: AsyncSession = Depends(get_async_session),
-    user_db: UserDB = Depends(authenticate_key),
+    user_db: UserIdentity = Depends(authenticate_key),
 ) -> QueryResponse | JSONResponse:
     """
     Endpoint to transcribe audio from the provided file and generate an LLM response.
@@ -119,18 +150,11 @@ async def stt_llm_response(
         asession=asession,
         exclude_archived=exclude_archived,
     )
-    await save_query_response_to_db(user_query_db, response, asession)
-    await increment_query_count(
-        user_id=user_db.user_id,
-        contents=response.search_results,
-        asession=asession,
-    )
-    await save_content_for_query_to_db(
+    await save_query_response(
+        user_query_db=user_query_db,
+        response=response,
         user_id=user_db.user_id,
         session_id=user_query.session_id,
-        query_id=response.query_id,
-        contents=response.search_results,
-        asession=asession,
     )
 
     if os.path.exists(file_path):
@@ -174,8 +198,9 @@ async def post_to_speech(file_path: str, endpoint_url: str) -> dict:
 )
 async def search(
     user_query: QueryBase,
+    request: Request,
     asession: AsyncSession = Depends(get_async_session),
-    user_db: UserDB = Depends(authenticate_key),
+    user_db: UserIdentity = Depends(authenticate_key),
 ) -> QueryResponse | JSONResponse:
     """
     Search endpoint finds the most similar content to the user query and optionally
@@ -194,27 +219,44 @@ async def search(
         user_query=user_query,
         asession=asession,
     )
-    response = await search_base(
-        query_refined=user_query_refined_template,
-        response=response_template,
-        user_id=user_db.user_id,
-        n_similar=int(N_TOP_CONTENT),
-        asession=asession,
-        exclude_archived=True,
-    )
 
-    await save_query_response_to_db(user_query_db, response, asession)
-    await increment_query_count(
-        user_id=user_db.user_id,
-        contents=response.search_results,
-        asession=asession,
+    use_cache = is_search_cache_enabled(user_query)
+    metadata = create_langfuse_metadata(
+        query_id=response_template.query_id, user_id=user_db.user_id
     )
-    await save_content_for_query_to_db(
+    response: QueryResponse | QueryResponseError | None = None
+    if use_cache:
+        cache_key = await get_search_cache_key(
+            request.app.state.redis, user_db.user_id, user_query
+        )
+        response = await get_cached_search_response(
+            redis=request.app.state.redis,
+            cache_key=cache_key,
+            response_template=response_template,
+            metadata=metadata,
+        )
+    if response is None:
+        response = await search_base(
+            query_refined=user_query_refined_template,
+            response=response_template,
+            user_id=user_db.user_id,
+            n_similar=int(N_TOP_CONTENT),
+            asession=asession,
+            exclude_archived=True,
+        )
+        if use_cache:
+            await cache_search_response(
+                redis=request.app.state.redis,
+                cache_key=cache_key,
+                response=response,
+                metadata=metadata,
+            )
+
+    await save_query_response(
+        user_query_db=user_query_db,
+        response=response,
         user_id=user_db.user_id,
         session_id=user_query.session_id,
-        query_id=response.query_id,
-        contents=response.search_results,
-        asession=asession,
     )
 
     if type(response) is QueryResponse:
@@ -230,12 +272,331 @@ async def search(
         )
 
 
-@identify_language__before
-@classify_safety__before
-@translate_question__before
-@paraphrase_question__before
+async def batch_rate_limiter(
+    query_batch: QueryBatch,
+    request: Request,
+    response: Response,
+    user_db: UserIdentity = Depends(authenticate_key),
+) -> None:
+    """
+    Rate limiter for the batch search, which counts one API call per query.
+    """
+    await consume_api_calls(
+        request, response, user_db, n_calls=len(query_batch.queries)
+    )
+
+
+@batch_router.post(
+    "/search-batch",
+    response_model=QueryBatchResponse,
+    dependencies=[Depends(batch_rate_limiter)],
+)
+async def search_batch(
+    query_batch: QueryBatch,
+    asession: AsyncSession = Depends(get_async_session),
+    user_db: UserIdentity = Depends(authenticate_key),
+) -> QueryBatchResponse:
+    """
+    Batch version of the search endpoint, for many queries in one call. Each query
+    counts as one API call.
+
+    The queries first go through the input guardrails concurrently, then the
+    refined (e.g. translated or paraphrased) queries are embedded together and
+    searched for in a single database round-trip, then the LLM responses are
+    generated, if requested. If any guardrails fail for a query, its response is an
+    error response that includes the search results as well as the details of the
+    failure, like the error 400 of `/search`.
+    """
+
+    user_queries = query_batch.queries
+    user_query_dbs = await save_user_queries_to_db(
+        user_id=user_db.user_id, user_queries=user_queries, asession=asession
+    )
+
+    semaphore = asyncio.Semaphore(int(SEARCH_BATCH_CONCURRENCY))
+
+    async def _refine(
+        user_query: QueryBase, user_query_db: QueryDB
+    ) -> Tuple[QueryRefined, QueryResponse | QueryResponseError]:
+        query_refined, response_template = build_query_and_response_templates(
+            user_id=user_db.user_id, user_query=user_query, user_query_db=user_query_db
+        )
+        async with semaphore:
+            response = await refine_query(
+                query_refined=query_refined, response=response_template
+            )
+        return query_refined, response
+
+    refined_queries = await asyncio.gather(
+        *[
+            _refine(user_query, user_query_db)
+            for user_query, user_query_db in zip(user_queries, user_query_dbs)
+        ]
+    )
+
+    # each distinct refined question is searched for once
+    questions = list(
+        dict.fromkeys(query_refined.query_text for query_refined, _ in refined_queries)
+    )
+    search_results = dict(
+        zip(
+            questions,
+            await get_similar_content_batch_async(
+                user_id=user_db.user_id,
+                questions=questions,
+                n_similar=int(N_TOP_CONTENT),
+                asession=asession,
+                # the embedding call is shared by all the queries, so it isn't
+                # traced under any single query ID
+                metadata={"trace_user_id": "user_id-" + str(user_db.user_id)},
+            ),
+        )
+    )
+
+    async def _respond(
+        query_refined: QueryRefined, response: QueryResponse | QueryResponseError
+    ) -> QueryResponse | QueryResponseError:
+        async with semaphore:
+            return await search_base_precomputed(
+                query_refined=query_refined,
+                response=response,
+                search_results=search_results,
+            )
+
+    responses = await asyncio.gather(
+        *[
+            _respond(query_refined, response)
+            for query_refined, response in refined_queries
+        ]
+    )
+
+    await save_query_responses(
+        user_query_dbs=user_query_dbs, responses=responses, user_id=user_db.user_id
+    )
+
+    return QueryBatchResponse(responses=responses)
+
+
+@router.post(
+    "/search-stream",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"text/event-stream": {}},
+            "description": "Server-sent events: `search_results`, "
+            "`llm_response_token` (zero or more) and `final_response`",
+        }
+    },
+)
+async def search_stream(
+    user_query: QueryBase,
+    asession: AsyncSession = Depends(get_async_session),
+    user_db: UserIdentity = Depends(authenticate_key),
+) -> StreamingResponse:
+    """
+    Streaming version of the search endpoint, using server-sent events.
+
+    The following events are sent, each with a JSON payload:
+
+    1. `search_results`: the response with the search results, as soon as the
+    embeddings search is done.
+    2. `llm_response_token`: `{"token": ...}` for each part of the LLM response as it
+    is generated. Only sent if `generate_llm_response` is true.
+    3. `final_response`: the final response, including the alignment score check.
+    If any guardrails failed, this is a `QueryResponseError` with the details of
+    the failure (instead of the error 400 returned by `/search`).
+    """
+
+    (
+        user_query_db,
+        user_query_refined_template,
+        response_template,
+    ) = await get_user_query_and_response(
+        user_id=user_db.user_id,
+        user_query=user_query,
+        asession=asession,
+    )
+
+    # the LLM response is generated while streaming, not by `search_base`
+    query_refined = user_query_refined_template.model_copy(
+        update={"generate_llm_response": False}
+    )
+    response = await search_base(
+        query_refined=query_refined,
+        response=response_template,
+        user_id=user_db.user_id,
+        n_similar=int(N_TOP_CONTENT),
+        asession=asession,
+        exclude_archived=True,
+    )
+
+    return StreamingResponse(
+        _stream_search_events(
+            user_query=user_query,
+            user_query_db=user_query_db,
+            query_refined=query_refined,
+            response=response,
+            user_id=user_db.user_id,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _stream_search_events(
+    *,
+    user_query: QueryBase,
+    user_query_db: QueryDB,
+    query_refined: QueryRefined,
+    response: QueryResponse | QueryResponseError,
+    user_id: int,
+) -> AsyncIterator[str]:
+    """Generate the server-sent events for `search_stream` and save the response.
+
+    Parameters
+    ----------
+    user_query
+        The user query.
+    user_query_db
+        The user query database object.
+    query_refined
+        The refined query object, after the input guardrails.
+    response
+        The response with the search results.
+    user_id
+        The ID of the user making the query.
+
+    Returns
+    -------
+    AsyncIterator[str]
+        The server-sent events.
+    """
+
+    try:
+        yield _format_sse("search_results", response)
+
+        if user_query.generate_llm_response:
+            metadata = create_langfuse_metadata(
+                query_id=response.query_id, user_id=user_id
+            )
+            async for item in stream_llm_response(query_refined, response, metadata):
+                if isinstance(item, str):
+                    yield _format_sse("llm_response_token", {"token": item})
+                else:
+                    response = item
+
+        yield _format_sse("final_response", response)
+    finally:
+        # the client may disconnect mid-stream, so don't let that cancel the save
+        await asyncio.shield(
+            save_query_response(
+                user_query_db=user_query_db,
+                response=response,
+                user_id=user_id,
+                session_id=user_query.session_id,
+            )
+        )
+
+
+async def save_query_response(
+    *,
+    user_query_db: QueryDB,
+    response: QueryResponse | QueryResponseError,
+    user_id: int,
+    session_id: int | None,
+) -> None:
+    """Save the response, the content returned and the content query counts.
+
+    The writes go through the write-behind queue, so they are committed in the
+    background when it is running.
+
+    Parameters
+    ----------
+    user_query_db
+        The user query database object.
+    response
+        The query response object.
+    user_id
+        The ID of the user making the query.
+    session_id
+        The ID of the user's session.
+    """
+
+    contents = response.search_results or {}
+    write_queue = get_write_behind_queue()
+    await write_queue.insert(
+        [
+            build_query_response_db(user_query_db, response),
+            *build_content_for_query_dbs(
+                user_id=user_id,
+                session_id=session_id,
+                query_id=response.query_id,
+                contents=contents,
+            ),
+        ]
+    )
+    await write_queue.increment_content_counter(
+        user_id=user_id,
+        content_ids=[content.id for content in contents.values()],
+        counter="query_count",
+    )
+
+
+async def save_query_responses(
+    *,
+    user_query_dbs: List[QueryDB],
+    responses: List[QueryResponse | QueryResponseError],
+    user_id: int,
+) -> None:
+    """Save the responses to a batch of queries, the content returned and the content
+    query counts, all with a single write of each kind (see `save_query_response`).
+
+    Parameters
+    ----------
+    user_query_dbs
+        The user query database objects.
+    responses
+        The query response objects, in the same order.
+    user_id
+        The ID of the user making the queries.
+    """
+
+    rows = []
+    content_ids: List[int] = []
+    for user_query_db, response in zip(user_query_dbs, responses):
+        contents = response.search_results or {}
+        rows.append(build_query_response_db(user_query_db, response))
+        rows.extend(
+            build_content_for_query_dbs(
+                user_id=user_id,
+                session_id=user_query_db.session_id,
+                query_id=response.query_id,
+                contents=contents,
+            )
+        )
+        content_ids.extend(content.id for content in contents.values())
+
+    write_queue = get_write_behind_queue()
+    await write_queue.insert(rows)
+    await write_queue.increment_content_counter(
+        user_id=user_id, content_ids=content_ids, counter="query_count"
+    )
+
+
+def _format_sse(event: str, data: BaseModel | dict) -> str:
+    """
+    Format a server-sent event with a JSON payload
+    """
+    if isinstance(data, BaseModel):
+        payload = data.model_dump_json()
+    else:
+        payload = json.dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
 @generate_llm_response__after
 @check_align_score__after
+@run_input_rails__before
 async def search_base(
     query_refined: QueryRefined,
     response: QueryResponse,
@@ -250,6 +611,10 @@ async def search_base(
     `QueryResponseError` object is returned that includes the search
     results as well as the details of the failure.
 
+    NB: The input guardrails run concurrently with this function (see
+    `run_input_rails__before`), so `query_refined.original_language` may not be set
+    yet when it is called.
+
     Parameters
     ----------
     query_refined
@@ -269,16 +634,8 @@ async def search_base(
     -------
     QueryResponse | QueryResponseError
         An appropriate query response object.
-
-    Raises
-    ------
-    ValueError
-        If the question language is not identified.
     """
 
-    if query_refined.original_language is None:
-        raise ValueError(("Identify language before calling this function."))
-
     # always do the embeddings search even if some guardrails have failed
     metadata = create_langfuse_metadata(query_id=response.query_id, user_id=user_id)
     search_results = await get_similar_content_async(
@@ -295,6 +652,62 @@ async def search_base(
     return response
 
 
+@run_input_rails__before
+async def refine_query(
+    query_refined: QueryRefined,
+    response: QueryResponse | QueryResponseError,
+) -> QueryResponse | QueryResponseError:
+    """Run the input guardrails on the user query, without searching.
+
+    `query_refined` is updated in place with the refined query text, so that the
+    refined queries of a batch can be searched for together.
+
+    Parameters
+    ----------
+    query_refined
+        The refined query object.
+    response
+        The query response object.
+
+    Returns
+    -------
+    QueryResponse | QueryResponseError
+        The query response object, or an error response if any guardrails failed.
+    """
+
+    return response
+
+
+@generate_llm_response__after
+@check_align_score__after
+async def search_base_precomputed(
+    query_refined: QueryRefined,
+    response: QueryResponse | QueryResponseError,
+    search_results: Dict[str, Dict[int, QuerySearchResult]],
+) -> QueryResponse | QueryResponseError:
+    """Same as `search_base` for a query that has already been through the input
+    guardrails (see `refine_query`), using the results of a batch search.
+
+    Parameters
+    ----------
+    query_refined
+        The refined query object.
+    response
+        The query response object.
+    search_results
+        The search results of the batch, by refined query text.
+
+    Returns
+    -------
+    QueryResponse | QueryResponseError
+        An appropriate query response object.
+    """
+
+    response.search_results = dict(search_results[query_refined.query_text])
+
+    return response
+
+
 async def get_user_query_and_response(
     user_id: int, user_query: QueryBase, asession: AsyncSession
 ) -> Tuple[QueryDB, QueryRefined, QueryResponse]:
@@ -323,6 +736,32 @@ async def get_user_query_and_response(
         user_query=user_query,
         asession=asession,
     )
+    user_query_refined, response_template = build_query_and_response_templates(
+        user_id=user_id, user_query=user_query, user_query_db=user_query_db
+    )
+    return user_query_db, user_query_refined, response_template
+
+
+def build_query_and_response_templates(
+    user_id: int, user_query: QueryBase, user_query_db: QueryDB
+) -> Tuple[QueryRefined, QueryResponse]:
+    """Construct placeholder query and response objects for a saved user query.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user making the query.
+    user_query
+        The user query.
+    user_query_db
+        The user query database object.
+
+    Returns
+    -------
+    Tuple[QueryRefined, QueryResponse]
+        The refined query object and the response object.
+    """
+
     # prepare refined query object
     user_query_refined = QueryRefined(
         **user_query.model_dump(),
@@ -339,14 +778,14 @@ async def get_user_query_and_response(
         search_results=None,
         debug_info={},
     )
-    return user_query_db, user_query_refined, response_template
+    return user_query_refined, response_template
 
 
 @router.post("/response-feedback")
 async def feedback(
     feedback: ResponseFeedbackBase,
     asession: AsyncSession = Depends(get_async_session),
-    user_db: UserDB = Depends(authenticate_key),
+    user_db: UserIdentity = Depends(authenticate_key),
 ) -> JSONResponse:
     """
     Feedback endpoint used to capture user feedback on the results returned by QA
@@ -385,7 +824,7 @@ async def feedback(
 async def content_feedback(
     feedback: ContentFeedback,
     asession: AsyncSession = Depends(get_async_session),
-    user_db: UserDB = Depends(authenticate_key),
+    user_db: UserIdentity = Depends(authenticate_key),
 ) -> JSONResponse:
     """
     Feedback endpoint used to capture user feedback on specific content after it has
@@ -423,12 +862,12 @@ async def content_feedback(
                 },
             },
         )
-    await update_votes_in_db(
-        user_id=user_db.user_id,
-        content_id=feedback.content_id,
-        vote=feedback.feedback_sentiment,
-        asession=asession,
-    )
+    if feedback.feedback_sentiment in VOTE_COUNTERS:
+        await get_write_behind_queue().increment_content_counter(
+            user_id=user_db.user_id,
+            content_ids=[feedback.content_id],
+            counter=VOTE_COUNTERS[feedback.feedback_sentiment],
+        )
     return JSONResponse(
         status_code=status.HTTP_200_OK,
         content={
@@ -1,10 +1,11 @@
 from enum import Enum
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
 from ..llm_call.llm_prompts import IdentifiedLanguage
 from ..schemas import FeedbackSentiment, QuerySearchResult
+from .config import SEARCH_BATCH_MAX_SIZE
 
 
 class QueryBase(BaseModel):
@@ -21,6 +22,16 @@ class QueryBase(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class QueryBatch(BaseModel):
+    """
+    Batch of question answering queries.
+    """
+
+    queries: List[QueryBase] = Field(
+        ..., min_length=1, max_length=int(SEARCH_BATCH_MAX_SIZE)
+    )
+
+
 class QueryRefined(QueryBase):
     """
     Question answering query class with additional data
@@ -127,3 +138,12 @@ class ContentFeedback(ResponseFeedbackBase):
     content_id: int = Field(..., examples=[1])
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class QueryBatchResponse(BaseModel):
+    """
+    Pydantic model for the responses to a batch of queries, in the same order.
+    Queries that failed a guardrail get a `QueryResponseError`.
+    """
+
+    responses: List[QueryResponseError | QueryResponse]
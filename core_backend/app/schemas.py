@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Literal
 
 from pydantic import BaseModel, ConfigDict
 
@@ -22,5 +23,9 @@ class QuerySearchResult(BaseModel):
     text: str
     id: int
     distance: float
+    # "cosine": the cosine distance between the content and the query embeddings.
+    # "lexical": 1 - the normalized full-text rank, when hybrid search skipped the
+    # embedding call. The two scales are not comparable.
+    distance_type: Literal["cosine", "lexical"] = "cosine"
 
     model_config = ConfigDict(from_attributes=True)
@@ -8,8 +8,11 @@ from sqlalchemy import (
     Integer,
     String,
     Table,
+    column,
     delete,
     select,
+    table,
+    update,
 )
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -24,6 +27,12 @@ content_tags_table = Table(
     Column("tag_id", Integer, ForeignKey("tag.tag_id"), primary_key=True),
 )
 
+# The columns of the `content` table updated when a tag changes. `ContentDB` can't be
+# used here since its module imports this one.
+content_table = table(
+    "content", column("content_id"), column("user_id"), column("updated_datetime_utc")
+)
+
 
 class TagDB(Base):
     """
@@ -96,6 +105,7 @@ async def update_tag_in_db(
     )
 
     tag_db = await asession.merge(tag_db)
+    await _touch_contents_with_tag(user_id, tag_id, asession)
     await asession.commit()
     await asession.refresh(tag_db)
 
@@ -110,6 +120,7 @@ async def delete_tag_from_db(
     """
     Deletes a tag from the database
     """
+    await _touch_contents_with_tag(user_id, tag_id, asession)
     association_stmt = delete(content_tags_table).where(
         content_tags_table.c.tag_id == tag_id
     )
@@ -179,3 +190,25 @@ async def is_tag_name_unique(
     )
     tag_row = (await asession.execute(stmt)).first()
     return not tag_row
+
+
+async def _touch_contents_with_tag(
+    user_id: int, tag_id: int, asession: AsyncSession
+) -> None:
+    """
+    Update the update time of the contents with the tag, so that incremental syncs
+    pick up the change to their tags. Committed with the change to the tag.
+    """
+    stmt = (
+        update(content_table)
+        .where(content_table.c.user_id == user_id)
+        .where(
+            content_table.c.content_id.in_(
+                select(content_tags_table.c.content_id).where(
+                    content_tags_table.c.tag_id == tag_id
+                )
+            )
+        )
+        .values(updated_datetime_utc=datetime.now(timezone.utc))
+    )
+    await asession.execute(stmt)
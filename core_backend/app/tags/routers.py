@@ -1,10 +1,12 @@
 from typing import Annotated, List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.exceptions import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.dependencies import get_current_user
+from ..catalog import bump_catalog_version, get_not_modified_response
+from ..contents.cache import invalidate_content_counts
 from ..database import get_async_session
 from ..users.models import UserDB
 from ..utils import setup_logger
@@ -33,6 +35,7 @@ logger = setup_logger()
 async def create_tag(
     tag: TagCreate,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
     asession: AsyncSession = Depends(get_async_session),
 ) -> TagRetrieve | None:
     """
@@ -44,6 +47,7 @@ async def create_tag(
             status_code=400, detail=f"Tag name `{tag.tag_name}` already exists"
         )
     tag_db = await save_tag_to_db(user_db.user_id, tag, asession)
+    await bump_catalog_version(request.app.state.redis, user_db.user_id)
     return _convert_record_to_schema(tag_db)
 
 
@@ -52,6 +56,7 @@ async def edit_tag(
     tag_id: int,
     tag: TagCreate,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
     asession: AsyncSession = Depends(get_async_session),
 ) -> TagRetrieve:
     """
@@ -78,6 +83,7 @@ async def edit_tag(
         tag,
         asession,
     )
+    await bump_catalog_version(request.app.state.redis, user_db.user_id)
 
     return _convert_record_to_schema(updated_tag)
 
@@ -85,13 +91,19 @@ async def edit_tag(
 @router.get("/", response_model=list[TagRetrieve])
 async def retrieve_tag(
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: Optional[int] = None,
     asession: AsyncSession = Depends(get_async_session),
-) -> List[TagRetrieve]:
+) -> List[TagRetrieve] | Response:
     """
-    Retrieve all tags
+    Retrieve all tags. Send the `ETag` of the response back in `If-None-Match` to
+    get a 304 response if the tags haven't changed.
     """
+    not_modified = await get_not_modified_response(request, response, user_db.user_id)
+    if not_modified is not None:
+        return not_modified
     records = await get_list_of_tag_from_db(
         user_db.user_id, offset=skip, limit=limit, asession=asession
     )
@@ -103,6 +115,7 @@ async def retrieve_tag(
 async def delete_tag(
     tag_id: int,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
     asession: AsyncSession = Depends(get_async_session),
 ) -> None:
     """
@@ -117,6 +130,9 @@ async def delete_tag(
     if not record:
         raise HTTPException(status_code=404, detail=f"Tag id `{tag_id}` not found")
     await delete_tag_from_db(user_db.user_id, tag_id, asession)
+    await bump_catalog_version(request.app.state.redis, user_db.user_id)
+    # contents lose the tag, so counts filtered by it are out of date
+    await invalidate_content_counts(request.app.state.redis, user_db.user_id)
 
 
 @router.get("/{tag_id}", response_model=TagRetrieve)
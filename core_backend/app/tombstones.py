@@ -0,0 +1,150 @@
+"""This module contains the ORM for the tombstones of hard-deleted records, which
+let the data API report deletions to clients syncing changes incrementally.
+
+Tombstones are kept for `DATA_API_TOMBSTONE_RETENTION_DAYS`: older ones are pruned
+whenever the user deletes another record of the same type.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .config import DATA_API_TOMBSTONE_RETENTION_DAYS
+from .models import Base
+
+RecordType = Literal["content", "urgency_rule"]
+
+
+class TombstoneDB(Base):
+    """ORM for the tombstones of deleted contents and urgency rules.
+
+    A tombstone is added in the same transaction as the deletion of its record.
+    """
+
+    __tablename__ = "tombstone"
+
+    __table_args__ = (
+        Index(
+            "tombstone_user_id_record_type_deleted_idx",
+            "user_id",
+            "record_type",
+            "deleted_datetime_utc",
+        ),
+    )
+
+    tombstone_id: Mapped[int] = mapped_column(Integer, primary_key=True, nullable=False)
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("user.user_id"), nullable=False
+    )
+    record_type: Mapped[str] = mapped_column(String(length=32), nullable=False)
+    record_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    deleted_datetime_utc: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        """Construct the string representation of the `TombstoneDB` object.
+
+        Returns
+        -------
+        str
+            A string representation of the `TombstoneDB` object.
+        """
+
+        return (
+            f"TombstoneDB(tombstone_id={self.tombstone_id}, "
+            f"user_id={self.user_id}, "
+            f"record_type={self.record_type}, "
+            f"record_id={self.record_id}, "
+            f"deleted_datetime_utc={self.deleted_datetime_utc})"
+        )
+
+
+def get_tombstone_retention_start() -> datetime:
+    """Get the time before which deletions are no longer reported.
+
+    Returns
+    -------
+    datetime
+        The UTC time of the oldest tombstones kept.
+    """
+
+    return datetime.now(timezone.utc) - timedelta(
+        days=float(DATA_API_TOMBSTONE_RETENTION_DAYS)
+    )
+
+
+async def add_tombstone(
+    *, user_id: int, record_type: RecordType, record_id: int, asession: AsyncSession
+) -> None:
+    """Add the tombstone of a deleted record to the session, and delete the user's
+    tombstones of the same type that are older than the retention window.
+
+    NB: The tombstone is committed with the deletion of the record, by the caller.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user whose record is deleted.
+    record_type
+        The type of the deleted record.
+    record_id
+        The ID of the deleted record.
+    asession
+        `AsyncSession` object for database transactions.
+    """
+
+    await asession.execute(
+        delete(TombstoneDB)
+        .where(TombstoneDB.user_id == user_id)
+        .where(TombstoneDB.record_type == record_type)
+        .where(TombstoneDB.deleted_datetime_utc < get_tombstone_retention_start())
+    )
+    asession.add(
+        TombstoneDB(
+            user_id=user_id,
+            record_type=record_type,
+            record_id=record_id,
+            deleted_datetime_utc=datetime.now(timezone.utc),
+        )
+    )
+
+
+async def get_deleted_record_ids(
+    *,
+    user_id: int,
+    record_type: RecordType,
+    deleted_since: datetime,
+    asession: AsyncSession,
+) -> List[int]:
+    """Get the IDs of the user's records deleted after a given time.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user whose records were deleted.
+    record_type
+        The type of the deleted records.
+    deleted_since
+        Only records deleted after this time are returned.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    List[int]
+        The IDs of the deleted records, without duplicates.
+    """
+
+    stmt = (
+        select(TombstoneDB.record_id)
+        .where(TombstoneDB.user_id == user_id)
+        .where(TombstoneDB.record_type == record_type)
+        .where(TombstoneDB.deleted_datetime_utc > deleted_since)
+        .distinct()
+        .order_by(TombstoneDB.record_id)
+    )
+    return list((await asession.scalars(stmt)).all())
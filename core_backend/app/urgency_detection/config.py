@@ -7,3 +7,14 @@ URGENCY_DETECTION_MIN_PROBABILITY = os.environ.get(
 URGENCY_CLASSIFIER = os.environ.get("URGENCY_CLASSIFIER", "cosine_distance_classifier")
 
 # cosine_distance_classifier, llm_entailment_classifier
+
+# Batch urgency detection
+# Max number of messages per /urgency-detect-batch request
+URGENCY_DETECTION_BATCH_MAX_SIZE = os.environ.get(
+    "URGENCY_DETECTION_BATCH_MAX_SIZE", 100
+)
+# Max number of messages of a batch classified at the same time by the LLM
+# entailment classifier
+URGENCY_DETECTION_BATCH_CONCURRENCY = os.environ.get(
+    "URGENCY_DETECTION_BATCH_CONCURRENCY", 8
+)
@@ -12,6 +12,7 @@ from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import ARRAY
 
 from ..models import Base, JSONDict
+from ..utils import generate_secret_key
 from .schemas import UrgencyQuery, UrgencyResponse
 
 
@@ -92,6 +93,46 @@ async def save_urgency_query_to_db(
     return urgency_query_db
 
 
+async def save_urgency_queries_to_db(
+    user_id: int,
+    urgency_queries: List[UrgencyQuery],
+    asession: AsyncSession,
+) -> List[UrgencyQueryDB]:
+    """Saves user queries to the database in a single transaction, each with its own
+    feedback secret key.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user requesting to save the urgency queries to the database.
+    urgency_queries
+        The urgency queries to save to the database.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    List[UrgencyQueryDB]
+        The urgency query objects that were saved to the database, in the same
+        order.
+    """
+
+    message_datetime_utc = datetime.now(timezone.utc)
+    urgency_query_dbs = [
+        UrgencyQueryDB(
+            user_id=user_id,
+            feedback_secret_key=generate_secret_key(),
+            message_datetime_utc=message_datetime_utc,
+            **urgency_query.model_dump(),
+        )
+        for urgency_query in urgency_queries
+    ]
+    asession.add_all(urgency_query_dbs)
+    # the IDs are set by the flush, and the session doesn't expire them on commit
+    await asession.commit()
+    return urgency_query_dbs
+
+
 async def check_secret_key_match(
     secret_key: str, query_id: int, asession: AsyncSession
 ) -> bool:
@@ -198,3 +239,42 @@ async def save_urgency_response_to_db(
     await asession.commit()
     await asession.refresh(urgency_query_responses_db)
     return urgency_query_responses_db
+
+
+async def save_urgency_responses_to_db(
+    urgency_query_dbs: List[UrgencyQueryDB],
+    responses: List[UrgencyResponse],
+    asession: AsyncSession,
+) -> List[UrgencyResponseDB]:
+    """Saves the responses to user queries to the database in a single transaction.
+
+    Parameters
+    ----------
+    urgency_query_dbs
+        The urgency query database objects.
+    responses
+        The urgency response objects to save to the database, in the same order.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    List[UrgencyResponseDB]
+        The urgency response objects that were saved to the database.
+    """
+
+    response_datetime_utc = datetime.now(timezone.utc)
+    urgency_response_dbs = [
+        UrgencyResponseDB(
+            query_id=urgency_query_db.urgency_query_id,
+            user_id=urgency_query_db.user_id,
+            is_urgent=response.is_urgent,
+            details=response.model_dump()["details"],
+            matched_rules=response.matched_rules,
+            response_datetime_utc=response_datetime_utc,
+        )
+        for urgency_query_db, response in zip(urgency_query_dbs, responses)
+    ]
+    asession.add_all(urgency_response_dbs)
+    await asession.commit()
+    return urgency_response_dbs
@@ -1,26 +1,41 @@
 """This module contains the FastAPI router for the urgency detection endpoints."""
 
-from typing import Callable
+import asyncio
+from typing import Callable, Dict, List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
+from fastapi.requests import Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..auth.dependencies import authenticate_key, rate_limiter
+from ..auth.dependencies import authenticate_key, consume_api_calls, rate_limiter
 from ..database import get_async_session
 from ..llm_call.entailment import detect_urgency
 from ..urgency_rules.models import (
     get_cosine_distances_from_rules,
+    get_cosine_distances_from_rules_batch,
     get_urgency_rules_from_db,
 )
-from ..users.models import UserDB
+from ..urgency_rules.schemas import UrgencyRuleCosineDistance
+from ..users.schemas import UserIdentity
 from ..utils import generate_secret_key, setup_logger
 from .config import (
     URGENCY_CLASSIFIER,
+    URGENCY_DETECTION_BATCH_CONCURRENCY,
     URGENCY_DETECTION_MAX_DISTANCE,
     URGENCY_DETECTION_MIN_PROBABILITY,
 )
-from .models import save_urgency_query_to_db, save_urgency_response_to_db
-from .schemas import UrgencyQuery, UrgencyResponse
+from .models import (
+    save_urgency_queries_to_db,
+    save_urgency_query_to_db,
+    save_urgency_response_to_db,
+    save_urgency_responses_to_db,
+)
+from .schemas import (
+    UrgencyBatchResponse,
+    UrgencyQuery,
+    UrgencyQueryBatch,
+    UrgencyResponse,
+)
 
 TAG_METADATA = {
     "name": "Urgency detection",
@@ -34,7 +49,14 @@ router = APIRouter(
     tags=[TAG_METADATA["name"]],
 )
 
+# Batch endpoints count one API call per item instead of one per request
+batch_router = APIRouter(
+    dependencies=[Depends(authenticate_key)],
+    tags=[TAG_METADATA["name"]],
+)
+
 ALL_URGENCY_CLASSIFIERS = {}
+ALL_URGENCY_BATCH_CLASSIFIERS = {}
 
 
 def urgency_classifier(classifier_func: Callable) -> Callable:
@@ -55,11 +77,32 @@ def urgency_classifier(classifier_func: Callable) -> Callable:
     return classifier_func
 
 
+def urgency_batch_classifier(classifier_name: str) -> Callable[[Callable], Callable]:
+    """Decorator to register the batch version of a classifier function.
+
+    Parameters
+    ----------
+    classifier_name
+        The name of the classifier function.
+
+    Returns
+    -------
+    Callable[[Callable], Callable]
+        The decorator registering the batch classifier function.
+    """
+
+    def decorator(batch_classifier_func: Callable) -> Callable:
+        ALL_URGENCY_BATCH_CLASSIFIERS[classifier_name] = batch_classifier_func
+        return batch_classifier_func
+
+    return decorator
+
+
 @router.post("/urgency-detect", response_model=UrgencyResponse)
 async def classify_text(
     urgency_query: UrgencyQuery,
     asession: AsyncSession = Depends(get_async_session),
-    user_db: UserDB = Depends(authenticate_key),
+    user_db: UserIdentity = Depends(authenticate_key),
 ) -> UrgencyResponse:
     """
     Classify the urgency of a text message
@@ -89,6 +132,57 @@ async def classify_text(
     return urgency_response
 
 
+async def batch_rate_limiter(
+    urgency_query_batch: UrgencyQueryBatch,
+    request: Request,
+    response: Response,
+    user_db: UserIdentity = Depends(authenticate_key),
+) -> None:
+    """
+    Rate limiter for the batch urgency detection, which counts one API call per
+    query.
+    """
+    await consume_api_calls(
+        request, response, user_db, n_calls=len(urgency_query_batch.queries)
+    )
+
+
+@batch_router.post(
+    "/urgency-detect-batch",
+    response_model=UrgencyBatchResponse,
+    dependencies=[Depends(batch_rate_limiter)],
+)
+async def classify_text_batch(
+    urgency_query_batch: UrgencyQueryBatch,
+    asession: AsyncSession = Depends(get_async_session),
+    user_db: UserIdentity = Depends(authenticate_key),
+) -> UrgencyBatchResponse:
+    """
+    Classify the urgency of many text messages in one call. Each message counts as
+    one API call.
+    """
+    urgency_queries = urgency_query_batch.queries
+    urgency_query_dbs = await save_urgency_queries_to_db(
+        user_id=user_db.user_id, urgency_queries=urgency_queries, asession=asession
+    )
+
+    batch_classifier = ALL_URGENCY_BATCH_CLASSIFIERS.get(URGENCY_CLASSIFIER)
+    if not batch_classifier:
+        raise ValueError(f"Invalid urgency classifier: {URGENCY_CLASSIFIER}")
+
+    urgency_responses = await batch_classifier(
+        user_id=user_db.user_id, urgency_queries=urgency_queries, asession=asession
+    )
+
+    await save_urgency_responses_to_db(
+        urgency_query_dbs=urgency_query_dbs,
+        responses=urgency_responses,
+        asession=asession,
+    )
+
+    return UrgencyBatchResponse(responses=urgency_responses)
+
+
 @urgency_classifier
 async def cosine_distance_classifier(
     user_id: int,
@@ -117,6 +211,53 @@ async def cosine_distance_classifier(
         message_text=urgency_query.message_text,
         asession=asession,
     )
+    return _get_cosine_distance_response(cosine_distances)
+
+
+@urgency_batch_classifier("cosine_distance_classifier")
+async def cosine_distance_batch_classifier(
+    user_id: int,
+    urgency_queries: List[UrgencyQuery],
+    asession: AsyncSession,
+) -> List[UrgencyResponse]:
+    """Classify the urgency of many text messages using cosine distance.
+
+    All the messages are scored against the rules with a single matrix product,
+    see `get_cosine_distances_from_rules_batch`.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user requesting to classify the urgency of the text messages.
+    urgency_queries
+        The urgency queries to classify.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    List[UrgencyResponse]
+        The urgency response objects, in the same order.
+    """
+
+    cosine_distances = await get_cosine_distances_from_rules_batch(
+        user_id=user_id,
+        message_texts=[urgency_query.message_text for urgency_query in urgency_queries],
+        asession=asession,
+    )
+    return [
+        _get_cosine_distance_response(message_distances)
+        for message_distances in cosine_distances
+    ]
+
+
+def _get_cosine_distance_response(
+    cosine_distances: Dict[int, UrgencyRuleCosineDistance],
+) -> UrgencyResponse:
+    """
+    Build the response of the cosine distance classifier from the distances of the
+    rules to the message
+    """
     matched_rules = []
     for rule in cosine_distances.values():
         if float(rule.distance) < float(URGENCY_DETECTION_MAX_DISTANCE):
@@ -153,15 +294,75 @@ async def llm_entailment_classifier(
     """
 
     rules = await get_urgency_rules_from_db(user_id=user_id, asession=asession)
-    metadata = {"trace_user_id": "user_id-" + str(user_id)}
     urgency_rules = [rule.urgency_rule_text for rule in rules]
 
+    return await _classify_with_llm_entailment(
+        user_id=user_id,
+        urgency_rules=urgency_rules,
+        message_text=urgency_query.message_text,
+    )
+
+
+@urgency_batch_classifier("llm_entailment_classifier")
+async def llm_entailment_batch_classifier(
+    user_id: int,
+    urgency_queries: List[UrgencyQuery],
+    asession: AsyncSession,
+) -> List[UrgencyResponse]:
+    """Classify the urgency of many text messages using LLM entailment.
+
+    The rules are read once, and at most `URGENCY_DETECTION_BATCH_CONCURRENCY`
+    messages are classified at the same time.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user requesting to classify the urgency of the text messages.
+    urgency_queries
+        The urgency queries to classify.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    List[UrgencyResponse]
+        The urgency response objects, in the same order.
+    """
+
+    rules = await get_urgency_rules_from_db(user_id=user_id, asession=asession)
+    urgency_rules = [rule.urgency_rule_text for rule in rules]
+    semaphore = asyncio.Semaphore(int(URGENCY_DETECTION_BATCH_CONCURRENCY))
+
+    async def _classify(urgency_query: UrgencyQuery) -> UrgencyResponse:
+        async with semaphore:
+            return await _classify_with_llm_entailment(
+                user_id=user_id,
+                urgency_rules=urgency_rules,
+                message_text=urgency_query.message_text,
+            )
+
+    return list(
+        await asyncio.gather(
+            *[_classify(urgency_query) for urgency_query in urgency_queries]
+        )
+    )
+
+
+async def _classify_with_llm_entailment(
+    user_id: int, urgency_rules: List[str], message_text: str
+) -> UrgencyResponse:
+    """
+    Classify the urgency of a text message against the given rules using LLM
+    entailment
+    """
+    metadata = {"trace_user_id": "user_id-" + str(user_id)}
+
     if len(urgency_rules) == 0:
         return UrgencyResponse(is_urgent=False, matched_rules=[], details={})
 
     result = await detect_urgency(
         urgency_rules=urgency_rules,
-        message=urgency_query.message_text,
+        message=message_text,
         metadata=metadata,
     )
 
@@ -4,6 +4,7 @@ from pydantic import BaseModel, ConfigDict, Field
 
 from ..llm_call.entailment import UrgencyDetectionEntailment
 from ..urgency_rules.schemas import UrgencyRuleCosineDistance
+from .config import URGENCY_DETECTION_BATCH_MAX_SIZE
 
 
 class UrgencyQuery(BaseModel):
@@ -21,6 +22,16 @@ class UrgencyQuery(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UrgencyQueryBatch(BaseModel):
+    """
+    Batch of queries for urgency detection
+    """
+
+    queries: List[UrgencyQuery] = Field(
+        ..., min_length=1, max_length=int(URGENCY_DETECTION_BATCH_MAX_SIZE)
+    )
+
+
 class UrgencyResponse(BaseModel):
     """
     Urgency detection response class
@@ -74,3 +85,11 @@ class UrgencyResponse(BaseModel):
             ]
         },
     )
+
+
+class UrgencyBatchResponse(BaseModel):
+    """
+    Urgency detection responses to a batch of queries, in the same order
+    """
+
+    responses: List[UrgencyResponse]
@@ -0,0 +1,14 @@
+import os
+
+# In-process cache of each user's urgency rule embeddings, used for urgency
+# detection with the cosine distance classifier. If "False", the rules are loaded
+# from the database on every call.
+URGENCY_RULE_MATRIX_CACHE_ENABLED = os.environ.get(
+    "URGENCY_RULE_MATRIX_CACHE_ENABLED", "True"
+)
+# Changes made by other workers are normally announced over Redis pub/sub. While a
+# worker isn't subscribed (e.g. Redis is down), its cached rules expire after this
+# long instead.
+URGENCY_RULE_MATRIX_TTL_SECONDS = os.environ.get(
+    "URGENCY_RULE_MATRIX_TTL_SECONDS", "60"
+)
@@ -0,0 +1,277 @@
+"""This module contains the in-process cache of each user's urgency rule embeddings,
+used to score messages against the rules with a single matrix product.
+
+Each user's rules have a version in Redis. When a worker changes them, it increments
+the version and publishes it on a Redis channel, and every worker drops its copy of
+the rules if it is older. A copy is only kept if the version didn't change while the
+rules were loading, since the announcement may have arrived before it was stored.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from ..utils import setup_logger
+from .config import URGENCY_RULE_MATRIX_CACHE_ENABLED, URGENCY_RULE_MATRIX_TTL_SECONDS
+
+logger = setup_logger()
+
+# A rule row needs `urgency_rule_text` and `urgency_rule_vector` (e.g.
+# `UrgencyRuleDB`)
+RuleRow = Any
+RuleLoader = Callable[[], Awaitable[Sequence[RuleRow]]]
+
+
+@dataclass
+class RuleMatrix:
+    """
+    Urgency rules of one user, with their embeddings as the rows of an
+    L2-normalized float32 matrix
+    """
+
+    rule_texts: List[str]
+    matrix: np.ndarray
+    version: int
+    loaded_at: float
+
+    def get_cosine_distances(self, message_embeddings: List[List[float]]) -> np.ndarray:
+        """
+        Get the cosine distances between each rule and each message, as a
+        (rules x messages) matrix
+        """
+        if not self.rule_texts:
+            return np.empty((0, len(message_embeddings)), dtype=np.float32)
+        messages = _normalize_rows(np.asarray(message_embeddings))
+        return 1.0 - self.matrix @ messages.T
+
+
+class RuleMatrixCache:
+    """
+    Per-user rule matrices, loaded lazily from the database.
+
+    The worker changing a user's rules drops their matrix right away and announces
+    the new version of the rules over Redis pub/sub, so that other workers drop
+    theirs too. While the cache isn't subscribed to the announcements (before
+    `start`, or while Redis is unavailable), matrices expire after `ttl_seconds`.
+    """
+
+    CHANNEL = "urgency-rule-changes"
+
+    def __init__(self, ttl_seconds: float, enabled: bool = True) -> None:
+        """
+        Initialize the cache
+        """
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.redis: aioredis.Redis | None = None
+        self._matrices: Dict[int, RuleMatrix] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._is_subscribed = False
+
+    @property
+    def is_subscribed(self) -> bool:
+        """
+        Whether the cache is subscribed to the changes announced by other workers
+        """
+        return self._is_subscribed
+
+    @staticmethod
+    def get_version_key(user_id: int) -> str:
+        """
+        Get the Redis key of the version of the user's rules
+        """
+        return f"urgency-rule-version:{user_id}"
+
+    def start(self, redis: aioredis.Redis) -> None:
+        """
+        Start listening to the changes announced by other workers
+        """
+        self.redis = redis
+        if self.enabled and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """
+        Stop listening to the changes announced by other workers
+        """
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self._is_subscribed = False
+        self.redis = None
+
+    async def get(self, user_id: int, load: RuleLoader) -> RuleMatrix:
+        """
+        Get the user's rule matrix, loading it with `load` if needed.
+
+        `load()` must return all the rules of the user.
+        """
+        if not self.enabled:
+            return self._build(await load(), version=0)
+
+        rule_matrix = self._matrices.get(user_id)
+        if rule_matrix is not None and not self._is_expired(rule_matrix):
+            return rule_matrix
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            rule_matrix = self._matrices.get(user_id)
+            if rule_matrix is not None and not self._is_expired(rule_matrix):
+                return rule_matrix
+            # a change made while the rules load is announced before the matrix
+            # is stored, so only store it if the version didn't change
+            version = await self._get_version(user_id)
+            rule_matrix = self._build(await load(), version=version or 0)
+            if version is not None and version == await self._get_version(user_id):
+                self._matrices[user_id] = rule_matrix
+        if user_id not in self._matrices:
+            self._drop(user_id)
+        return rule_matrix
+
+    async def invalidate(self, user_id: int) -> None:
+        """
+        Drop the user's rule matrix after a change to their rules, and announce the
+        change to the other workers
+        """
+        self._drop(user_id)
+        if self.redis is None:
+            return
+        try:
+            version = await self.redis.incr(self.get_version_key(user_id))
+            await self.redis.publish(self.CHANNEL, f"{user_id}:{version}")
+        except RedisError as e:
+            logger.warning(f"Urgency rule change announcement failed: {e}")
+
+    def handle_change(self, message: bytes | str) -> None:
+        """
+        Drop the rule matrix of a change announcement ("<user_id>:<version>") if it
+        is older than the announced version
+        """
+        if isinstance(message, bytes):
+            message = message.decode()
+        user_id, version = (int(part) for part in message.split(":"))
+        rule_matrix = self._matrices.get(user_id)
+        if rule_matrix is not None and rule_matrix.version < version:
+            self._drop(user_id)
+
+    def clear(self) -> None:
+        """
+        Drop all the rule matrices
+        """
+        for user_id in set(self._matrices) | set(self._locks):
+            self._drop(user_id)
+
+    def _drop(self, user_id: int) -> None:
+        """
+        Drop the user's rule matrix, and their lock unless a load holds it
+        """
+        self._matrices.pop(user_id, None)
+        lock = self._locks.get(user_id)
+        if lock is not None and not lock.locked():
+            del self._locks[user_id]
+
+    def _is_expired(self, rule_matrix: RuleMatrix) -> bool:
+        """
+        Whether the rule matrix may be out of date. Only matrices loaded while not
+        subscribed to the change announcements expire.
+        """
+        if self._is_subscribed:
+            return False
+        return time.monotonic() - rule_matrix.loaded_at > self.ttl_seconds
+
+    @staticmethod
+    def _build(rules: Sequence[RuleRow], version: int) -> RuleMatrix:
+        """
+        Build the rule matrix of the rules
+        """
+        return RuleMatrix(
+            rule_texts=[rule.urgency_rule_text for rule in rules],
+            matrix=(
+                _normalize_rows(
+                    np.asarray([rule.urgency_rule_vector for rule in rules])
+                )
+                if rules
+                else np.empty((0, 0), dtype=np.float32)
+            ),
+            version=version,
+            loaded_at=time.monotonic(),
+        )
+
+    async def _get_version(self, user_id: int) -> Optional[int]:
+        """
+        Get the current version of the user's rules, 0 without Redis and `None` if
+        it can't be read
+        """
+        if self.redis is None:
+            return 0
+        try:
+            version = await self.redis.get(self.get_version_key(user_id))
+        except RedisError as e:
+            logger.warning(f"Urgency rule version read failed: {e}")
+            return None
+        return int(version or 0)
+
+    async def _listen(self) -> None:
+        """
+        Handle the change announcements until cancelled, subscribing again after
+        Redis errors
+        """
+        assert self.redis is not None
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.CHANNEL)
+                # changes may have been missed while not subscribed
+                self.clear()
+                self._is_subscribed = True
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        self.handle_change(message["data"])
+                    except ValueError:
+                        logger.warning(
+                            "Malformed urgency rule change announcement: "
+                            f"{message['data']!r}"
+                        )
+            except RedisError as e:
+                logger.warning(f"Urgency rule change subscription failed: {e}")
+            finally:
+                self._is_subscribed = False
+                await pubsub.reset()
+            await asyncio.sleep(1)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize the rows of a matrix as float32, leaving zero rows as they are
+    """
+    matrix = matrix.astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.ascontiguousarray(matrix / np.where(norms > 0, norms, 1.0))
+
+
+_RULE_MATRIX_CACHE = RuleMatrixCache(
+    ttl_seconds=float(URGENCY_RULE_MATRIX_TTL_SECONDS),
+    enabled=URGENCY_RULE_MATRIX_CACHE_ENABLED == "True",
+)
+
+
+def get_rule_matrix_cache() -> RuleMatrixCache:
+    """Return the global rule matrix cache.
+
+    :returns:
+        The global rule matrix cache.
+    """
+
+    return _RULE_MATRIX_CACHE
@@ -3,13 +3,15 @@
 """
 
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 
+import numpy as np
 from pgvector.sqlalchemy import Vector
 from sqlalchemy import (
     JSON,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     delete,
@@ -20,7 +22,9 @@ from sqlalchemy.orm import Mapped, mapped_column
 
 from ..contents.config import PGVECTOR_VECTOR_SIZE
 from ..models import Base, JSONDict
-from ..utils import embedding
+from ..tombstones import add_tombstone
+from ..utils import embedding, embedding_batch
+from .matrix import RuleMatrix, get_rule_matrix_cache
 from .schemas import UrgencyRuleCosineDistance, UrgencyRuleCreate
 
 
@@ -33,6 +37,10 @@ class UrgencyRuleDB(Base):
 
     __tablename__ = "urgency_rule"
 
+    __table_args__ = (
+        Index("urgency_rule_user_id_updated_idx", "user_id", "updated_datetime_utc"),
+    )
+
     urgency_rule_id: Mapped[int] = mapped_column(
         Integer, primary_key=True, nullable=False
     )
@@ -101,6 +109,7 @@ async def save_urgency_rule_to_db(
     asession.add(urgency_rule_db)
     await asession.commit()
     await asession.refresh(urgency_rule_db)
+    await get_rule_matrix_cache().invalidate(user_id)
 
     return urgency_rule_db
 
@@ -148,6 +157,7 @@ async def update_urgency_rule_in_db(
     urgency_rule_db = await asession.merge(urgency_rule_db)
     await asession.commit()
     await asession.refresh(urgency_rule_db)
+    await get_rule_matrix_cache().invalidate(user_id)
 
     return urgency_rule_db
 
@@ -155,7 +165,7 @@ async def update_urgency_rule_in_db(
 async def delete_urgency_rule_from_db(
     user_id: int, urgency_rule_id: int, asession: AsyncSession
 ) -> None:
-    """Delete urgency rule from the database.
+    """Delete urgency rule from the database, leaving a tombstone for the data API.
 
     Parameters
     ----------
@@ -172,8 +182,16 @@ async def delete_urgency_rule_from_db(
         .where(UrgencyRuleDB.user_id == user_id)
         .where(UrgencyRuleDB.urgency_rule_id == urgency_rule_id)
     )
-    await asession.execute(stmt)
+    result = await asession.execute(stmt)
+    if result.rowcount:
+        await add_tombstone(
+            user_id=user_id,
+            record_type="urgency_rule",
+            record_id=urgency_rule_id,
+            asession=asession,
+        )
     await asession.commit()
+    await get_rule_matrix_cache().invalidate(user_id)
 
 
 async def get_urgency_rule_by_id_from_db(
@@ -249,6 +267,10 @@ async def get_cosine_distances_from_rules(
 ) -> dict[int, UrgencyRuleCosineDistance]:
     """Get cosine distances from urgency rules.
 
+    The message is scored against the user's cached rule matrix (see
+    `RuleMatrixCache`), so the rules are only read from the database when they
+    aren't cached.
+
     Parameters
     ----------
     user_id
@@ -261,32 +283,85 @@ async def get_cosine_distances_from_rules(
     Returns
     -------
     Dict[int, UrgencyRuleCosineDistance]
-        The dictionary of urgency rules and their cosine distances from `message_text`.
+        The dictionary of urgency rules and their cosine distances from `message_text`,
+        closest first.
     """
 
+    rule_matrix = await _get_rule_matrix(user_id, asession)
+    if not rule_matrix.rule_texts:
+        return {}
+
     metadata = {
         "trace_user_id": "user_id-" + str(user_id),
         "generation_name": "get_cosine_distances_from_rules",
     }
     message_vector = await embedding(message_text, metadata=metadata)
-    query = (
-        select(
-            UrgencyRuleDB,
-            UrgencyRuleDB.urgency_rule_vector.cosine_distance(message_vector).label(
-                "distance"
-            ),
-        )
-        .where(UrgencyRuleDB.user_id == user_id)
-        .order_by("distance")
-    )
+    distances = rule_matrix.get_cosine_distances([message_vector])
 
-    search_result = (await asession.execute(query)).all()
+    return _rank_rules(rule_matrix, distances[:, 0])
 
-    results_dict = {}
-    for i, r in enumerate(search_result):
-        results_dict[i] = UrgencyRuleCosineDistance(
-            urgency_rule=r[0].urgency_rule_text,
-            distance=r[1],
-        )
 
-    return results_dict
+async def get_cosine_distances_from_rules_batch(
+    user_id: int,
+    message_texts: List[str],
+    asession: AsyncSession,
+) -> List[dict[int, UrgencyRuleCosineDistance]]:
+    """Get cosine distances from urgency rules for many messages.
+
+    The messages are embedded together and scored against the user's cached rule
+    matrix (see `RuleMatrixCache`) with a single matrix product.
+
+    Parameters
+    ----------
+    user_id
+        The ID of the user requesting the cosine distances from the urgency rules.
+    message_texts
+        The message texts to compare against the urgency rules.
+    asession
+        `AsyncSession` object for database transactions.
+
+    Returns
+    -------
+    List[Dict[int, UrgencyRuleCosineDistance]]
+        For each message, in the same order, the dictionary of urgency rules and
+        their cosine distances from the message, closest first.
+    """
+
+    rule_matrix = await _get_rule_matrix(user_id, asession)
+    if not rule_matrix.rule_texts:
+        return [{} for _ in message_texts]
+
+    metadata = {
+        "trace_user_id": "user_id-" + str(user_id),
+        "generation_name": "get_cosine_distances_from_rules_batch",
+    }
+    message_vectors = await embedding_batch(message_texts, metadata=metadata)
+    distances = rule_matrix.get_cosine_distances(message_vectors)
+
+    return [
+        _rank_rules(rule_matrix, message_distances) for message_distances in distances.T
+    ]
+
+
+async def _get_rule_matrix(user_id: int, asession: AsyncSession) -> RuleMatrix:
+    """Get the user's rule matrix from the cache, loading their rules if needed."""
+
+    async def load() -> List[UrgencyRuleDB]:
+        return await get_urgency_rules_from_db(user_id=user_id, asession=asession)
+
+    return await get_rule_matrix_cache().get(user_id, load)
+
+
+def _rank_rules(
+    rule_matrix: RuleMatrix, message_distances: np.ndarray
+) -> dict[int, UrgencyRuleCosineDistance]:
+    """Get the rules and their distances from a message, closest first."""
+
+    order = np.argsort(message_distances, kind="stable")
+    return {
+        i: UrgencyRuleCosineDistance(
+            urgency_rule=rule_matrix.rule_texts[rule],
+            distance=float(message_distances[rule]),
+        )
+        for i, rule in enumerate(order)
+    }
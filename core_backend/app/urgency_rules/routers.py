@@ -2,11 +2,12 @@
 
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, Response, status
 from fastapi.exceptions import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.dependencies import get_current_user
+from ..catalog import bump_catalog_version, get_not_modified_response
 from ..database import get_async_session
 from ..users.models import UserDB
 from ..utils import setup_logger
@@ -33,6 +34,7 @@ logger = setup_logger(__name__)
 async def create_urgency_rule(
     urgency_rule: UrgencyRuleCreate,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
     asession: AsyncSession = Depends(get_async_session),
 ) -> UrgencyRuleRetrieve:
     """
@@ -41,6 +43,7 @@ async def create_urgency_rule(
     urgency_rule_db = await save_urgency_rule_to_db(
         user_id=user_db.user_id, urgency_rule=urgency_rule, asession=asession
     )
+    await bump_catalog_version(request.app.state.redis, user_db.user_id)
     return _convert_record_to_schema(urgency_rule_db)
 
 
@@ -69,6 +72,7 @@ async def get_urgency_rule(
 async def delete_urgency_rule(
     urgency_rule_id: int,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
     asession: AsyncSession = Depends(get_async_session),
 ) -> None:
     """
@@ -86,6 +90,7 @@ async def delete_urgency_rule(
     await delete_urgency_rule_from_db(
         user_id=user_db.user_id, urgency_rule_id=urgency_rule_id, asession=asession
     )
+    await bump_catalog_version(request.app.state.redis, user_db.user_id)
 
 
 @router.put("/{urgency_rule_id}", response_model=UrgencyRuleRetrieve)
@@ -93,6 +98,7 @@ async def update_urgency_rule(
     urgency_rule_id: int,
     urgency_rule: UrgencyRuleCreate,
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
     asession: AsyncSession = Depends(get_async_session),
 ) -> UrgencyRuleRetrieve:
     """
@@ -116,17 +122,24 @@ async def update_urgency_rule(
         urgency_rule=urgency_rule,
         asession=asession,
     )
+    await bump_catalog_version(request.app.state.redis, user_db.user_id)
     return _convert_record_to_schema(urgency_rule_db)
 
 
 @router.get("/", response_model=list[UrgencyRuleRetrieve])
 async def get_urgency_rules(
     user_db: Annotated[UserDB, Depends(get_current_user)],
+    request: Request,
+    response: Response,
     asession: AsyncSession = Depends(get_async_session),
-) -> list[UrgencyRuleRetrieve]:
+) -> list[UrgencyRuleRetrieve] | Response:
     """
-    Get all urgency rules
+    Get all urgency rules. Send the `ETag` of the response back in `If-None-Match`
+    to get a 304 response if the rules haven't changed.
     """
+    not_modified = await get_not_modified_response(request, response, user_db.user_id)
+    if not_modified is not None:
+        return not_modified
     urgency_rules_db = await get_urgency_rules_from_db(
         user_id=user_db.user_id, asession=asession
     )
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.dependencies import get_current_user
 from ..database import get_async_session
+from ..users.cache import get_user_cache
 from ..users.models import (
     UserAlreadyExistsError,
     UserDB,
@@ -96,6 +97,7 @@ async def get_new_api_key(
     """
 
     new_api_key = generate_key()
+    old_hashed_api_key = user_db.hashed_api_key
 
     try:
         # this is neccesarry to attach the user_db to the session
@@ -105,6 +107,8 @@ async def get_new_api_key(
             new_api_key=new_api_key,
             asession=asession,
         )
+        # the old key must stop working right away
+        await get_user_cache().invalidate(old_hashed_api_key)
         return KeyResponse(
             username=user_db.username,
             new_api_key=new_api_key,
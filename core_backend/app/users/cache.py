@@ -0,0 +1,150 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from ..config import (
+    USER_CACHE_LOCAL_TTL_SECONDS,
+    USER_CACHE_MAX_SIZE,
+    USER_CACHE_TTL_SECONDS,
+)
+from ..utils import setup_logger
+from .schemas import UserIdentity
+
+logger = setup_logger()
+
+
+class UserCache:
+    """
+    Two-tier TTL cache of hashed API key -> `UserIdentity`: a short-lived in-process
+    tier in front of a shared Redis tier.
+
+    Only the fields in `UserIdentity` are cached, so no password material is ever
+    written to Redis. Entries are invalidated explicitly with `invalidate` when a
+    user's API key or quotas change. Other workers may keep serving their in-process
+    copy for up to `local_ttl_seconds` afterwards. A TTL of 0 disables the
+    corresponding tier. Redis errors are logged and treated as cache misses.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int, local_ttl_seconds: int) -> None:
+        """
+        Initialize the cache
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.local_ttl_seconds = local_ttl_seconds
+        self.redis: aioredis.Redis | None = None
+        self._local: OrderedDict[str, Tuple[float, UserIdentity]] = OrderedDict()
+
+    def set_redis(self, redis: aioredis.Redis | None) -> None:
+        """
+        Set (or unset) the Redis connection for the shared tier
+        """
+        self.redis = redis
+
+    @staticmethod
+    def get_redis_key(hashed_api_key: str) -> str:
+        """
+        Get the Redis key for the hashed API key
+        """
+        return f"user-identity:{hashed_api_key}"
+
+    async def get(self, hashed_api_key: str) -> Optional[UserIdentity]:
+        """
+        Get the user for the hashed API key, or `None` if it is not cached
+        """
+        entry = self._local.get(hashed_api_key)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                return user
+            del self._local[hashed_api_key]
+
+        redis = self._get_shared_tier()
+        if redis is None:
+            return None
+        try:
+            user_json = await redis.get(self.get_redis_key(hashed_api_key))
+        except RedisError as e:
+            logger.warning(f"User cache read failed: {e}")
+            return None
+        if user_json is None:
+            return None
+
+        user = UserIdentity.model_validate_json(user_json)
+        self._set_local(hashed_api_key, user)
+        return user
+
+    async def set(self, hashed_api_key: str, user: UserIdentity) -> None:
+        """
+        Save the user under the hashed API key
+        """
+        self._set_local(hashed_api_key, user)
+        redis = self._get_shared_tier()
+        if redis is not None:
+            try:
+                await redis.set(
+                    self.get_redis_key(hashed_api_key),
+                    user.model_dump_json(),
+                    ex=self.ttl_seconds,
+                )
+            except RedisError as e:
+                logger.warning(f"User cache write failed: {e}")
+
+    async def invalidate(self, hashed_api_key: str | None) -> None:
+        """
+        Remove the user cached under the hashed API key from both tiers
+        """
+        if hashed_api_key is None:
+            return
+        self._local.pop(hashed_api_key, None)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(self.get_redis_key(hashed_api_key))
+            except RedisError as e:
+                logger.warning(f"User cache invalidation failed: {e}")
+
+    def clear(self) -> None:
+        """
+        Clear the in-process tier
+        """
+        self._local.clear()
+
+    def _get_shared_tier(self) -> aioredis.Redis | None:
+        """
+        Get the Redis connection if the shared tier is enabled, otherwise `None`
+        """
+        if self.ttl_seconds <= 0:
+            return None
+        return self.redis
+
+    def _set_local(self, hashed_api_key: str, user: UserIdentity) -> None:
+        """
+        Save the user to the in-process tier, evicting the oldest if full
+        """
+        if self.local_ttl_seconds <= 0:
+            return
+        expires_at = time.monotonic() + self.local_ttl_seconds
+        self._local[hashed_api_key] = (expires_at, user)
+        self._local.move_to_end(hashed_api_key)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+
+_USER_CACHE = UserCache(
+    max_size=int(USER_CACHE_MAX_SIZE),
+    ttl_seconds=int(USER_CACHE_TTL_SECONDS),
+    local_ttl_seconds=int(USER_CACHE_LOCAL_TTL_SECONDS),
+)
+
+
+def get_user_cache() -> UserCache:
+    """Return the global API key -> user cache.
+
+    :returns:
+        The global user cache.
+    """
+
+    return _USER_CACHE
@@ -41,3 +41,17 @@ class UserRetrieve(BaseModel):
     updated_datetime_utc: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class UserIdentity(BaseModel):
+    """
+    Pydantic model for the user making an API key request, with only the fields
+    needed to serve and rate limit it
+    """
+
+    user_id: int
+    username: str
+    content_quota: Optional[int]
+    api_daily_quota: Optional[int]
+
+    model_config = ConfigDict(from_attributes=True, frozen=True)
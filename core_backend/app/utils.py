@@ -1,10 +1,12 @@
 """This module contains utility functions for the backend application."""
 
 # pylint: disable=global-statement
+import asyncio
 import hashlib
 import logging
 import os
 import secrets
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from logging import Logger
 from typing import List, Optional
@@ -12,10 +14,17 @@ from uuid import uuid4
 
 import aiohttp
 import litellm
+import numpy as np
 from litellm import aembedding
 from redis import asyncio as aioredis
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
 
 from .config import (
+    EMBEDDING_BATCH_CONCURRENCY,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_MAX_SIZE,
+    EMBEDDING_CACHE_TTL_SECONDS,
     LANGFUSE,
     LITELLM_API_KEY,
     LITELLM_ENDPOINT,
@@ -121,8 +130,111 @@ def generate_secret_key() -> str:
     return uuid4().hex
 
 
+class EmbeddingCache:
+    """
+    Two-tier cache for embeddings: an in-process LRU in front of a shared Redis tier.
+
+    Keys are the SHA-256 hash of the model name and the text. Vectors are stored as
+    float32 bytes. The Redis tier is only used once a connection has been set with
+    `set_redis`; Redis errors are logged and treated as cache misses.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int) -> None:
+        """
+        Initialize the cache
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.redis: aioredis.Redis | None = None
+        self._lru: OrderedDict[str, bytes] = OrderedDict()
+
+    def set_redis(self, redis: aioredis.Redis | None) -> None:
+        """
+        Set (or unset) the Redis connection for the shared tier
+        """
+        self.redis = redis
+
+    @staticmethod
+    def get_key(model: str, text: str) -> str:
+        """
+        Get the cache key for the text embedded with the given model
+        """
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[List[float]]:
+        """
+        Get the embedding from the cache, or `None` if it is not cached
+        """
+        vector_bytes = self._lru.get(key)
+        if vector_bytes is not None:
+            self._lru.move_to_end(key)
+        elif self.redis is not None:
+            try:
+                cached_bytes = await self.redis.get(f"embedding:{key}")
+            except RedisError as e:
+                logger.warning(f"Embedding cache read failed: {e}")
+                cached_bytes = None
+            if isinstance(cached_bytes, bytes):
+                vector_bytes = cached_bytes
+                self._set_lru(key, vector_bytes)
+
+        if vector_bytes is None:
+            return None
+        return np.frombuffer(vector_bytes, dtype=np.float32).tolist()
+
+    async def set(self, key: str, vector: List[float]) -> List[float]:
+        """
+        Save the embedding to the cache. Returns the embedding at float32 precision,
+        which is what later cache hits return.
+        """
+        vector_bytes = np.asarray(vector, dtype=np.float32).tobytes()
+        self._set_lru(key, vector_bytes)
+        if self.redis is not None:
+            try:
+                await self.redis.set(
+                    f"embedding:{key}", vector_bytes, ex=self.ttl_seconds
+                )
+            except RedisError as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+        return np.frombuffer(vector_bytes, dtype=np.float32).tolist()
+
+    def clear(self) -> None:
+        """
+        Clear the in-process tier
+        """
+        self._lru.clear()
+
+    def _set_lru(self, key: str, vector_bytes: bytes) -> None:
+        """
+        Save the embedding to the in-process tier, evicting the oldest if full
+        """
+        self._lru[key] = vector_bytes
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+
+_EMBEDDING_CACHE = EmbeddingCache(
+    max_size=int(EMBEDDING_CACHE_MAX_SIZE),
+    ttl_seconds=int(EMBEDDING_CACHE_TTL_SECONDS),
+)
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the global embedding cache.
+
+    :returns:
+        The global embedding cache.
+    """
+
+    return _EMBEDDING_CACHE
+
+
 async def embedding(text_to_embed: str, metadata: Optional[dict] = None) -> List[float]:
     """Get embedding for the given text.
+
+    Embeddings are cached by model and text, see `EmbeddingCache`.
+
     Parameters
     ----------
     text_to_embed
@@ -137,6 +249,12 @@ async def embedding(text_to_embed: str, metadata: Optional[dict] = None) -> List
 
     metadata = metadata or {}
 
+    cache = get_embedding_cache()
+    cache_key = cache.get_key(LITELLM_MODEL_EMBEDDING, text_to_embed)
+    cached_embedding = await cache.get(cache_key)
+    if cached_embedding is not None:
+        return cached_embedding
+
     content_embedding = await aembedding(
         model=LITELLM_MODEL_EMBEDDING,
         input=text_to_embed,
@@ -145,7 +263,68 @@ async def embedding(text_to_embed: str, metadata: Optional[dict] = None) -> List
         metadata=metadata,
     )
 
-    return content_embedding.data[0]["embedding"]
+    return await cache.set(cache_key, content_embedding.data[0]["embedding"])
+
+
+async def embedding_batch(
+    texts_to_embed: List[str], metadata: Optional[dict] = None
+) -> List[List[float]]:
+    """Get embeddings for a list of texts.
+
+    Cached texts are not re-embedded. The rest are deduplicated and sent to `LiteLLM`
+    in requests of up to `EMBEDDING_BATCH_SIZE` texts, with at most
+    `EMBEDDING_BATCH_CONCURRENCY` requests in flight.
+
+    Parameters
+    ----------
+    texts_to_embed
+        The texts to embed.
+    metadata
+        Metadata for `LiteLLM` embedding API.
+    Returns
+    -------
+    List[List[float]]
+        The embeddings for the given texts, in the same order.
+    """
+
+    metadata = metadata or {}
+
+    cache = get_embedding_cache()
+    embeddings: dict[str, List[float]] = {}
+    texts_to_request = []
+    for text in dict.fromkeys(texts_to_embed):
+        cached_embedding = await cache.get(cache.get_key(LITELLM_MODEL_EMBEDDING, text))
+        if cached_embedding is not None:
+            embeddings[text] = cached_embedding
+        else:
+            texts_to_request.append(text)
+
+    semaphore = asyncio.Semaphore(int(EMBEDDING_BATCH_CONCURRENCY))
+    batch_size = int(EMBEDDING_BATCH_SIZE)
+
+    async def _embed_chunk(chunk: List[str]) -> None:
+        async with semaphore:
+            response = await aembedding(
+                model=LITELLM_MODEL_EMBEDDING,
+                input=chunk,
+                api_base=LITELLM_ENDPOINT,
+                api_key=LITELLM_API_KEY,
+                metadata=dict(metadata),
+            )
+        for item in response.data:
+            text = chunk[item["index"]]
+            embeddings[text] = await cache.set(
+                cache.get_key(LITELLM_MODEL_EMBEDDING, text), item["embedding"]
+            )
+
+    await asyncio.gather(
+        *[
+            _embed_chunk(texts_to_request[i : i + batch_size])
+            for i in range(0, len(texts_to_request), batch_size)
+        ]
+    )
+
+    return [embeddings[text] for text in texts_to_embed]
 
 
 def setup_logger(
@@ -177,6 +356,9 @@ def setup_logger(
     return logger
 
 
+logger = setup_logger()
+
+
 class HttpClient:
     """
     HTTP client for call other endpoints
@@ -258,13 +440,82 @@ async def update_api_limits(
     """
     Update the api limits for user in Redis
     """
-    now = datetime.now(timezone.utc)
-    next_midnight = (now + timedelta(days=1)).replace(
-        hour=0, minute=0, second=0, microsecond=0
-    )
     key = f"remaining-calls:{username}"
-    expire_at = int(next_midnight.timestamp())
+    expire_at = _get_next_midnight_timestamp()
     await redis.set(key, encode_api_limit(api_daily_quota))
     if api_daily_quota is not None:
 
         await redis.expireat(key, expire_at)
+
+
+# Atomically initialise the counter on a miss (as `update_api_limits` does), then
+# check and decrement it. Returns {allowed, remaining}; remaining is -1 when the
+# user has no daily quota.
+RATE_LIMIT_SCRIPT = """
+local remaining = redis.call('GET', KEYS[1])
+if not remaining then
+    remaining = ARGV[1]
+    redis.call('SET', KEYS[1], remaining)
+    if remaining ~= 'None' then
+        redis.call('EXPIREAT', KEYS[1], ARGV[2])
+    end
+end
+if remaining == 'None' then
+    return {1, -1}
+end
+remaining = tonumber(remaining)
+local n_calls = tonumber(ARGV[3])
+if remaining < n_calls then
+    return {0, math.max(remaining, 0)}
+end
+return {1, redis.call('DECRBY', KEYS[1], n_calls)}
+"""
+
+
+async def consume_api_call(
+    rate_limit_script: AsyncScript,
+    username: str,
+    api_daily_quota: int | None,
+    n_calls: int = 1,
+) -> tuple[bool, int | None]:
+    """
+    Check and decrement the user's remaining API calls for today in a single
+    atomic Redis round-trip.
+
+    Parameters
+    ----------
+    rate_limit_script
+        `RATE_LIMIT_SCRIPT`, registered once with the app's Redis connection.
+    username
+        The user making the call.
+    api_daily_quota
+        The user's daily quota, used to initialise the counter if it has expired.
+    n_calls
+        The number of calls to consume. Either all of them are allowed or none.
+
+    Returns
+    -------
+    tuple[bool, int | None]
+        Whether the calls are allowed, and the number of calls remaining after them
+        (`None` if the user has no daily quota).
+    """
+    allowed, remaining = await rate_limit_script(
+        keys=[f"remaining-calls:{username}"],
+        args=[
+            encode_api_limit(api_daily_quota),
+            _get_next_midnight_timestamp(),
+            n_calls,
+        ],
+    )
+    return bool(allowed), (None if remaining < 0 else remaining)
+
+
+def _get_next_midnight_timestamp() -> int:
+    """
+    Get the timestamp of the next UTC midnight, when daily API limits reset
+    """
+    now = datetime.now(timezone.utc)
+    next_midnight = (now + timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return int(next_midnight.timestamp())
@@ -0,0 +1,245 @@
+"""This module contains the write-behind queue used to persist query responses,
+the content returned for queries and content counters off the request path.
+"""
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import (
+    WRITE_BEHIND_ENABLED,
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+    WRITE_BEHIND_MAX_BATCH_SIZE,
+    WRITE_BEHIND_MAX_QUEUE_SIZE,
+)
+from .contents.counters import get_counter_buffer
+from .contents.models import ContentCounter, apply_content_counter_deltas
+from .database import get_sqlalchemy_async_engine
+from .models import Base
+from .utils import setup_logger
+
+logger = setup_logger()
+
+
+@dataclass
+class _InsertRows:
+    """Rows to insert"""
+
+    rows: List[Base]
+
+
+@dataclass
+class _IncrementCounter:
+    """Increment of a counter on a content"""
+
+    user_id: int
+    content_id: int
+    counter: ContentCounter
+    n: int = 1
+
+
+_WriteItem = _InsertRows | _IncrementCounter
+
+
+class WriteBehindQueue:
+    """
+    Write-behind queue for database writes that don't affect the response.
+
+    Writes are queued and a background task commits them in batches: after the
+    first write arrives it waits up to `flush_interval_seconds` for more (up to
+    `max_batch_size`), then inserts all the rows and applies the summed counter
+    increments with set-based UPDATEs, in a single commit. If a batch fails, its
+    writes are retried one by one so that a single bad write doesn't lose the rest.
+
+    Until `start` is called (or after `stop`, or if the writer has died), writes
+    are done immediately.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int,
+        flush_interval_seconds: float,
+        max_queue_size: int,
+    ) -> None:
+        """
+        Initialize the queue
+        """
+        self.max_batch_size = max_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_queue_size = max_queue_size
+        self._queue: asyncio.Queue[Optional[_WriteItem]] = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """
+        Start the background writer
+        """
+        if self._worker is None:
+            # created here so that it belongs to the running event loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Flush all queued writes and stop the background writer
+        """
+        if self._worker is None:
+            return
+        if self.is_running:
+            await self._queue.put(None)
+            await self._worker
+        self._worker = None
+        # anything left over if the writer died
+        items: List[_WriteItem] = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                items.append(item)
+        if items:
+            await self._write_batch(items)
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Whether the background writer is running
+        """
+        return self._worker is not None and not self._worker.done()
+
+    async def insert(self, rows: List[Base]) -> None:
+        """
+        Queue rows to be inserted
+        """
+        if rows:
+            await self._submit(_InsertRows(rows=rows))
+
+    async def increment_content_counter(
+        self,
+        user_id: int,
+        content_ids: Iterable[int],
+        counter: ContentCounter,
+    ) -> None:
+        """
+        Queue an increment of the given counter for each of the user's contents.
+
+        If the Redis counter buffer is running, the increments are added to it
+        instead (see `RedisCounterBuffer`).
+        """
+        counter_buffer = get_counter_buffer()
+        if counter_buffer.is_running:
+            await counter_buffer.add(user_id, content_ids, counter)
+            return
+        await self._submit(
+            *[
+                _IncrementCounter(
+                    user_id=user_id, content_id=content_id, counter=counter, n=n
+                )
+                for content_id, n in Counter(content_ids).items()
+            ]
+        )
+
+    async def _submit(self, *items: _WriteItem) -> None:
+        """
+        Queue the writes, or do them right away (together) if the writer is not
+        running
+        """
+        if not items:
+            return
+        if not self.is_running:
+            if self._worker is not None:
+                logger.error("Write-behind writer has stopped, writing inline.")
+            await self._write(list(items))
+        else:
+            for item in items:
+                await self._queue.put(item)
+
+    async def _run(self) -> None:
+        """
+        Collect queued writes into batches and commit them until stopped
+        """
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            items = [item]
+            deadline = loop.time() + self.flush_interval_seconds
+            while len(items) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                items.append(item)
+            await self._write_batch(items)
+
+    async def _write_batch(self, items: List[_WriteItem]) -> None:
+        """
+        Commit the writes together, falling back to one at a time on failure
+        """
+        # Any error is caught, not just database errors: the writer must keep
+        # consuming, or the bounded queue fills up and blocks every request.
+        try:
+            await self._write(items)
+        except Exception as e:
+            if len(items) == 1:
+                logger.error(f"Write-behind write failed: {e!r}")
+                return
+            logger.warning(
+                f"Write-behind batch of {len(items)} failed, retrying one by one: {e!r}"
+            )
+            for item in items:
+                try:
+                    await self._write([item])
+                except Exception as item_error:
+                    logger.error(f"Write-behind write failed: {item_error!r}")
+
+    async def _write(self, items: List[_WriteItem]) -> None:
+        """
+        Write the items in a single transaction
+        """
+        rows: List[Base] = []
+        increments: Counter = Counter()
+        for item in items:
+            if isinstance(item, _InsertRows):
+                rows.extend(item.rows)
+            else:
+                increments[(item.user_id, item.content_id, item.counter)] += item.n
+
+        async with AsyncSession(
+            get_sqlalchemy_async_engine(), expire_on_commit=False
+        ) as asession:
+            asession.add_all(rows)
+            await apply_content_counter_deltas(increments, asession)
+            await asession.commit()
+
+
+_WRITE_BEHIND_QUEUE = WriteBehindQueue(
+    max_batch_size=int(WRITE_BEHIND_MAX_BATCH_SIZE),
+    flush_interval_seconds=float(WRITE_BEHIND_FLUSH_INTERVAL_SECONDS),
+    max_queue_size=int(WRITE_BEHIND_MAX_QUEUE_SIZE),
+)
+
+
+def is_write_behind_enabled() -> bool:
+    """Whether writes should be queued rather than done on the request path."""
+
+    return WRITE_BEHIND_ENABLED == "True"
+
+
+def get_write_behind_queue() -> WriteBehindQueue:
+    """Return the global write-behind queue.
+
+    :returns:
+        The global write-behind queue.
+    """
+
+    return _WRITE_BEHIND_QUEUE
@@ -1,4 +1,6 @@
+import re
 from logging.config import fileConfig
+from typing import Any
 
 from alembic import context
 from app import models
@@ -28,6 +30,23 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = models.Base.metadata
 
+# Indexes not declared on the models: per-user partial indexes are created at
+# runtime, and expression indexes aren't compared reliably by autogenerate
+UNMANAGED_INDEX_PATTERN = re.compile(
+    r"^(content_embedding_user_\d+_idx|content_text_search_idx"
+    r"|content_(title|text)_trgm_idx)$"
+)
+
+
+def include_object(
+    object: Any, name: str | None, type_: str, reflected: bool, compare_to: Any
+) -> bool:
+    """Exclude indexes not declared on the models from autogenerate."""
+    return not (
+        type_ == "index" and name is not None and UNMANAGED_INDEX_PATTERN.match(name)
+    )
+
+
 # other values from the config, defined by the needs of env.py,q
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -50,6 +69,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -79,7 +99,11 @@ def run_migrations_online() -> None:
         )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,28 @@
+"""add content text search index
+
+Revision ID: 5be2d1c8a974
+Revises: a3c9e1f07b52
+Create Date: 2026-10-18 14:03:27.118402
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5be2d1c8a974"
+down_revision: Union[str, None] = "a3c9e1f07b52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """CREATE INDEX content_text_search_idx ON content
+        USING gin (to_tsvector('simple', content_title || ' ' || content_text))"""
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("content_text_search_idx", table_name="content")
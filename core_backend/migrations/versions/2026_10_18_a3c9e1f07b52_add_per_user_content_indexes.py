@@ -0,0 +1,48 @@
+"""add per-user content indexes
+
+Adds a partial HNSW index over the non-archived contents of each existing user, and
+a B-tree index on `content.user_id`. Indexes of users created afterwards are created
+by the application when they first save content.
+
+Revision ID: a3c9e1f07b52
+Revises: 358588881e01
+Create Date: 2026-10-18 10:12:41.529310
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from app.contents.config import (
+    PGVECTOR_DISTANCE,
+    PGVECTOR_EF_CONSTRUCTION,
+    PGVECTOR_M,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c9e1f07b52"
+down_revision: Union[str, None] = "358588881e01"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _get_user_ids() -> list[int]:
+    return list(op.get_bind().execute(sa.text('SELECT user_id FROM "user"')).scalars())
+
+
+def upgrade() -> None:
+    op.create_index("content_user_id_idx", "content", ["user_id"], unique=False)
+    for user_id in _get_user_ids():
+        op.execute(
+            f"""CREATE INDEX IF NOT EXISTS content_embedding_user_{user_id}_idx
+            ON content USING hnsw (content_embedding {PGVECTOR_DISTANCE})
+            WITH (m = {PGVECTOR_M}, ef_construction = {PGVECTOR_EF_CONSTRUCTION})
+            WHERE user_id = {user_id} AND NOT is_archived"""
+        )
+
+
+def downgrade() -> None:
+    for user_id in _get_user_ids():
+        op.execute(f"DROP INDEX IF EXISTS content_embedding_user_{user_id}_idx")
+    op.drop_index("content_user_id_idx", table_name="content")
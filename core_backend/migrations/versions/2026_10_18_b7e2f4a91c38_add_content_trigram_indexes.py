@@ -0,0 +1,34 @@
+"""add content trigram indexes
+
+Revision ID: b7e2f4a91c38
+Revises: d41f7a9c2e60
+Create Date: 2026-10-18 17:42:09.531267
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e2f4a91c38"
+down_revision: Union[str, None] = "d41f7a9c2e60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        """CREATE INDEX content_title_trgm_idx ON content
+        USING gin (content_title gin_trgm_ops)"""
+    )
+    op.execute(
+        """CREATE INDEX content_text_trgm_idx ON content
+        USING gin (content_text gin_trgm_ops)"""
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("content_text_trgm_idx", table_name="content")
+    op.drop_index("content_title_trgm_idx", table_name="content")
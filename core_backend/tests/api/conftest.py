@@ -353,9 +353,16 @@ def patch_llm_call(monkeysession: pytest.MonkeyPatch) -> None:
     monkeysession.setattr(
         "core_backend.app.contents.models.embedding", async_fake_embedding
     )
+    monkeysession.setattr(
+        "core_backend.app.contents.models.embedding_batch", async_fake_embedding_batch
+    )
     monkeysession.setattr(
         "core_backend.app.urgency_rules.models.embedding", async_fake_embedding
     )
+    monkeysession.setattr(
+        "core_backend.app.urgency_rules.models.embedding_batch",
+        async_fake_embedding_batch,
+    )
     monkeysession.setattr(process_input, "_classify_safety", mock_return_args)
     monkeysession.setattr(process_input, "_classify_on_off_topic", mock_return_args)
     monkeysession.setattr(process_input, "_identify_language", mock_identify_language)
@@ -437,6 +444,17 @@ async def async_fake_embedding(*arg: str, **kwargs: str) -> List[float]:
     return embedding_list
 
 
+async def async_fake_embedding_batch(
+    texts: List[str], *arg: str, **kwargs: str
+) -> List[List[float]]:
+    """
+    Replicates `embedding_batch` function but just generates random
+    lists of floats
+    """
+
+    return [await async_fake_embedding() for _ in texts]
+
+
 @pytest.fixture(scope="session")
 def fullaccess_token_admin() -> str:
     """
@@ -0,0 +1,235 @@
+from typing import Any, AsyncGenerator, List
+
+import pytest
+from redis import asyncio as aioredis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from core_backend.app.config import REDIS_HOST
+from core_backend.app.contents import counters
+from core_backend.app.contents.counters import RedisCounterBuffer
+from core_backend.app.contents.models import (
+    ContentDB,
+    apply_content_counter_deltas,
+    increment_content_counters,
+    update_votes_in_db,
+)
+from core_backend.app.schemas import FeedbackSentiment
+
+
+async def get_query_counts(asession: AsyncSession, content_ids: List[int]) -> List[int]:
+    stmt = (
+        select(ContentDB.query_count)
+        .where(ContentDB.content_id.in_(content_ids))
+        .order_by(ContentDB.content_id)
+    )
+    return list((await asession.execute(stmt)).scalars())
+
+
+class TestContentCounters:
+    async def test_increment_content_counters(
+        self, faq_contents: List[int], user1: int, asession: AsyncSession
+    ) -> None:
+        content_ids = sorted(faq_contents[:3])
+        before = await get_query_counts(asession, content_ids)
+
+        await increment_content_counters(
+            user_id=user1,
+            content_ids=content_ids,
+            counter="query_count",
+            asession=asession,
+            n=2,
+        )
+        await asession.commit()
+
+        after = await get_query_counts(asession, content_ids)
+        assert after == [count + 2 for count in before]
+
+    async def test_increment_ignores_other_users_content(
+        self, faq_contents: List[int], user2: int, asession: AsyncSession
+    ) -> None:
+        content_ids = sorted(faq_contents[:3])
+        before = await get_query_counts(asession, content_ids)
+
+        await increment_content_counters(
+            user_id=user2,
+            content_ids=content_ids,
+            counter="query_count",
+            asession=asession,
+        )
+        await asession.commit()
+
+        assert await get_query_counts(asession, content_ids) == before
+
+    async def test_apply_content_counter_deltas(
+        self, faq_contents: List[int], user1: int, asession: AsyncSession
+    ) -> None:
+        content_ids = sorted(faq_contents[:3])
+        before = await get_query_counts(asession, content_ids)
+
+        await apply_content_counter_deltas(
+            {
+                (user1, content_ids[0], "query_count"): 1,
+                (user1, content_ids[1], "query_count"): 1,
+                (user1, content_ids[2], "query_count"): 5,
+            },
+            asession,
+        )
+        await asession.commit()
+
+        after = await get_query_counts(asession, content_ids)
+        assert after == [before[0] + 1, before[1] + 1, before[2] + 5]
+
+    async def test_update_votes_returns_updated_content(
+        self, faq_contents: List[int], user1: int, asession: AsyncSession
+    ) -> None:
+        content_db = await update_votes_in_db(
+            user_id=user1,
+            content_id=faq_contents[0],
+            vote=FeedbackSentiment.POSITIVE,
+            asession=asession,
+        )
+        assert content_db is not None
+        votes = content_db.positive_votes
+
+        content_db = await update_votes_in_db(
+            user_id=user1,
+            content_id=faq_contents[0],
+            vote=FeedbackSentiment.POSITIVE,
+            asession=asession,
+        )
+        assert content_db is not None
+        assert content_db.positive_votes == votes + 1
+
+
+class TestRedisCounterBuffer:
+    @pytest.fixture
+    async def counter_buffer(
+        self, async_engine: AsyncEngine, monkeypatch: pytest.MonkeyPatch
+    ) -> AsyncGenerator[RedisCounterBuffer, None]:
+        # use the engine of the test's event loop
+        monkeypatch.setattr(
+            counters, "get_sqlalchemy_async_engine", lambda: async_engine
+        )
+        redis = await aioredis.from_url(REDIS_HOST)
+        await redis.delete(RedisCounterBuffer.KEY)
+        async for key in redis.scan_iter(
+            match=f"{RedisCounterBuffer.FLUSHING_KEY_PREFIX}*"
+        ):
+            await redis.delete(key)
+        counter_buffer = RedisCounterBuffer(flush_interval_seconds=60)
+        counter_buffer.start(redis)
+        yield counter_buffer
+        await counter_buffer.stop()
+        await redis.close()
+
+    async def test_flush_applies_accumulated_increments(
+        self,
+        counter_buffer: RedisCounterBuffer,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+    ) -> None:
+        content_ids = sorted(faq_contents[:2])
+        before = await get_query_counts(asession, content_ids)
+
+        for _ in range(3):
+            await counter_buffer.add(user1, content_ids, "query_count")
+        await counter_buffer.add(user1, content_ids[:1], "query_count")
+        assert await get_query_counts(asession, content_ids) == before
+
+        await counter_buffer.flush()
+        after = await get_query_counts(asession, content_ids)
+        assert after == [before[0] + 4, before[1] + 3]
+
+        # nothing is applied twice
+        await counter_buffer.flush()
+        assert await get_query_counts(asession, content_ids) == after
+
+    async def test_failed_flush_is_retried(
+        self,
+        counter_buffer: RedisCounterBuffer,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        content_ids = sorted(faq_contents[:1])
+        before = await get_query_counts(asession, content_ids)
+
+        async def fail(*args: Any, **kwargs: Any) -> None:
+            raise OSError("connection reset")
+
+        await counter_buffer.add(user1, content_ids, "query_count")
+        monkeypatch.setattr(counters, "apply_content_counter_deltas", fail)
+        with pytest.raises(OSError):
+            await counter_buffer.flush()
+
+        # increments made after the failure are flushed along with the leftovers
+        await counter_buffer.add(user1, content_ids, "query_count")
+        monkeypatch.setattr(
+            counters, "apply_content_counter_deltas", apply_content_counter_deltas
+        )
+        await counter_buffer.flush()
+        assert await get_query_counts(asession, content_ids) == [before[0] + 2]
+
+    async def test_orphaned_flush_is_retried(
+        self,
+        counter_buffer: RedisCounterBuffer,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+    ) -> None:
+        content_ids = sorted(faq_contents[:1])
+        before = await get_query_counts(asession, content_ids)
+
+        # left over by another worker that died while flushing
+        assert counter_buffer.redis is not None
+        await counter_buffer.add(user1, content_ids, "query_count")
+        await counter_buffer.redis.rename(
+            RedisCounterBuffer.KEY, f"{RedisCounterBuffer.FLUSHING_KEY_PREFIX}orphan"
+        )
+
+        await counter_buffer.add(user1, content_ids, "query_count")
+        await counter_buffer.flush()
+        assert await get_query_counts(asession, content_ids) == [before[0] + 2]
+
+    async def test_committed_flush_is_not_applied_twice(
+        self,
+        counter_buffer: RedisCounterBuffer,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        content_ids = sorted(faq_contents[:1])
+        before = await get_query_counts(asession, content_ids)
+
+        async def fail(*args: Any, **kwargs: Any) -> None:
+            raise OSError("connection reset")
+
+        assert counter_buffer.redis is not None
+        delete = counter_buffer.redis.delete
+        await counter_buffer.add(user1, content_ids, "query_count")
+        monkeypatch.setattr(counter_buffer.redis, "delete", fail)
+        with pytest.raises(OSError):
+            await counter_buffer.flush()
+        assert await get_query_counts(asession, content_ids) == [before[0] + 1]
+
+        # the flushing key is deleted by the retry, without being applied again
+        monkeypatch.setattr(counter_buffer.redis, "delete", delete)
+        await counter_buffer.flush()
+        assert await get_query_counts(asession, content_ids) == [before[0] + 1]
+        assert not [
+            key
+            async for key in counter_buffer.redis.scan_iter(
+                match=f"{RedisCounterBuffer.FLUSHING_KEY_PREFIX}*"
+            )
+        ]
+
+    async def test_add_before_start(self) -> None:
+        counter_buffer = RedisCounterBuffer(flush_interval_seconds=60)
+        with pytest.raises(RuntimeError):
+            await counter_buffer.add(1, [1], "query_count")
+        # nothing was buffered
+        await counter_buffer.flush()
@@ -4,21 +4,34 @@ from typing import AsyncGenerator, Dict, List, Optional, Tuple
 import numpy as np
 import pytest
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import delete
-from sqlalchemy.ext.asyncio import AsyncSession
+from redis import asyncio as aioredis
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
+from core_backend.app.config import REDIS_HOST
 from core_backend.app.contents.config import PGVECTOR_VECTOR_SIZE
 from core_backend.app.contents.models import ContentDB
+from core_backend.app.dashboard import cache, rollups
+from core_backend.app.dashboard import models as dashboard_models
+from core_backend.app.dashboard.cache import cache_overview, get_cached_overview
 from core_backend.app.dashboard.models import (
     get_content_feedback_stats,
     get_heatmap,
     get_query_count_stats,
     get_response_feedback_stats,
+    get_stats_cards,
     get_timeseries_query,
     get_timeseries_urgency,
     get_top_content,
     get_urgency_stats,
 )
+from core_backend.app.dashboard.rollups import (
+    DashboardHourlyRollupDB,
+    DashboardRollupStateDB,
+    get_rolled_up_to,
+    refresh_dashboard_rollups,
+)
+from core_backend.app.dashboard.routers import retrieve_overview
 from core_backend.app.dashboard.schemas import TimeFrequency
 from core_backend.app.question_answer.models import (
     ContentFeedbackDB,
@@ -717,3 +730,229 @@ class TestTopContent:
         top_content = await get_top_content(user_id=2, asession=asession, top_n=5)
 
         assert len(top_content) == 0
+
+
+class TestDashboardRollups:
+    @pytest.fixture(scope="function")
+    async def hourly_queries(
+        self, asession: AsyncSession
+    ) -> AsyncGenerator[datetime, None]:
+        now = datetime.now(timezone.utc)
+        for hours_ago in (0, 1, 5, 30):
+            for i in range(2):
+                query = QueryDB(
+                    user_id=1,
+                    session_id=1,
+                    feedback_secret_key="abc123",
+                    query_text=f"test_{hours_ago}_{i}",
+                    query_generate_llm_response=False,
+                    query_metadata={},
+                    query_datetime_utc=now - timedelta(hours=hours_ago),
+                )
+                asession.add(query)
+        await asession.commit()
+
+        yield now
+
+        await asession.execute(delete(DashboardHourlyRollupDB))
+        await asession.execute(delete(DashboardRollupStateDB))
+        await asession.execute(delete(QueryDB).where(QueryDB.query_id > 0))
+        await asession.commit()
+
+    async def test_rollups_match_raw_rows(
+        self,
+        hourly_queries: datetime,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        now = hourly_queries
+        start_date = now - timedelta(days=1)
+        end_date = now + timedelta(seconds=1)
+
+        raw_stats = await get_query_count_stats(1, asession, start_date, end_date)
+        raw_heatmap = await get_heatmap(1, asession, start_date, end_date)
+        raw_timeseries = await get_timeseries_query(
+            1, asession, start_date, end_date, frequency=TimeFrequency.Hour
+        )
+
+        monkeypatch.setattr(rollups, "DASHBOARD_ROLLUP_ENABLED", "True")
+        assert await refresh_dashboard_rollups(asession, now=now)
+
+        n_rolled_up = await asession.scalar(
+            select(func.sum(DashboardHourlyRollupDB.n_queries)).where(
+                DashboardHourlyRollupDB.user_id == 1
+            )
+        )
+        # the queries of the current hour are not rolled up yet
+        assert n_rolled_up == 6
+
+        assert await get_query_count_stats(1, asession, start_date, end_date) == (
+            raw_stats
+        )
+        assert await get_heatmap(1, asession, start_date, end_date) == raw_heatmap
+        assert (
+            await get_timeseries_query(
+                1, asession, start_date, end_date, frequency=TimeFrequency.Hour
+            )
+            == raw_timeseries
+        )
+        assert raw_stats.n_questions == 6
+
+    async def test_stats_are_read_from_rollups(
+        self,
+        hourly_queries: datetime,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        now = hourly_queries
+        start_date = now - timedelta(days=1)
+        end_date = now + timedelta(seconds=1)
+
+        monkeypatch.setattr(rollups, "DASHBOARD_ROLLUP_ENABLED", "True")
+        assert await refresh_dashboard_rollups(asession, now=now)
+        rolled_up_to = await get_rolled_up_to(asession)
+        assert rolled_up_to == now.replace(minute=0, second=0, microsecond=0)
+
+        # only the rolled up hours are read from the rollups
+        await asession.execute(
+            update(DashboardHourlyRollupDB)
+            .where(DashboardHourlyRollupDB.user_id == 1)
+            .where(
+                DashboardHourlyRollupDB.hour_start == rolled_up_to - timedelta(hours=5)
+            )
+            .values(n_queries=DashboardHourlyRollupDB.n_queries + 10)
+        )
+        await asession.commit()
+        stats = await get_query_count_stats(1, asession, start_date, end_date)
+        assert stats.n_questions == 16
+
+        monkeypatch.setattr(rollups, "DASHBOARD_ROLLUP_ENABLED", "False")
+        stats = await get_query_count_stats(1, asession, start_date, end_date)
+        assert stats.n_questions == 6
+
+    async def test_first_run_backfills_in_chunks(
+        self,
+        hourly_queries: datetime,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        now = hourly_queries
+        monkeypatch.setattr(rollups, "DASHBOARD_ROLLUP_CHUNK_HOURS", "8")
+        commit = asession.commit
+        n_commits = 0
+
+        async def count_commits() -> None:
+            nonlocal n_commits
+            n_commits += 1
+            await commit()
+
+        monkeypatch.setattr(asession, "commit", count_commits)
+        assert await refresh_dashboard_rollups(asession, now=now)
+
+        # one transaction per chunk, back to at least the queries of 30 hours ago
+        assert n_commits >= 4
+        assert await asession.scalar(
+            select(DashboardRollupStateDB.rolled_up_to)
+        ) == now.replace(minute=0, second=0, microsecond=0)
+        n_rolled_up = await asession.scalar(
+            select(func.sum(DashboardHourlyRollupDB.n_queries)).where(
+                DashboardHourlyRollupDB.user_id == 1
+            )
+        )
+        assert n_rolled_up == 6
+
+    async def test_overview_with_rollups(
+        self,
+        hourly_queries: datetime,
+        async_engine: AsyncEngine,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(
+            dashboard_models, "get_sqlalchemy_async_engine", lambda: async_engine
+        )
+        now = hourly_queries
+        start_date = now - timedelta(days=1)
+        end_date = now + timedelta(seconds=1)
+
+        raw_overview = await retrieve_overview(
+            user_id=1,
+            start_date=start_date,
+            end_date=end_date,
+            frequency=TimeFrequency.Hour,
+        )
+
+        monkeypatch.setattr(rollups, "DASHBOARD_ROLLUP_ENABLED", "True")
+        assert await refresh_dashboard_rollups(asession, now=now)
+        overview = await retrieve_overview(
+            user_id=1,
+            start_date=start_date,
+            end_date=end_date,
+            frequency=TimeFrequency.Hour,
+        )
+
+        assert overview == raw_overview
+        assert overview.stats_cards == await get_stats_cards(
+            user_id=1, asession=asession, start_date=start_date, end_date=end_date
+        )
+        # 6 queries in the last day, and 2 (30 hours ago) in the day before
+        assert overview.stats_cards.query_stats.n_questions == 6
+        assert overview.stats_cards.query_stats.percentage_increase == 2.0
+
+
+class TestDashboardOverview:
+    async def test_concurrent_overview_matches_serial_queries(
+        self,
+        async_engine: AsyncEngine,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(
+            dashboard_models, "get_sqlalchemy_async_engine", lambda: async_engine
+        )
+        end_date = datetime.now(timezone.utc)
+        start_date = end_date - timedelta(days=7)
+
+        overview = await retrieve_overview(
+            user_id=1,
+            start_date=start_date,
+            end_date=end_date,
+            frequency=TimeFrequency.Day,
+        )
+
+        assert overview.stats_cards.query_stats == await get_query_count_stats(
+            1, asession, start_date, end_date
+        )
+        assert overview.heatmap == await get_heatmap(1, asession, start_date, end_date)
+        assert overview.top_content == await get_top_content(
+            user_id=1, asession=asession, top_n=4
+        )
+
+    async def test_overview_cache_roundtrip(
+        self,
+        async_engine: AsyncEngine,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(
+            dashboard_models, "get_sqlalchemy_async_engine", lambda: async_engine
+        )
+        monkeypatch.setattr(cache, "DASHBOARD_CACHE_TTL_SECONDS", "60")
+        end_date = datetime.now(timezone.utc)
+        overview = await retrieve_overview(
+            user_id=1,
+            start_date=end_date - timedelta(days=1),
+            end_date=end_date,
+            frequency=TimeFrequency.Hour,
+        )
+
+        redis = await aioredis.from_url(REDIS_HOST)
+        try:
+            await redis.delete(cache.get_overview_key(1, "day"))
+            assert await get_cached_overview(redis, 1, "day") is None
+
+            await cache_overview(redis, 1, "day", overview)
+            assert await get_cached_overview(redis, 1, "day") == overview
+            assert await get_cached_overview(redis, 2, "day") is None
+        finally:
+            await redis.delete(cache.get_overview_key(1, "day"))
+            await redis.close()
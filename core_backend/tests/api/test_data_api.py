@@ -1,12 +1,19 @@
+import csv
+import io
+import json
 import random
 from datetime import datetime, timezone, tzinfo
 from typing import Any, AsyncGenerator, List, Optional
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 from dateutil.relativedelta import relativedelta
 from fastapi.testclient import TestClient
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core_backend.app.config import DATA_API_TOMBSTONE_RETENTION_DAYS
 from core_backend.app.question_answer.models import (
     save_content_feedback_to_db,
     save_query_response_to_db,
@@ -22,6 +29,7 @@ from core_backend.app.question_answer.schemas import (
     ResponseFeedbackBase,
 )
 from core_backend.app.schemas import FeedbackSentiment, QuerySearchResult
+from core_backend.app.tombstones import TombstoneDB
 from core_backend.app.urgency_detection.models import (
     save_urgency_query_to_db,
     save_urgency_response_to_db,
@@ -118,6 +126,97 @@ class TestContentDataAPI:
         assert len(response.json()) == 1
         assert response.json()[0]["content_tags"][0] == "USER2_TAG"
 
+    async def test_content_changes(
+        self, client: TestClient, fullaccess_token_user2: str, api_key_user2: str
+    ) -> None:
+        changes_since = datetime.now(timezone.utc)
+
+        def get_changes() -> dict:
+            response = client.get(
+                "/data-api/contents/changes",
+                params={"changes_since": changes_since.isoformat()},
+                headers={"Authorization": f"Bearer {api_key_user2}"},
+            )
+            assert response.status_code == 200
+            return response.json()
+
+        response = client.post(
+            "/content",
+            headers={"Authorization": f"Bearer {fullaccess_token_user2}"},
+            json={
+                "content_title": "title",
+                "content_text": "text",
+                "content_tags": [],
+                "content_metadata": {},
+            },
+        )
+        content_id = response.json()["content_id"]
+
+        changes = get_changes()
+        assert [c["content_id"] for c in changes["contents"]] == [content_id]
+        assert changes["deleted_content_ids"] == []
+        assert datetime.fromisoformat(changes["next_changes_since"]) >= changes_since
+
+        client.delete(
+            f"/content/{content_id}",
+            headers={"Authorization": f"Bearer {fullaccess_token_user2}"},
+        )
+
+        changes = get_changes()
+        assert changes["contents"] == []
+        assert changes["deleted_content_ids"] == [content_id]
+
+    def test_content_changes_past_retention(
+        self, client: TestClient, api_key_user2: str
+    ) -> None:
+        changes_since = datetime.now(timezone.utc) - relativedelta(
+            days=int(DATA_API_TOMBSTONE_RETENTION_DAYS) + 1
+        )
+        response = client.get(
+            "/data-api/contents/changes",
+            params={"changes_since": changes_since.isoformat()},
+            headers={"Authorization": f"Bearer {api_key_user2}"},
+        )
+        assert response.status_code == 410
+
+    async def test_expired_tombstones_pruned(
+        self,
+        client: TestClient,
+        fullaccess_token_user2: str,
+        user2: int,
+        asession: AsyncSession,
+    ) -> None:
+        expired_tombstone = TombstoneDB(
+            user_id=user2,
+            record_type="content",
+            record_id=-1,
+            deleted_datetime_utc=datetime.now(timezone.utc)
+            - relativedelta(days=int(DATA_API_TOMBSTONE_RETENTION_DAYS) + 1),
+        )
+        asession.add(expired_tombstone)
+        await asession.commit()
+
+        headers = {"Authorization": f"Bearer {fullaccess_token_user2}"}
+        response = client.post(
+            "/content",
+            headers=headers,
+            json={
+                "content_title": "title",
+                "content_text": "text",
+                "content_tags": [],
+                "content_metadata": {},
+            },
+        )
+        client.delete(f"/content/{response.json()['content_id']}", headers=headers)
+
+        tombstone_ids = (
+            await asession.scalars(
+                select(TombstoneDB.tombstone_id).where(TombstoneDB.user_id == user2)
+            )
+        ).all()
+        assert tombstone_ids
+        assert expired_tombstone.tombstone_id not in tombstone_ids
+
 
 class TestUrgencyRulesDataAPI:
     async def test_urgency_rules_data_api(
@@ -157,6 +256,30 @@ class TestUrgencyRulesDataAPI:
         assert response.status_code == 200
         assert len(response.json()) == urgency_rules_user2
 
+    async def test_urgency_rule_changes(
+        self, client: TestClient, fullaccess_token_user2: str, api_key_user2: str
+    ) -> None:
+        changes_since = datetime.now(timezone.utc)
+        response = client.post(
+            "/urgency-rules",
+            headers={"Authorization": f"Bearer {fullaccess_token_user2}"},
+            json={"urgency_rule_text": "rule", "urgency_rule_metadata": {}},
+        )
+        urgency_rule_id = response.json()["urgency_rule_id"]
+        client.delete(
+            f"/urgency-rules/{urgency_rule_id}",
+            headers={"Authorization": f"Bearer {fullaccess_token_user2}"},
+        )
+
+        response = client.get(
+            "/data-api/urgency-rules/changes",
+            params={"changes_since": changes_since.isoformat()},
+            headers={"Authorization": f"Bearer {api_key_user2}"},
+        )
+        assert response.status_code == 200
+        assert response.json()["urgency_rules"] == []
+        assert response.json()["deleted_urgency_rule_ids"] == [urgency_rule_id]
+
 
 class TestUrgencyQueryDataAPI:
     @pytest.fixture
@@ -557,3 +680,136 @@ class TestQueryDataAPI:
             assert len(response.json()) == 1
         else:
             assert len(response.json()) == 0
+
+    def test_query_data_api_pagination(
+        self,
+        user1_data: pytest.FixtureRequest,
+        client: TestClient,
+        api_key_user1: str,
+    ) -> None:
+        params = {
+            "start_date": (datetime.now(timezone.utc) - relativedelta(days=20))
+            .date()
+            .isoformat(),
+            "end_date": datetime.now(timezone.utc).date().isoformat(),
+        }
+        all_ids = [
+            record["query_id"]
+            for record in client.get(
+                "/data-api/queries",
+                headers={"Authorization": f"Bearer {api_key_user1}"},
+                params=params,
+            ).json()
+        ]
+        assert len(all_ids) == N_DAYS_HISTORY
+
+        page_ids: List[int] = []
+        page_params = {**params, "limit": 3}
+        while True:
+            response = client.get(
+                "/data-api/queries",
+                headers={"Authorization": f"Bearer {api_key_user1}"},
+                params=page_params,
+            )
+            assert response.status_code == 200
+            page = [record["query_id"] for record in response.json()]
+            if not page:
+                break
+            assert len(page) <= 3
+            page_ids.extend(page)
+            page_params["after_id"] = page[-1]
+
+        assert page_ids == sorted(all_ids)
+
+    @pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+    def test_query_data_api_export(
+        self,
+        export_format: str,
+        user1_data: pytest.FixtureRequest,
+        client: TestClient,
+        api_key_user1: str,
+    ) -> None:
+        params = {
+            "start_date": (datetime.now(timezone.utc) - relativedelta(days=20))
+            .date()
+            .isoformat(),
+            "end_date": datetime.now(timezone.utc).date().isoformat(),
+        }
+        expected = client.get(
+            "/data-api/queries",
+            headers={"Authorization": f"Bearer {api_key_user1}"},
+            params=params,
+        ).json()
+
+        response = client.get(
+            "/data-api/queries/export",
+            headers={"Authorization": f"Bearer {api_key_user1}"},
+            params={**params, "format": export_format},
+        )
+        assert response.status_code == 200
+
+        if export_format == "ndjson":
+            records = [json.loads(line) for line in response.text.splitlines()]
+            assert records == expected
+        else:
+            rows = list(csv.DictReader(io.StringIO(response.text)))
+            assert [int(row["query_id"]) for row in rows] == [
+                record["query_id"] for record in expected
+            ]
+            assert [json.loads(row["response_feedback"]) for row in rows] == [
+                record["response_feedback"] for record in expected
+            ]
+
+    @pytest.mark.parametrize("export_format", ["arrow", "parquet"])
+    def test_query_data_api_columnar_export(
+        self,
+        export_format: str,
+        user1_data: pytest.FixtureRequest,
+        client: TestClient,
+        api_key_user1: str,
+    ) -> None:
+        params = {
+            "start_date": (datetime.now(timezone.utc) - relativedelta(days=20))
+            .date()
+            .isoformat(),
+            "end_date": datetime.now(timezone.utc).date().isoformat(),
+        }
+        expected = client.get(
+            "/data-api/queries",
+            headers={"Authorization": f"Bearer {api_key_user1}"},
+            params=params,
+        ).json()
+
+        response = client.get(
+            "/data-api/queries/export",
+            headers={"Authorization": f"Bearer {api_key_user1}"},
+            params={**params, "format": export_format},
+        )
+        assert response.status_code == 200
+
+        if export_format == "parquet":
+            table = pq.read_table(pa.BufferReader(response.content))
+        else:
+            table = pa.ipc.open_stream(response.content).read_all()
+        records = table.to_pylist()
+
+        assert table.schema.field("query_datetime_utc").type == pa.timestamp(
+            "us", tz="UTC"
+        )
+        assert [record["query_id"] for record in records] == [
+            record["query_id"] for record in expected
+        ]
+        assert [
+            [feedback["feedback_text"] for feedback in record["response_feedback"]]
+            for record in records
+        ] == [
+            [feedback["feedback_text"] for feedback in record["response_feedback"]]
+            for record in expected
+        ]
+        assert [
+            [json.loads(result["search_results"]) for result in record["response"]]
+            for record in records
+        ] == [
+            [result["search_results"] for result in record["response"]]
+            for record in expected
+        ]
@@ -0,0 +1,84 @@
+from typing import Any, List
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from core_backend.app import utils
+from core_backend.app.utils import EmbeddingCache
+
+
+class TestEmbeddings:
+    @pytest.fixture
+    def cache(self) -> EmbeddingCache:
+        return EmbeddingCache(max_size=2, ttl_seconds=60)
+
+    async def test_roundtrip_is_float32(self, cache: EmbeddingCache) -> None:
+        vector = [0.1, 0.2, 0.3]
+        key = cache.get_key("model", "text")
+        stored = await cache.set(key, vector)
+
+        assert stored == np.asarray(vector, dtype=np.float32).tolist()
+        assert await cache.get(key) == stored
+
+    async def test_keys_depend_on_model_and_text(self, cache: EmbeddingCache) -> None:
+        assert cache.get_key("model", "text") == cache.get_key("model", "text")
+        assert cache.get_key("model", "text") != cache.get_key("model-2", "text")
+        assert cache.get_key("model", "text") != cache.get_key("model", "text 2")
+
+    async def test_lru_eviction(self, cache: EmbeddingCache) -> None:
+        await cache.set("a", [1.0])
+        await cache.set("b", [2.0])
+        await cache.get("a")  # "b" is now the least recently used
+        await cache.set("c", [3.0])
+
+        assert await cache.get("a") == [1.0]
+        assert await cache.get("b") is None
+        assert await cache.get("c") == [3.0]
+
+    async def test_embedding_calls_model_once_per_text(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        calls: List[str] = []
+
+        async def mock_aembedding(*args: Any, **kwargs: Any) -> MagicMock:
+            calls.append(kwargs["input"])
+            response = MagicMock()
+            response.data = [{"embedding": [0.5, 0.25]}]
+            return response
+
+        monkeypatch.setattr(utils, "aembedding", mock_aembedding)
+        monkeypatch.setattr(
+            utils, "_EMBEDDING_CACHE", EmbeddingCache(max_size=10, ttl_seconds=60)
+        )
+
+        first = await utils.embedding("some text")
+        second = await utils.embedding("some text")
+
+        assert calls == ["some text"]
+        assert first == second == [0.5, 0.25]
+
+    async def test_embedding_batch_skips_cached_and_duplicate_texts(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        requested: List[List[str]] = []
+
+        async def mock_aembedding(*args: Any, **kwargs: Any) -> MagicMock:
+            requested.append(kwargs["input"])
+            response = MagicMock()
+            response.data = [
+                {"index": i, "embedding": [float(len(text))]}
+                for i, text in enumerate(kwargs["input"])
+            ]
+            return response
+
+        cache = EmbeddingCache(max_size=10, ttl_seconds=60)
+        await cache.set(cache.get_key(utils.LITELLM_MODEL_EMBEDDING, "cached"), [9.0])
+        monkeypatch.setattr(utils, "aembedding", mock_aembedding)
+        monkeypatch.setattr(utils, "_EMBEDDING_CACHE", cache)
+        monkeypatch.setattr(utils, "EMBEDDING_BATCH_SIZE", 2)
+
+        embeddings = await utils.embedding_batch(["a", "bb", "cached", "a", "ccc"])
+
+        assert embeddings == [[1.0], [2.0], [9.0], [1.0], [3.0]]
+        assert requested == [["a", "bb"], ["ccc"]]
@@ -0,0 +1,108 @@
+from typing import List
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core_backend.app.contents import models
+from core_backend.app.contents.models import (
+    get_hybrid_search_results,
+    get_lexical_search_results,
+    get_similar_content_batch_async,
+    reciprocal_rank_fusion,
+)
+from core_backend.tests.api.conftest import async_fake_embedding
+
+
+def test_reciprocal_rank_fusion() -> None:
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4, 1]], k=60)
+
+    assert fused[:2] == [1, 3]
+    assert set(fused) == {1, 2, 3, 4}
+    assert fused.index(2) < fused.index(4)
+
+
+class TestHybridSearch:
+    async def test_lexical_search(
+        self, faq_contents: List[int], user1: int, asession: AsyncSession
+    ) -> None:
+        results = await get_lexical_search_results(
+            user_id=user1, question="astronomy", n_similar=5, asession=asession
+        )
+
+        assert len(results) == 1
+        content, rank, all_terms = results[0]
+        assert content.content_title == "Astronomy"
+        assert 0 < rank < 1
+        assert all_terms
+
+    async def test_hybrid_search_includes_lexical_match(
+        self,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(models, "HYBRID_SEARCH_N_CANDIDATES", "1")
+        results = await get_hybrid_search_results(
+            user_id=user1, question="squash", n_similar=4, asession=asession
+        )
+
+        lexical_results = await get_lexical_search_results(
+            user_id=user1, question="squash", n_similar=1, asession=asession
+        )
+        ids = [r.id for r in results.values()]
+        assert len(ids) == 4
+        # ranked first or second by RRF, whatever the (random) vector ranking
+        assert lexical_results[0][0].content_id in ids[:2]
+
+    async def test_hybrid_search_batch(
+        self,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(models, "HYBRID_SEARCH_ENABLED", "True")
+        monkeypatch.setattr(models, "HYBRID_SEARCH_N_CANDIDATES", "1")
+        questions = ["squash", "astronomy"]
+        results = await get_similar_content_batch_async(
+            user_id=user1, questions=questions, n_similar=4, asession=asession
+        )
+
+        assert len(results) == len(questions)
+        for question, question_results in zip(questions, results):
+            lexical_results = await get_lexical_search_results(
+                user_id=user1, question=question, n_similar=1, asession=asession
+            )
+            ids = [r.id for r in question_results.values()]
+            assert len(ids) == 4
+            assert lexical_results[0][0].content_id in ids[:2]
+
+    async def test_skips_embedding_for_confident_lexical_match(
+        self,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        calls = []
+
+        async def fake_embedding(*args: str, **kwargs: str) -> List[float]:
+            calls.append(args)
+            return await async_fake_embedding()
+
+        monkeypatch.setattr(models, "embedding", fake_embedding)
+        monkeypatch.setattr(models, "HYBRID_SEARCH_SKIP_EMBEDDING_MIN_RANK", "0.0")
+
+        results = await get_hybrid_search_results(
+            user_id=user1, question="astronomy", n_similar=4, asession=asession
+        )
+        assert [r.title for r in results.values()] == ["Astronomy"]
+        assert [r.distance_type for r in results.values()] == ["lexical"]
+        assert calls == []
+
+        results = await get_hybrid_search_results(
+            user_id=user1, question="no such term", n_similar=4, asession=asession
+        )
+        assert len(calls) == 1
+        assert {r.distance_type for r in results.values()} == {"cosine"}
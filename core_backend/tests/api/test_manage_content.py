@@ -1,12 +1,23 @@
 from datetime import datetime, timezone
-from typing import Any, Dict, Generator
+from typing import Any, Dict, Generator, List
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 from sqlalchemy.orm import Session
 
 from core_backend.app.auth.dependencies import create_access_token
-from core_backend.app.contents.models import ContentDB
+from core_backend.app.contents import models
+from core_backend.app.contents.models import (
+    CONTENT_INDEX_LOCK_CLASS,
+    ContentDB,
+    check_titles_and_texts_in_db,
+    count_contents_in_db,
+    ensure_user_content_index,
+    get_list_of_content_from_db,
+    get_user_content_index_name,
+)
 from core_backend.app.contents.routers import _convert_record_to_schema
 from core_backend.app.users.models import UserDB
 from core_backend.app.utils import get_key_hash, get_password_salted_hash
@@ -197,6 +208,76 @@ class TestManageContent:
 
         assert response.status_code == 200
 
+    def test_create_content_creates_user_index(
+        self,
+        client: TestClient,
+        fullaccess_token: str,
+        user1: int,
+        db_session: Session,
+    ) -> None:
+        response = client.post(
+            "/content",
+            headers={"Authorization": f"Bearer {fullaccess_token}"},
+            json={
+                "content_title": "title",
+                "content_text": "text",
+                "content_tags": [],
+                "content_metadata": {},
+            },
+        )
+        assert response.status_code == 200
+
+        index_name = get_user_content_index_name(user1)
+        exists = db_session.execute(
+            text("SELECT to_regclass(:index_name)"), {"index_name": index_name}
+        ).scalar()
+        assert exists is not None
+
+        client.delete(
+            f"/content/{response.json()['content_id']}",
+            headers={"Authorization": f"Bearer {fullaccess_token}"},
+        )
+
+    async def test_user_index_is_not_built_while_locked(
+        self, async_engine: AsyncEngine, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # use the engine of the test's event loop
+        monkeypatch.setattr(models, "get_sqlalchemy_async_engine", lambda: async_engine)
+        monkeypatch.setattr(models, "_USERS_WITH_CONTENT_INDEX", set())
+        user_id = 987654
+        index_name = get_user_content_index_name(user_id)
+
+        async def get_index() -> Any:
+            async with async_engine.connect() as connection:
+                return await connection.scalar(
+                    text("SELECT to_regclass(:index_name)"),
+                    {"index_name": index_name},
+                )
+
+        # another worker building the index holds the lock
+        async with async_engine.connect() as lock_connection:
+            lock_connection = await lock_connection.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+            lock_keys = {"class": CONTENT_INDEX_LOCK_CLASS, "user_id": user_id}
+            await lock_connection.execute(
+                text("SELECT pg_advisory_lock(:class, :user_id)"), lock_keys
+            )
+            await ensure_user_content_index(user_id)
+            assert await get_index() is None
+            await lock_connection.execute(
+                text("SELECT pg_advisory_unlock(:class, :user_id)"), lock_keys
+            )
+
+        await ensure_user_content_index(user_id)
+        assert await get_index() is not None
+
+        async with async_engine.connect() as connection:
+            connection = await connection.execution_options(
+                isolation_level="AUTOCOMMIT"
+            )
+            await connection.execute(text(f"DROP INDEX {index_name}"))
+
     @pytest.mark.parametrize(
         "content_title, content_text, content_metadata",
         [
@@ -346,3 +427,88 @@ async def test_convert_record_to_schema() -> None:
     assert result.user_id == user_id
     assert result.content_text == "sample text"
     assert result.content_metadata["extra_field"] == "extra value"
+
+
+class TestContentProjections:
+    async def test_list_of_content_excludes_embeddings(
+        self, faq_contents: List[int], user1: int, async_engine: AsyncEngine
+    ) -> None:
+        # a session of its own, so that the contents aren't already loaded
+        async with AsyncSession(async_engine, expire_on_commit=False) as asession:
+            contents = await get_list_of_content_from_db(
+                user_id=user1, asession=asession
+            )
+            assert set(faq_contents) <= {c.content_id for c in contents}
+            assert all("content_embedding" in inspect(c).unloaded for c in contents)
+
+            n_contents = await count_contents_in_db(user_id=user1, asession=asession)
+            assert n_contents == len(contents)
+
+    async def test_check_titles_and_texts_in_db(
+        self, faq_contents: List[int], user1: int, asession: AsyncSession
+    ) -> None:
+        title_in_db, text_in_db = await check_titles_and_texts_in_db(
+            user_id=user1,
+            titles=["Come Camping", "Not a title in the database"],
+            texts=["Not a text in the database"],
+            asession=asession,
+        )
+        assert title_in_db
+        assert not text_in_db
+
+        title_in_db, text_in_db = await check_titles_and_texts_in_db(
+            user_id=user1, titles=[], texts=[], asession=asession
+        )
+        assert not title_in_db
+        assert not text_in_db
+
+
+class TestContentListing:
+    def test_cursor_pagination(
+        self, faq_contents: List[int], client: TestClient, fullaccess_token: str
+    ) -> None:
+        headers = {"Authorization": f"Bearer {fullaccess_token}"}
+        response = client.get("/content/?limit=2", headers=headers)
+        assert response.status_code == 200
+        first_page = response.json()
+        assert len(first_page) == 2
+        assert int(response.headers["X-Total-Count"]) >= len(faq_contents)
+
+        content_ids = [content["content_id"] for content in first_page]
+        cursor = response.headers["X-Next-Cursor"]
+        while cursor:
+            response = client.get(
+                "/content/", params={"limit": 2, "cursor": cursor}, headers=headers
+            )
+            assert response.status_code == 200
+            content_ids += [content["content_id"] for content in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+
+        assert content_ids == sorted(content_ids)
+        assert set(faq_contents) <= set(content_ids)
+        assert len(content_ids) == int(response.headers["X-Total-Count"])
+
+    def test_search_filter(
+        self, faq_contents: List[int], client: TestClient, fullaccess_token: str
+    ) -> None:
+        response = client.get(
+            "/content/",
+            params={"search": "SQUASH"},
+            headers={"Authorization": f"Bearer {fullaccess_token}"},
+        )
+        assert response.status_code == 200
+        contents = response.json()
+        assert len(contents) >= 2
+        assert int(response.headers["X-Total-Count"]) == len(contents)
+        for content in contents:
+            assert (
+                "squash" in (content["content_title"] + content["content_text"]).lower()
+            )
+
+    def test_invalid_cursor(self, client: TestClient, fullaccess_token: str) -> None:
+        response = client.get(
+            "/content/",
+            params={"cursor": "not a cursor"},
+            headers={"Authorization": f"Bearer {fullaccess_token}"},
+        )
+        assert response.status_code == 400
@@ -1,9 +1,13 @@
 from datetime import datetime, timezone
 from typing import Generator
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi.testclient import TestClient
+from redis import asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError
 
+from core_backend.app.catalog import bump_catalog_version
 from core_backend.app.tags.models import TagDB
 from core_backend.app.tags.routers import _convert_record_to_schema
 
@@ -123,6 +127,31 @@ class TestManageTags:
         assert response.status_code == 200
         assert len(response.json()) > 0
 
+    def test_list_tag_not_modified(
+        self,
+        client: TestClient,
+        existing_tag_id: int,
+        fullaccess_token: str,
+    ) -> None:
+        headers = {"Authorization": f"Bearer {fullaccess_token}"}
+        response = client.get("/tag", headers=headers)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        response = client.get("/tag", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+        response = client.put(
+            f"/tag/{existing_tag_id}", headers=headers, json={"tag_name": "TAG_ETAG"}
+        )
+        assert response.status_code == 200
+
+        response = client.get("/tag", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert "TAG_ETAG" in [tag["tag_name"] for tag in response.json()]
+
     @pytest.mark.parametrize(
         "tag_name_1,tag_name_2",
         [
@@ -214,3 +243,10 @@ def test_convert_record_to_schema() -> None:
     assert result.tag_id == tag_id
     assert result.user_id == user_id
     assert result.tag_name == "tag"
+
+
+async def test_bump_catalog_version_logs_redis_errors() -> None:
+    redis = MagicMock(spec=aioredis.Redis)
+    redis.set = AsyncMock(side_effect=RedisConnectionError("Redis is down"))
+
+    await bump_catalog_version(redis, 1)
@@ -135,6 +135,29 @@ class TestManageUDRules:
         assert response.status_code == 200
         assert len(response.json()) > 0
 
+    def test_list_UDrules_not_modified(
+        self, client: TestClient, existing_rule_id: int, fullaccess_token: str
+    ) -> None:
+        headers = {"Authorization": f"Bearer {fullaccess_token}"}
+        response = client.get("/urgency-rules/", headers=headers)
+        etag = response.headers["ETag"]
+
+        response = client.get(
+            "/urgency-rules/", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+        response = client.delete(f"/urgency-rules/{existing_rule_id}", headers=headers)
+        assert response.status_code == 200
+
+        response = client.get(
+            "/urgency-rules/", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert existing_rule_id not in [
+            rule["urgency_rule_id"] for rule in response.json()
+        ]
+
     def test_delete_UDrules(
         self, client: TestClient, existing_rule_id: int, fullaccess_token: str
     ) -> None:
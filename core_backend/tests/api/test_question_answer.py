@@ -1,23 +1,42 @@
+import json
 import os
 from functools import partial
-from typing import Any, Dict, List
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
 from unittest.mock import MagicMock, patch
 
 import pytest
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
-
-from core_backend.app.llm_call.llm_prompts import AlignmentScore, IdentifiedLanguage
+from redis import asyncio as aioredis
+
+from core_backend.app.config import REDIS_HOST
+from core_backend.app.contents import models as contents_models
+from core_backend.app.llm_call import process_input, process_output
+from core_backend.app.llm_call.llm_prompts import (
+    RAG_FAILURE_MESSAGE,
+    AlignmentScore,
+    IdentifiedLanguage,
+)
+from core_backend.app.llm_call.llm_rag import RAGAnswerStream
 from core_backend.app.llm_call.process_input import (
     _classify_on_off_topic,
     _classify_safety,
     _identify_language,
+    _run_input_rails,
     _translate_question,
 )
 from core_backend.app.llm_call.process_output import _check_align_score
+from core_backend.app.question_answer.cache import (
+    cache_search_response,
+    get_cached_search_response,
+    get_search_cache_key,
+    invalidate_search_cache,
+    normalize_query_text,
+)
 from core_backend.app.question_answer.config import N_TOP_CONTENT
 from core_backend.app.question_answer.schemas import (
     ErrorType,
+    QueryBase,
     QueryRefined,
     QueryResponse,
     QueryResponseError,
@@ -29,6 +48,7 @@ from core_backend.app.question_answer.utils import (
 from core_backend.tests.api.conftest import (
     TEST_USERNAME,
     TEST_USERNAME_2,
+    async_fake_embedding_batch,
 )
 
 
@@ -86,7 +106,7 @@ class TestApiCallQuota:
     ) -> None:
         temp_api_key, api_daily_limit = temp_user_api_key_and_api_quota
 
-        for _i in range(api_daily_limit):
+        for i in range(api_daily_limit):
             response = client.post(
                 "/search",
                 json={
@@ -96,6 +116,9 @@ class TestApiCallQuota:
                 headers={"Authorization": f"Bearer {temp_api_key}"},
             )
             assert response.status_code == 200
+            assert response.headers["X-RateLimit-Remaining"] == str(
+                api_daily_limit - i - 1
+            )
         response = client.post(
             "/search",
             json={
@@ -105,6 +128,7 @@ class TestApiCallQuota:
             headers={"Authorization": f"Bearer {temp_api_key}"},
         )
         assert response.status_code == 429
+        assert response.headers["X-RateLimit-Remaining"] == "0"
 
     @pytest.mark.parametrize(
         "temp_user_api_key_and_api_quota",
@@ -183,6 +207,7 @@ class TestApiCallQuota:
             headers={"Authorization": f"Bearer {temp_api_key}"},
         )
         assert response.status_code == 200
+        assert "X-RateLimit-Remaining" not in response.headers
 
 
 class TestEmbeddingsSearch:
@@ -559,6 +584,98 @@ class TestGenerateResponse:
                     assert json_response["tts_file"] is None
 
 
+class TestSearchStream:
+    @staticmethod
+    def _parse_events(body: str) -> List[Tuple[str, Any]]:
+        events = []
+        for block in body.strip().split("\n\n"):
+            event_line, data_line = block.split("\n")
+            events.append(
+                (
+                    event_line.removeprefix("event: "),
+                    json.loads(data_line.removeprefix("data: ")),
+                )
+            )
+        return events
+
+    @staticmethod
+    async def _fake_chunks(text: str) -> AsyncIterator[str]:
+        for i in range(0, len(text), 4):
+            yield text[i : i + 4]
+
+    def test_search_stream_events(
+        self,
+        client: TestClient,
+        api_key_user1: str,
+        faq_contents: pytest.FixtureRequest,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        answer = 'A "streamed" answer\nwith two lines'
+        llm_output = json.dumps({"extracted_info": ["info"], "answer": answer})
+        monkeypatch.setattr(
+            process_output,
+            "stream_llm_rag_answer",
+            lambda **kwargs: RAGAnswerStream(self._fake_chunks(llm_output)),
+        )
+
+        response = client.post(
+            "/search-stream",
+            json={
+                "query_text": "Tell me about a good sport to play",
+                "generate_llm_response": True,
+            },
+            headers={"Authorization": f"Bearer {api_key_user1}"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = self._parse_events(response.text)
+        event_names = [name for name, _ in events]
+        assert event_names[0] == "search_results"
+        assert event_names[-1] == "final_response"
+        assert set(event_names[1:-1]) == {"llm_response_token"}
+
+        search_results = events[0][1]
+        assert len(search_results["search_results"]) == int(N_TOP_CONTENT)
+        assert search_results["llm_response"] is None
+
+        tokens = "".join(data["token"] for _, data in events[1:-1])
+        assert tokens == answer
+
+        final_response = events[-1][1]
+        assert final_response["llm_response"] == answer
+        assert final_response["query_id"] == search_results["query_id"]
+        assert "factual_consistency" in final_response["debug_info"]
+
+    def test_search_stream_without_llm_response(
+        self,
+        client: TestClient,
+        api_key_user1: str,
+        faq_contents: pytest.FixtureRequest,
+    ) -> None:
+        response = client.post(
+            "/search-stream",
+            json={
+                "query_text": "Tell me about a good sport to play",
+                "generate_llm_response": False,
+            },
+            headers={"Authorization": f"Bearer {api_key_user1}"},
+        )
+        assert response.status_code == 200
+
+        events = self._parse_events(response.text)
+        assert [name for name, _ in events] == ["search_results", "final_response"]
+        assert events[1][1]["llm_response"] is None
+
+    async def test_failure_message_is_not_streamed(self) -> None:
+        llm_output = json.dumps({"extracted_info": [], "answer": RAG_FAILURE_MESSAGE})
+        stream = RAGAnswerStream(self._fake_chunks(llm_output))
+
+        assert [token async for token in stream] == []
+        assert stream.rag is not None
+        assert stream.rag.answer == RAG_FAILURE_MESSAGE
+
+
 class TestSTTLLMResponse:
     @pytest.mark.parametrize(
         "outcome, generate_tts, expected_status_code, mock_response",
@@ -825,6 +942,296 @@ class TestErrorResponses:
             assert isinstance(response, QueryResponse)
 
 
+class TestInputRails:
+    @pytest.fixture
+    def user_query_response(self) -> QueryResponse:
+        return QueryResponse(
+            query_id=124,
+            search_results=None,
+            llm_response=None,
+            feedback_secret_key="abc123",
+            debug_info={},
+        )
+
+    @pytest.fixture
+    def user_query_refined(self) -> QueryRefined:
+        return QueryRefined(
+            query_text="This is a basic query",
+            user_id=124,
+            query_text_original="This is a basic query",
+        )
+
+    @pytest.fixture
+    def searched_texts(self) -> List[str]:
+        return []
+
+    @pytest.fixture
+    def search(self, searched_texts: List[str]) -> Any:
+        async def _search(
+            query_refined: QueryRefined, response: QueryResponse
+        ) -> QueryResponse:
+            searched_texts.append(query_refined.query_text)
+            response.search_results = {}
+            return response
+
+        return _search
+
+    @staticmethod
+    async def mock_paraphrase(
+        question: QueryRefined, response: QueryResponse, metadata: Any = None
+    ) -> tuple[QueryRefined, QueryResponse]:
+        question.query_text = question.query_text + " (paraphrased)"
+        response.debug_info["paraphrased_question"] = question.query_text
+        return question, response
+
+    async def test_english_query_uses_speculative_search(
+        self,
+        user_query_refined: QueryRefined,
+        user_query_response: QueryResponse,
+        search: Any,
+        searched_texts: List[str],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(
+            "core_backend.app.llm_call.process_input._paraphrase_question",
+            self.mock_paraphrase,
+        )
+        response = await _run_input_rails(
+            user_query_refined, user_query_response, search
+        )
+
+        assert isinstance(response, QueryResponse)
+        assert searched_texts == ["This is a basic query (paraphrased)"]
+        assert user_query_refined.query_text == "This is a basic query (paraphrased)"
+        assert user_query_refined.original_language == IdentifiedLanguage.ENGLISH
+        assert response.debug_info["original_language"] == "ENGLISH"
+        assert "paraphrased_question" in response.debug_info
+
+    async def test_non_english_query_translates_before_search(
+        self,
+        user_query_refined: QueryRefined,
+        user_query_response: QueryResponse,
+        search: Any,
+        searched_texts: List[str],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        async def mock_identify_hindi(
+            question: QueryRefined, response: QueryResponse, metadata: Any = None
+        ) -> tuple[QueryRefined, QueryResponse]:
+            question.original_language = IdentifiedLanguage.HINDI
+            return question, response
+
+        async def mock_translate(
+            question: QueryRefined, response: QueryResponse, metadata: Any = None
+        ) -> tuple[QueryRefined, QueryResponse]:
+            question.query_text = "translated query"
+            return question, response
+
+        monkeypatch.setattr(
+            "core_backend.app.llm_call.process_input._identify_language",
+            mock_identify_hindi,
+        )
+        monkeypatch.setattr(
+            "core_backend.app.llm_call.process_input._translate_question",
+            mock_translate,
+        )
+        monkeypatch.setattr(
+            "core_backend.app.llm_call.process_input._paraphrase_question",
+            self.mock_paraphrase,
+        )
+        response = await _run_input_rails(
+            user_query_refined, user_query_response, search
+        )
+
+        assert isinstance(response, QueryResponse)
+        assert searched_texts[-1] == "translated query (paraphrased)"
+        assert user_query_refined.query_text == "translated query (paraphrased)"
+
+    async def test_failed_rail_searches_original_text(
+        self,
+        user_query_refined: QueryRefined,
+        user_query_response: QueryResponse,
+        search: Any,
+        searched_texts: List[str],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        async def mock_ask_llm(*args: Any, **kwargs: Any) -> str:
+            return "PROMPT_INJECTION"
+
+        monkeypatch.setattr(
+            "core_backend.app.llm_call.process_input._classify_safety",
+            _classify_safety,
+        )
+        monkeypatch.setattr(
+            "core_backend.app.llm_call.process_input._ask_llm_async", mock_ask_llm
+        )
+        response = await _run_input_rails(
+            user_query_refined, user_query_response, search
+        )
+
+        assert isinstance(response, QueryResponseError)
+        assert response.error_type == ErrorType.QUERY_UNSAFE
+        assert response.search_results == {}
+        assert searched_texts[-1] == "This is a basic query"
+
+
+class TestSearchCache:
+    USER_ID = 124
+
+    @pytest.fixture
+    async def redis(self) -> AsyncGenerator[aioredis.Redis, None]:
+        redis = await aioredis.from_url(REDIS_HOST)
+        await invalidate_search_cache(redis, self.USER_ID)
+        yield redis
+        await redis.close()
+
+    @pytest.fixture
+    def response_template(self) -> QueryResponse:
+        return QueryResponse(
+            query_id=125,
+            feedback_secret_key="def456",
+            search_results=None,
+            debug_info={},
+        )
+
+    @pytest.fixture
+    def cached_response(self) -> QueryResponse:
+        return QueryResponse(
+            query_id=124,
+            feedback_secret_key="abc123",
+            llm_response="cached llm response",
+            search_results={
+                0: QuerySearchResult(title="World", text="hello", id=1, distance=0.2)
+            },
+            debug_info={},
+        )
+
+    @pytest.mark.parametrize(
+        "query_text, expected",
+        [
+            ("What is AAQ?", "what is aaq"),
+            ("  what   is\nAAQ ?! ", "what is aaq"),
+            ("AAQ.v2", "aaq.v2"),
+        ],
+    )
+    def test_normalize_query_text(self, query_text: str, expected: str) -> None:
+        assert normalize_query_text(query_text) == expected
+
+    async def test_exact_hit_keeps_query_identifiers(
+        self,
+        redis: aioredis.Redis,
+        response_template: QueryResponse,
+        cached_response: QueryResponse,
+    ) -> None:
+        await cache_search_response(
+            redis=redis,
+            cache_key=await get_search_cache_key(
+                redis, self.USER_ID, QueryBase(query_text="What is AAQ?")
+            ),
+            response=cached_response,
+        )
+        response = await get_cached_search_response(
+            redis=redis,
+            cache_key=await get_search_cache_key(
+                redis, self.USER_ID, QueryBase(query_text="what is aaq")
+            ),
+            response_template=response_template,
+        )
+
+        assert response is not None
+        assert response.query_id == 125
+        assert response.feedback_secret_key == "def456"
+        assert response.llm_response == "cached llm response"
+        assert response.search_results == cached_response.search_results
+        assert response.debug_info["cache_hit"] == "exact"
+
+    async def test_miss_on_different_generate_llm_response(
+        self,
+        redis: aioredis.Redis,
+        response_template: QueryResponse,
+        cached_response: QueryResponse,
+    ) -> None:
+        await cache_search_response(
+            redis=redis,
+            cache_key=await get_search_cache_key(
+                redis, self.USER_ID, QueryBase(query_text="What is AAQ?")
+            ),
+            response=cached_response,
+        )
+        response = await get_cached_search_response(
+            redis=redis,
+            cache_key=await get_search_cache_key(
+                redis,
+                self.USER_ID,
+                QueryBase(query_text="What is AAQ?", generate_llm_response=True),
+            ),
+            response_template=response_template,
+        )
+        assert response is None
+
+    async def test_invalidate_clears_cache(
+        self,
+        redis: aioredis.Redis,
+        response_template: QueryResponse,
+        cached_response: QueryResponse,
+    ) -> None:
+        user_query = QueryBase(query_text="What is AAQ?")
+        await cache_search_response(
+            redis=redis,
+            cache_key=await get_search_cache_key(redis, self.USER_ID, user_query),
+            response=cached_response,
+        )
+        await invalidate_search_cache(redis, self.USER_ID)
+        response = await get_cached_search_response(
+            redis=redis,
+            cache_key=await get_search_cache_key(redis, self.USER_ID, user_query),
+            response_template=response_template,
+        )
+        assert response is None
+
+    async def test_response_stored_after_invalidation_is_not_served(
+        self,
+        redis: aioredis.Redis,
+        response_template: QueryResponse,
+        cached_response: QueryResponse,
+    ) -> None:
+        user_query = QueryBase(query_text="What is AAQ?")
+        cache_key = await get_search_cache_key(redis, self.USER_ID, user_query)
+        await invalidate_search_cache(redis, self.USER_ID)
+        await cache_search_response(
+            redis=redis, cache_key=cache_key, response=cached_response
+        )
+        response = await get_cached_search_response(
+            redis=redis,
+            cache_key=await get_search_cache_key(redis, self.USER_ID, user_query),
+            response_template=response_template,
+        )
+        assert response is None
+
+    async def test_error_responses_are_not_cached(
+        self,
+        redis: aioredis.Redis,
+        response_template: QueryResponse,
+        cached_response: QueryResponse,
+    ) -> None:
+        user_query = QueryBase(query_text="What is AAQ?")
+        error_response = QueryResponseError(
+            **cached_response.model_dump(),
+            error_type=ErrorType.QUERY_UNSAFE,
+        )
+        await cache_search_response(
+            redis=redis,
+            cache_key=await get_search_cache_key(redis, self.USER_ID, user_query),
+            response=error_response,
+        )
+        response = await get_cached_search_response(
+            redis=redis,
+            cache_key=await get_search_cache_key(redis, self.USER_ID, user_query),
+            response_template=response_template,
+        )
+        assert response is None
+
+
 class TestAlignScore:
     @pytest.fixture
     def user_query_response(self) -> QueryResponse:
@@ -907,3 +1314,127 @@ class TestAlignScore:
             "1. World\nhello world\n\n2. Universe\ngoodbye universe"
         )
         assert context_string == expected_context_string
+
+
+class TestSearchBatch:
+    def test_search_batch_results(
+        self,
+        client: TestClient,
+        api_key_user1: str,
+        faq_contents: pytest.FixtureRequest,
+    ) -> None:
+        query_texts = [
+            "Tell me about a good sport to play",
+            "What is the best food?",
+            "Tell me about a good sport to play",
+        ]
+        response = client.post(
+            "/search-batch",
+            json={
+                "queries": [
+                    {"query_text": query_text, "generate_llm_response": False}
+                    for query_text in query_texts
+                ]
+            },
+            headers={"Authorization": f"Bearer {api_key_user1}"},
+        )
+        assert response.status_code == 200
+
+        responses = response.json()["responses"]
+        assert len(responses) == len(query_texts)
+        assert len({r["query_id"] for r in responses}) == len(query_texts)
+        for query_response in responses:
+            assert "error_type" not in query_response
+            assert len(query_response["search_results"]) == int(N_TOP_CONTENT)
+        # duplicate questions are only searched for once
+        assert responses[0]["search_results"] == responses[2]["search_results"]
+
+    def test_search_batch_paraphrased(
+        self,
+        client: TestClient,
+        api_key_user1: str,
+        faq_contents: pytest.FixtureRequest,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        async def paraphrase(
+            question: QueryRefined, response: QueryResponse, metadata: Optional[dict]
+        ) -> Tuple[QueryRefined, QueryResponse]:
+            question.query_text = f"Paraphrased: {question.query_text}"
+            return question, response
+
+        embedded_texts: List[List[str]] = []
+
+        async def embedding_batch(
+            texts: List[str], *args: Any, **kwargs: Any
+        ) -> List[List[float]]:
+            embedded_texts.append(texts)
+            return await async_fake_embedding_batch(texts)
+
+        async def embedding(*args: Any, **kwargs: Any) -> List[float]:
+            raise AssertionError("Queries of a batch must be embedded together")
+
+        monkeypatch.setattr(process_input, "_paraphrase_question", paraphrase)
+        monkeypatch.setattr(contents_models, "embedding_batch", embedding_batch)
+        monkeypatch.setattr(contents_models, "embedding", embedding)
+
+        query_texts = ["What is the best food?", "Tell me about a good sport to play"]
+        response = client.post(
+            "/search-batch",
+            json={
+                "queries": [
+                    {"query_text": query_text, "generate_llm_response": False}
+                    for query_text in query_texts
+                ]
+            },
+            headers={"Authorization": f"Bearer {api_key_user1}"},
+        )
+        assert response.status_code == 200
+
+        assert embedded_texts == [[f"Paraphrased: {text}" for text in query_texts]]
+        for query_response in response.json()["responses"]:
+            assert "error_type" not in query_response
+            assert len(query_response["search_results"]) == int(N_TOP_CONTENT)
+
+    def test_search_batch_empty(self, client: TestClient, api_key_user1: str) -> None:
+        response = client.post(
+            "/search-batch",
+            json={"queries": []},
+            headers={"Authorization": f"Bearer {api_key_user1}"},
+        )
+        assert response.status_code == 422
+
+    @pytest.mark.parametrize(
+        "temp_user_api_key_and_api_quota",
+        [{"username": "temp_user_batch_api_limit_3", "api_daily_quota": 3}],
+        indirect=True,
+    )
+    def test_search_batch_quota(
+        self,
+        client: TestClient,
+        temp_user_api_key_and_api_quota: tuple[str, int],
+    ) -> None:
+        temp_api_key, api_daily_limit = temp_user_api_key_and_api_quota
+
+        def post_batch(n_queries: int) -> Any:
+            return client.post(
+                "/search-batch",
+                json={
+                    "queries": [
+                        {"query_text": f"Test question {i}"} for i in range(n_queries)
+                    ]
+                },
+                headers={"Authorization": f"Bearer {temp_api_key}"},
+            )
+
+        response = post_batch(2)
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Remaining"] == str(api_daily_limit - 2)
+
+        # all or none of the queries of a batch are allowed
+        response = post_batch(2)
+        assert response.status_code == 429
+        assert response.headers["X-RateLimit-Remaining"] == "1"
+
+        response = post_batch(1)
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Remaining"] == "0"
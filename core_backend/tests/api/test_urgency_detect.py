@@ -1,12 +1,24 @@
-from typing import Callable
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Callable, List
 
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
+from redis import asyncio as aioredis
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core_backend.app.config import REDIS_HOST
 from core_backend.app.urgency_detection.config import URGENCY_CLASSIFIER
-from core_backend.app.urgency_detection.routers import ALL_URGENCY_CLASSIFIERS
+from core_backend.app.urgency_detection.routers import (
+    ALL_URGENCY_BATCH_CLASSIFIERS,
+    ALL_URGENCY_CLASSIFIERS,
+)
 from core_backend.app.urgency_detection.schemas import UrgencyQuery, UrgencyResponse
+from core_backend.app.urgency_rules.matrix import (
+    RuleMatrixCache,
+    get_rule_matrix_cache,
+)
 from core_backend.tests.api.conftest import TEST_USERNAME, TEST_USERNAME_2
 
 
@@ -133,3 +145,261 @@ class TestUrgencyClassifiers:
         )
 
         assert isinstance(classifier_response, UrgencyResponse)
+
+    @pytest.mark.parametrize("batch_classifier", ALL_URGENCY_BATCH_CLASSIFIERS.values())
+    async def test_batch_classifier(
+        self, admin_user: int, asession: AsyncSession, batch_classifier: Callable
+    ) -> None:
+        urgency_queries = [
+            UrgencyQuery(message_text="Is it normal to feel bloated?"),
+            UrgencyQuery(message_text="has trouble breathing"),
+        ]
+        classifier_responses = await batch_classifier(
+            user_id=admin_user, urgency_queries=urgency_queries, asession=asession
+        )
+
+        assert len(classifier_responses) == len(urgency_queries)
+        for classifier_response in classifier_responses:
+            assert isinstance(classifier_response, UrgencyResponse)
+
+
+class TestUrgencyDetectionBatch:
+    def test_ud_batch_response(
+        self,
+        api_key_user1: str,
+        client: TestClient,
+        urgency_rules: int,
+    ) -> None:
+        message_texts = ["has trouble breathing", "Is it normal to feel bloated?"]
+        response = client.post(
+            "/urgency-detect-batch",
+            json={"queries": [{"message_text": text} for text in message_texts]},
+            headers={"Authorization": f"Bearer {api_key_user1}"},
+        )
+        assert response.status_code == 200
+
+        responses = response.json()["responses"]
+        assert len(responses) == len(message_texts)
+        if URGENCY_CLASSIFIER == "cosine_distance_classifier":
+            for json_response in responses:
+                distances = [d["distance"] for d in json_response["details"].values()]
+                assert len(distances) == urgency_rules
+                assert distances == sorted(distances)
+                assert json_response["is_urgent"] == bool(
+                    json_response["matched_rules"]
+                )
+
+    @pytest.mark.parametrize(
+        "temp_user_api_key_and_api_quota",
+        [{"username": "temp_user_ud_batch_api_limit_3", "api_daily_quota": 3}],
+        indirect=True,
+    )
+    def test_ud_batch_quota(
+        self,
+        client: TestClient,
+        temp_user_api_key_and_api_quota: tuple[str, int],
+    ) -> None:
+        temp_api_key, _ = temp_user_api_key_and_api_quota
+
+        def post_batch(n_queries: int) -> Any:
+            return client.post(
+                "/urgency-detect-batch",
+                json={"queries": [{"message_text": "Test"}] * n_queries},
+                headers={"Authorization": f"Bearer {temp_api_key}"},
+            )
+
+        assert post_batch(2).status_code == 200
+        assert post_batch(2).status_code == 429
+        assert post_batch(1).status_code == 200
+
+
+class TestRuleMatrix:
+    @staticmethod
+    def make_rules(vectors: List[List[float]]) -> List[SimpleNamespace]:
+        return [
+            SimpleNamespace(urgency_rule_text=f"rule {i}", urgency_rule_vector=vector)
+            for i, vector in enumerate(vectors)
+        ]
+
+    async def test_cosine_distances(self) -> None:
+        rng = np.random.default_rng(0)
+        rule_vectors = rng.normal(size=(5, 8))
+        message_vectors = rng.normal(size=(3, 8))
+
+        async def load() -> List[SimpleNamespace]:
+            return self.make_rules(rule_vectors.tolist())
+
+        rule_matrix = await RuleMatrixCache(ttl_seconds=60).get(1, load)
+        distances = rule_matrix.get_cosine_distances(message_vectors.tolist())
+
+        rule_norms = np.linalg.norm(rule_vectors, axis=1)
+        message_norms = np.linalg.norm(message_vectors, axis=1)
+        expected = 1 - (rule_vectors @ message_vectors.T) / np.outer(
+            rule_norms, message_norms
+        )
+        assert distances.shape == (5, 3)
+        np.testing.assert_allclose(distances, expected, atol=1e-5)
+
+    async def test_no_rules(self) -> None:
+        async def load() -> List[SimpleNamespace]:
+            return []
+
+        rule_matrix = await RuleMatrixCache(ttl_seconds=60).get(1, load)
+        assert rule_matrix.get_cosine_distances([[1.0, 0.0]]).shape == (0, 1)
+
+    async def test_invalidate(self) -> None:
+        n_loads = 0
+
+        async def load() -> List[SimpleNamespace]:
+            nonlocal n_loads
+            n_loads += 1
+            return self.make_rules([[1.0, 0.0]] * n_loads)
+
+        cache = RuleMatrixCache(ttl_seconds=60)
+        assert len((await cache.get(1, load)).rule_texts) == 1
+        assert len((await cache.get(1, load)).rule_texts) == 1
+
+        await cache.invalidate(1)
+        assert not cache._locks
+        assert len((await cache.get(1, load)).rule_texts) == 2
+
+        expired_cache = RuleMatrixCache(ttl_seconds=-1)
+        await expired_cache.get(1, load)
+        await expired_cache.get(1, load)
+        assert n_loads == 4
+
+    async def test_handle_change(self) -> None:
+        n_loads = 0
+
+        async def load() -> List[SimpleNamespace]:
+            nonlocal n_loads
+            n_loads += 1
+            return self.make_rules([[1.0, 0.0]])
+
+        # without Redis, matrices are loaded with version 0
+        cache = RuleMatrixCache(ttl_seconds=60)
+        await cache.get(1, load)
+
+        cache.handle_change(b"1:0")
+        cache.handle_change(b"2:1")
+        await cache.get(1, load)
+        assert n_loads == 1
+
+        cache.handle_change(b"1:1")
+        await cache.get(1, load)
+        assert n_loads == 2
+
+    async def test_change_announcements(self) -> None:
+        user_id = 987654321
+        n_loads = 0
+
+        async def load() -> List[SimpleNamespace]:
+            nonlocal n_loads
+            n_loads += 1
+            return self.make_rules([[1.0, 0.0]])
+
+        redis = await aioredis.from_url(REDIS_HOST)
+        worker_1 = RuleMatrixCache(ttl_seconds=60)
+        worker_2 = RuleMatrixCache(ttl_seconds=60)
+        worker_1.start(redis)
+        worker_2.start(redis)
+        try:
+            for _ in range(50):
+                if worker_1.is_subscribed and worker_2.is_subscribed:
+                    break
+                await asyncio.sleep(0.1)
+            await worker_2.get(user_id, load)
+
+            # a malformed announcement doesn't stop the listener
+            await redis.publish(RuleMatrixCache.CHANNEL, "not-a-change")
+            await worker_1.invalidate(user_id)
+            for _ in range(50):
+                await asyncio.sleep(0.1)
+                await worker_2.get(user_id, load)
+                if n_loads == 2:
+                    break
+            assert n_loads == 2
+        finally:
+            await worker_1.stop()
+            await worker_2.stop()
+            await redis.delete(RuleMatrixCache.get_version_key(user_id))
+            await redis.close()
+
+    async def test_change_while_loading(self) -> None:
+        user_id = 987654322
+        n_loads = 0
+        redis = await aioredis.from_url(REDIS_HOST)
+
+        async def load() -> List[SimpleNamespace]:
+            nonlocal n_loads
+            n_loads += 1
+            if n_loads == 1:
+                # another worker changes the rules once these are read
+                await redis.incr(RuleMatrixCache.get_version_key(user_id))
+            return self.make_rules([[1.0, 0.0]])
+
+        cache = RuleMatrixCache(ttl_seconds=60)
+        cache.redis = redis
+        try:
+            await cache.get(user_id, load)
+            assert user_id not in cache._matrices
+            assert user_id not in cache._locks
+
+            await cache.get(user_id, load)
+            await cache.get(user_id, load)
+            assert n_loads == 2
+        finally:
+            await redis.delete(RuleMatrixCache.get_version_key(user_id))
+            await redis.close()
+
+
+@pytest.mark.skipif(
+    URGENCY_CLASSIFIER != "cosine_distance_classifier",
+    reason="Only the cosine distance classifier uses the rule matrix",
+)
+class TestUrgencyDetectionRuleMatrixCache:
+    def test_ud_with_rule_matrix_cache(
+        self,
+        api_key_user1: str,
+        fullaccess_token: str,
+        client: TestClient,
+        urgency_rules: int,
+        user1: int,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        cache = get_rule_matrix_cache()
+        monkeypatch.setattr(cache, "enabled", True)
+        headers = {"Authorization": f"Bearer {fullaccess_token}"}
+
+        def get_n_rules_scored() -> int:
+            response = client.post(
+                "/urgency-detect",
+                json={"message_text": "has trouble breathing"},
+                headers={"Authorization": f"Bearer {api_key_user1}"},
+            )
+            assert response.status_code == 200
+            return len(response.json()["details"])
+
+        try:
+            assert get_n_rules_scored() == urgency_rules
+            rule_matrix = cache._matrices[user1]
+            assert get_n_rules_scored() == urgency_rules
+            assert cache._matrices[user1] is rule_matrix
+
+            response = client.post(
+                "/urgency-rules",
+                headers=headers,
+                json={
+                    "urgency_rule_text": "Severe chest pain",
+                    "urgency_rule_metadata": {},
+                },
+            )
+            assert response.status_code == 200
+            rule_id = response.json()["urgency_rule_id"]
+            assert get_n_rules_scored() == urgency_rules + 1
+
+            response = client.delete(f"/urgency-rules/{rule_id}", headers=headers)
+            assert response.status_code == 200
+            assert get_n_rules_scored() == urgency_rules
+        finally:
+            cache.clear()
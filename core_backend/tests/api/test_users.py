@@ -1,6 +1,11 @@
+import json
+
 import pytest
+from redis import asyncio as aioredis
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core_backend.app.config import REDIS_HOST
+from core_backend.app.users.cache import UserCache
 from core_backend.app.users.models import (
     UserAlreadyExistsError,
     UserNotFoundError,
@@ -9,7 +14,7 @@ from core_backend.app.users.models import (
     save_user_to_db,
     update_user_api_key,
 )
-from core_backend.app.users.schemas import UserCreate
+from core_backend.app.users.schemas import UserCreate, UserIdentity
 from core_backend.app.utils import get_key_hash
 from core_backend.tests.api.conftest import (
     TEST_USERNAME,
@@ -57,3 +62,58 @@ class TestUsers:
         updated_user = await update_user_api_key(saved_user, "new_key", asession)
         assert updated_user.hashed_api_key is not None
         assert updated_user.hashed_api_key == get_key_hash("new_key")
+
+
+class TestUserCache:
+    @pytest.fixture
+    def cache(self) -> UserCache:
+        return UserCache(max_size=2, ttl_seconds=60, local_ttl_seconds=60)
+
+    @pytest.fixture
+    async def user(self, api_key_user1: str, asession: AsyncSession) -> UserIdentity:
+        user_db = await get_user_by_api_key(api_key_user1, asession)
+        return UserIdentity.model_validate(user_db)
+
+    async def test_roundtrip(
+        self, cache: UserCache, api_key_user1: str, user: UserIdentity
+    ) -> None:
+        await cache.set(get_key_hash(api_key_user1), user)
+        cached_user = await cache.get(get_key_hash(api_key_user1))
+
+        assert cached_user is not None
+        assert cached_user == user
+        assert cached_user.username == TEST_USERNAME
+
+    async def test_invalidate(
+        self, cache: UserCache, api_key_user1: str, user: UserIdentity
+    ) -> None:
+        await cache.set(get_key_hash(api_key_user1), user)
+        await cache.invalidate(get_key_hash(api_key_user1))
+
+        assert await cache.get(get_key_hash(api_key_user1)) is None
+
+    async def test_local_tier_expires(
+        self, api_key_user1: str, user: UserIdentity
+    ) -> None:
+        cache = UserCache(max_size=2, ttl_seconds=60, local_ttl_seconds=0)
+        await cache.set(get_key_hash(api_key_user1), user)
+
+        assert await cache.get(get_key_hash(api_key_user1)) is None
+
+    async def test_shared_tier_has_no_password(
+        self, api_key_user1: str, user: UserIdentity
+    ) -> None:
+        cache = UserCache(max_size=2, ttl_seconds=60, local_ttl_seconds=0)
+        redis = await aioredis.from_url(REDIS_HOST)
+        cache.set_redis(redis)
+        hashed_api_key = get_key_hash(api_key_user1)
+        try:
+            await cache.set(hashed_api_key, user)
+            cached_json = await redis.get(cache.get_redis_key(hashed_api_key))
+            cached_user = await cache.get(hashed_api_key)
+        finally:
+            await cache.invalidate(hashed_api_key)
+            await redis.close()
+
+        assert cached_user == user
+        assert set(json.loads(cached_json)) == set(UserIdentity.model_fields)
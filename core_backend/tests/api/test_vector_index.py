@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core_backend.app.contents import models
+from core_backend.app.contents.models import get_search_results
+from core_backend.app.contents.vector_index import InMemoryVectorIndex
+from core_backend.tests.api.conftest import async_fake_embedding
+
+
+def make_content(
+    content_id: int, embedding: List[float], is_archived: bool = False
+) -> SimpleNamespace:
+    return SimpleNamespace(
+        content_id=content_id,
+        content_title=f"title {content_id}",
+        content_text=f"text {content_id}",
+        content_embedding=embedding,
+        is_archived=is_archived,
+    )
+
+
+class TestInMemoryVectorIndex:
+    async def test_search_matches_pgvector(
+        self,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        question_embedding = await async_fake_embedding()
+        expected = await get_search_results(
+            user_id=user1,
+            question_embedding=question_embedding,
+            n_similar=5,
+            asession=asession,
+        )
+
+        monkeypatch.setattr(models, "is_vector_index_enabled", lambda: True)
+        index = InMemoryVectorIndex(max_contents=100, max_bytes=1024 * 1024)
+        monkeypatch.setattr(models, "get_vector_index", lambda: index)
+        results = await get_search_results(
+            user_id=user1,
+            question_embedding=question_embedding,
+            n_similar=5,
+            asession=asession,
+        )
+
+        assert [r.id for r in results.values()] == [r.id for r in expected.values()]
+        for result, expected_result in zip(results.values(), expected.values()):
+            assert result.distance == pytest.approx(expected_result.distance, abs=1e-5)
+
+    async def test_falls_back_for_large_corpus(self) -> None:
+        index = InMemoryVectorIndex(max_contents=1, max_bytes=1024)
+
+        async def load(limit: int) -> List[SimpleNamespace]:
+            return [make_content(i, [1.0, 0.0]) for i in range(limit)]
+
+        tenant = await index.get_tenant(1, load)
+        assert tenant.matrix is None
+
+    async def test_incremental_updates(self) -> None:
+        index = InMemoryVectorIndex(max_contents=10, max_bytes=1024)
+
+        async def load(limit: int) -> List[SimpleNamespace]:
+            return [make_content(1, [1.0, 0.0]), make_content(2, [0.0, 1.0])]
+
+        tenant = await index.get_tenant(1, load)
+        assert [r[0] for r in tenant.search([1.0, 0.1], 2)] == [1, 2]
+
+        await index.update(1, upserted=[make_content(3, [3.0, 0.3])])
+        await index.update(1, upserted=[make_content(2, [1.0, 0.2])])
+        await index.update(1, removed_ids=[1])
+        results = tenant.search([1.0, 0.1], 5)
+
+        assert [r[0] for r in results] == [3, 2]
+        assert results[0][3] == pytest.approx(0.0, abs=1e-6)
+        assert np.allclose(np.linalg.norm(tenant.matrix, axis=1), 1.0)
+
+        await index.update(1, upserted=[make_content(3, [3.0, 0.3], is_archived=True)])
+        assert [r[0] for r in tenant.search([1.0, 0.1], 5)] == [2]
+
+    async def test_search_batch(self) -> None:
+        index = InMemoryVectorIndex(max_contents=10, max_bytes=1024)
+
+        async def load(limit: int) -> List[SimpleNamespace]:
+            return [make_content(1, [1.0, 0.0]), make_content(2, [0.0, 1.0])]
+
+        tenant = await index.get_tenant(1, load)
+        questions = [[1.0, 0.1], [0.1, 1.0], [0.0, 0.0]]
+        results = tenant.search_batch(questions, 2)
+
+        assert results == [tenant.search(question, 2) for question in questions]
+        assert [r[0] for r in results[1]] == [2, 1]
+        assert tenant.search_batch([], 2) == []
+
+    async def test_evicts_least_recently_searched(self) -> None:
+        # room for two users' 2 x 2 float32 matrices
+        index = InMemoryVectorIndex(max_contents=10, max_bytes=32)
+
+        async def load(limit: int) -> List[SimpleNamespace]:
+            return [make_content(1, [1.0, 0.0]), make_content(2, [0.0, 1.0])]
+
+        tenant_1 = await index.get_tenant(1, load)
+        await index.get_tenant(2, load)
+        assert await index.get_tenant(1, load) is tenant_1
+
+        await index.get_tenant(3, load)
+        assert list(index._tenants) == [1, 3]
+        assert set(index._locks) == {1, 3}
@@ -0,0 +1,220 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, List
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from core_backend.app import write_behind
+from core_backend.app.contents.models import ContentCounter, ContentDB
+from core_backend.app.question_answer.models import (
+    QueryResponseContentDB,
+    QueryResponseDB,
+)
+from core_backend.app.write_behind import WriteBehindQueue, get_write_behind_queue
+
+
+class TestWriteBehindQueue:
+    @pytest.fixture
+    def write_queue(
+        self, async_engine: AsyncEngine, monkeypatch: pytest.MonkeyPatch
+    ) -> WriteBehindQueue:
+        # use the engine of the test's event loop
+        monkeypatch.setattr(
+            write_behind, "get_sqlalchemy_async_engine", lambda: async_engine
+        )
+        return WriteBehindQueue(
+            max_batch_size=100, flush_interval_seconds=60, max_queue_size=100
+        )
+
+    async def _get_counters(
+        self, asession: AsyncSession, content_id: int
+    ) -> tuple[int, int, int]:
+        content_db = (
+            await asession.execute(
+                select(ContentDB)
+                .where(ContentDB.content_id == content_id)
+                .execution_options(populate_existing=True)
+            )
+        ).scalar_one()
+        return (
+            content_db.query_count,
+            content_db.positive_votes,
+            content_db.negative_votes,
+        )
+
+    async def test_stop_flushes_queued_writes(
+        self,
+        write_queue: WriteBehindQueue,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+    ) -> None:
+        content_id = faq_contents[0]
+        before = await self._get_counters(asession, content_id)
+
+        write_queue.start()
+        for _ in range(3):
+            await write_queue.increment_content_counter(
+                user_id=user1, content_ids=[content_id], counter="query_count"
+            )
+        await write_queue.increment_content_counter(
+            user_id=user1, content_ids=[content_id], counter="positive_votes"
+        )
+        # nothing is written before the flush interval
+        assert await self._get_counters(asession, content_id) == before
+
+        await write_queue.stop()
+        assert await self._get_counters(asession, content_id) == (
+            before[0] + 3,
+            before[1] + 1,
+            before[2],
+        )
+
+    async def test_failed_write_does_not_lose_batch(
+        self,
+        write_queue: WriteBehindQueue,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+    ) -> None:
+        content_id = faq_contents[0]
+        before = await self._get_counters(asession, content_id)
+
+        write_queue.start()
+        # violates the foreign key on query_id
+        await write_queue.insert(
+            [
+                QueryResponseContentDB(
+                    user_id=user1,
+                    query_id=-1,
+                    content_id=content_id,
+                    created_datetime_utc=datetime.now(timezone.utc),
+                )
+            ]
+        )
+        await write_queue.increment_content_counter(
+            user_id=user1, content_ids=[content_id], counter="query_count"
+        )
+        await write_queue.stop()
+
+        assert (await self._get_counters(asession, content_id))[0] == before[0] + 1
+
+    async def test_writes_inline_when_not_started(
+        self,
+        write_queue: WriteBehindQueue,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+    ) -> None:
+        content_id = faq_contents[0]
+        before = await self._get_counters(asession, content_id)
+
+        await write_queue.increment_content_counter(
+            user_id=user1, content_ids=[content_id], counter="negative_votes"
+        )
+        assert (await self._get_counters(asession, content_id))[2] == before[2] + 1
+
+    async def test_writer_survives_non_database_errors(
+        self,
+        write_queue: WriteBehindQueue,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        content_id = faq_contents[0]
+        before = await self._get_counters(asession, content_id)
+        apply_deltas = write_behind.apply_content_counter_deltas
+        n_calls = 0
+
+        async def fail_once(*args: Any, **kwargs: Any) -> None:
+            nonlocal n_calls
+            n_calls += 1
+            if n_calls == 1:
+                raise OSError("connection reset")
+            await apply_deltas(*args, **kwargs)
+
+        monkeypatch.setattr(write_behind, "apply_content_counter_deltas", fail_once)
+
+        write_queue.start()
+        counters: tuple[ContentCounter, ...] = ("query_count", "positive_votes")
+        for counter in counters:
+            await write_queue.increment_content_counter(
+                user_id=user1, content_ids=[content_id], counter=counter
+            )
+        # the failed batch is retried one write at a time
+        await write_queue.stop()
+
+        assert n_calls == 3
+        assert await self._get_counters(asession, content_id) == (
+            before[0] + 1,
+            before[1] + 1,
+            before[2],
+        )
+
+    async def test_writes_inline_when_writer_died(
+        self,
+        write_queue: WriteBehindQueue,
+        faq_contents: List[int],
+        user1: int,
+        asession: AsyncSession,
+    ) -> None:
+        content_id = faq_contents[0]
+        before = await self._get_counters(asession, content_id)
+
+        write_queue.start()
+        assert write_queue._worker is not None
+        write_queue._worker.cancel()
+        await asyncio.gather(write_queue._worker, return_exceptions=True)
+        assert not write_queue.is_running
+
+        await write_queue.increment_content_counter(
+            user_id=user1, content_ids=[content_id], counter="query_count"
+        )
+        assert (await self._get_counters(asession, content_id))[0] == before[0] + 1
+        await write_queue.stop()
+
+
+class TestWriteBehindSearch:
+    def test_search_is_saved_by_writer(
+        self,
+        client: TestClient,
+        api_key_user1: str,
+        faq_contents: List[int],
+        db_session: Session,
+    ) -> None:
+        # The writer is disabled in the test env, so start the app's writer here.
+        write_queue = get_write_behind_queue()
+        assert client.portal is not None
+        client.portal.call(write_queue.start)
+        try:
+            response = client.post(
+                "/search",
+                json={"query_text": "Test question", "generate_llm_response": False},
+                headers={"Authorization": f"Bearer {api_key_user1}"},
+            )
+            assert write_queue.is_running
+        finally:
+            client.portal.call(write_queue.stop)
+
+        assert response.status_code == 200
+        query_id = response.json()["query_id"]
+        content_ids = [
+            result["id"] for result in response.json()["search_results"].values()
+        ]
+        assert (
+            db_session.execute(
+                select(QueryResponseDB).where(QueryResponseDB.query_id == query_id)
+            ).scalar_one_or_none()
+            is not None
+        )
+        saved_content_ids = db_session.scalars(
+            select(QueryResponseContentDB.content_id).where(
+                QueryResponseContentDB.query_id == query_id
+            )
+        ).all()
+        assert sorted(saved_content_ids) == sorted(content_ids)
@@ -0,0 +1,171 @@
+"""Benchmark recall@k and latency of content search as the number of users grows,
+with a single HNSW index shared by all users versus one partial HNSW index per user.
+
+Contents are random vectors written to a scratch `benchmark_content` table in the
+database configured by the usual `POSTGRES_*` variables; the table is dropped at
+the end. Exact neighbours are computed with NumPy.
+
+Usage:
+    python -m core_backend.validation.retrieval.benchmark_tenant_index \
+        --n-users 1 10 50 --contents-per-user 500
+"""
+
+import argparse
+import math
+import time
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import Connection, text
+
+from core_backend.app.contents.config import (
+    PGVECTOR_EF_SEARCH_MAX,
+    PGVECTOR_EF_SEARCH_MIN,
+    PGVECTOR_EF_SEARCH_RATIO,
+)
+from core_backend.app.database import get_sqlalchemy_engine
+
+TABLE = "benchmark_content"
+
+
+def ef_search_for(n_contents: int, k: int) -> int:
+    """Same formula as `set_hnsw_ef_search`."""
+    ef_search = max(
+        int(PGVECTOR_EF_SEARCH_MIN),
+        k,
+        math.ceil(n_contents * float(PGVECTOR_EF_SEARCH_RATIO)),
+    )
+    return min(ef_search, int(PGVECTOR_EF_SEARCH_MAX))
+
+
+def to_pgvector(vector: np.ndarray) -> str:
+    """Format a vector as a pgvector literal."""
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def load_contents(
+    conn: Connection, n_users: int, contents_per_user: int, dim: int
+) -> Dict[int, np.ndarray]:
+    """Create the scratch table and fill it with normalized random vectors."""
+    rng = np.random.default_rng(0)
+    conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    conn.execute(
+        text(
+            f"CREATE TABLE {TABLE} (content_id serial PRIMARY KEY, "
+            f"user_id integer NOT NULL, is_archived boolean NOT NULL DEFAULT false, "
+            f"content_embedding vector({dim}) NOT NULL)"
+        )
+    )
+    embeddings = {}
+    for user_id in range(1, n_users + 1):
+        vectors = rng.standard_normal((contents_per_user, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        embeddings[user_id] = vectors
+        conn.execute(
+            text(
+                f"INSERT INTO {TABLE} (user_id, content_embedding) "
+                "VALUES (:user_id, CAST(:embedding AS vector))"
+            ),
+            [{"user_id": user_id, "embedding": to_pgvector(v)} for v in vectors],
+        )
+    conn.execute(text(f"CREATE INDEX ON {TABLE} (user_id)"))
+    conn.commit()
+    return embeddings
+
+
+def create_indexes(conn: Connection, per_user: bool, n_users: int) -> None:
+    """Create either one shared HNSW index or one partial HNSW index per user."""
+    conn.execute(text(f"DROP INDEX IF EXISTS {TABLE}_shared_idx"))
+    for user_id in range(1, n_users + 1):
+        conn.execute(text(f"DROP INDEX IF EXISTS {TABLE}_user_{user_id}_idx"))
+    hnsw = "USING hnsw (content_embedding vector_cosine_ops)"
+    if per_user:
+        for user_id in range(1, n_users + 1):
+            conn.execute(
+                text(
+                    f"CREATE INDEX {TABLE}_user_{user_id}_idx ON {TABLE} {hnsw} "
+                    f"WHERE user_id = {user_id} AND NOT is_archived"
+                )
+            )
+    else:
+        conn.execute(text(f"CREATE INDEX {TABLE}_shared_idx ON {TABLE} {hnsw}"))
+    conn.execute(text(f"ANALYZE {TABLE}"))
+    conn.commit()
+
+
+def run_queries(
+    conn: Connection,
+    embeddings: Dict[int, np.ndarray],
+    per_user: bool,
+    n_queries: int,
+    k: int,
+) -> tuple[float, float, float]:
+    """Return the mean recall@k and the p50 and p95 latencies in ms."""
+    rng = np.random.default_rng(1)
+    user_ids = list(embeddings)
+    recalls: List[float] = []
+    latencies: List[float] = []
+    for _ in range(n_queries):
+        user_id = int(rng.choice(user_ids))
+        question = rng.standard_normal(embeddings[user_id].shape[1])
+        exact = set(np.argsort(-(embeddings[user_id] @ question))[:k] + 1)
+
+        ef_search = ef_search_for(len(embeddings[user_id]), k) if per_user else 40
+        conn.execute(text(f"SET LOCAL hnsw.ef_search = {ef_search}"))
+        start = time.perf_counter()
+        rows = conn.execute(
+            text(
+                f"SELECT content_id FROM {TABLE} "
+                f"WHERE user_id = {user_id} AND NOT is_archived "
+                "ORDER BY content_embedding <=> CAST(:q AS vector) LIMIT :k"
+            ),
+            {"q": to_pgvector(question), "k": k},
+        ).scalars()
+        found = [
+            content_id - (user_id - 1) * len(embeddings[user_id]) for content_id in rows
+        ]
+        latencies.append((time.perf_counter() - start) * 1000)
+        conn.rollback()
+        recalls.append(len(exact.intersection(found)) / k)
+    return (
+        float(np.mean(recalls)),
+        float(np.percentile(latencies, 50)),
+        float(np.percentile(latencies, 95)),
+    )
+
+
+def main() -> None:
+    """Run the benchmark and print one row per (number of users, index layout)."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--n-users", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--contents-per-user", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'users':>6} {'index':>9} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    with get_sqlalchemy_engine().connect() as conn:
+        try:
+            for n_users in args.n_users:
+                embeddings = load_contents(
+                    conn, n_users, args.contents_per_user, args.dim
+                )
+                for per_user in (False, True):
+                    create_indexes(conn, per_user, n_users)
+                    recall, p50, p95 = run_queries(
+                        conn, embeddings, per_user, args.n_queries, args.k
+                    )
+                    layout = "per-user" if per_user else "shared"
+                    print(
+                        f"{n_users:>6} {layout:>9} {recall:>9.3f} "
+                        f"{p50:>8.2f} {p95:>8.2f}"
+                    )
+        finally:
+            conn.rollback()
+            conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -17,8 +17,11 @@ from core_backend.app.config import (
     LITELLM_MODEL_EMBEDDING,
 )
 from core_backend.app.contents.models import ContentDB
-from core_backend.app.question_answer.config import N_TOP_CONTENT
-from core_backend.app.question_answer.schemas import QueryBase
+from core_backend.app.question_answer.config import (
+    N_TOP_CONTENT,
+    SEARCH_BATCH_MAX_SIZE,
+)
+from core_backend.app.question_answer.schemas import QueryBase, QueryBatch
 from core_backend.app.utils import setup_logger
 
 logger = setup_logger()
@@ -172,24 +175,35 @@ class TestRetrievalPerformance:
         df["rank"] = df.apply(get_rank, axis=1)
         return df
 
-    async def call_embeddings_search(
+    async def call_embeddings_search_batch(
         self,
-        query_text: str,
+        query_texts: List[str],
         client: TestClient,
-    ) -> List[str]:
-        """Single POST /search request"""
-        request_json = QueryBase(
-            query_text=query_text, generate_llm_response=False
+    ) -> List[List[str]]:
+        """Single POST /search-batch request"""
+        request_json = QueryBatch(
+            queries=[
+                QueryBase(query_text=query_text, generate_llm_response=False)
+                for query_text in query_texts
+            ]
         ).model_dump()
         headers = {"Authorization": f"Bearer {USER1_API_KEY}"}
-        response = client.post("/search", json=request_json, headers=headers)
+        response = client.post("/search-batch", json=request_json, headers=headers)
 
         if response.status_code != 200:
             logger.warning("Failed to retrieve content")
-            content_titles = []
-        else:
-            retrieved = response.json()["search_results"]
-            content_titles = [retrieved[str(i)]["title"] for i in range(len(retrieved))]
+            return [[] for _ in query_texts]
+
+        content_titles: List[List[str]] = []
+        for query_response in response.json()["responses"]:
+            if "error_type" in query_response:
+                logger.warning("Failed to retrieve content")
+                content_titles.append([])
+            else:
+                retrieved = query_response["search_results"]
+                content_titles.append(
+                    [retrieved[str(i)]["title"] for i in range(len(retrieved))]
+                )
         return content_titles
 
     async def retrieve_results(
@@ -198,12 +212,19 @@ class TestRetrievalPerformance:
         client: TestClient,
         validation_data_question_col: str,
     ) -> pd.DataFrame:
-        """Asynchronously retrieve similar content for all queries in validation data"""
+        """Asynchronously retrieve similar content for all queries in validation data,
+        in batches"""
+        queries = df[validation_data_question_col].tolist()
+        batch_size = int(SEARCH_BATCH_MAX_SIZE)
         tasks = [
-            self.call_embeddings_search(query, client)
-            for query in df[validation_data_question_col]
+            self.call_embeddings_search_batch(queries[i : i + batch_size], client)
+            for i in range(0, len(queries), batch_size)
+        ]
+        df["retrieved_content_titles"] = [
+            content_titles
+            for batch in await asyncio.gather(*tasks)
+            for content_titles in batch
         ]
-        df["retrieved_content_titles"] = await asyncio.gather(*tasks)
         return df
 
     @staticmethod
@@ -0,0 +1,168 @@
+import os
+from typing import List, Protocol
+
+import numpy as np
+import torch
+from torch import Tensor
+from transformers import AutoConfig, AutoModel, AutoTokenizer
+
+
+class Encoder(Protocol):
+    """A model that turns a batch of texts into embeddings."""
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """Embed a padded batch of texts."""
+        ...
+
+
+def average_pool(last_hidden_states: Tensor, attention_mask: Tensor) -> Tensor:
+    """
+    Compute the average pooling of the last hidden states.
+    """
+    last_hidden = last_hidden_states.masked_fill(~attention_mask[..., None].bool(), 0.0)
+    return last_hidden.sum(dim=1) / attention_mask.sum(dim=1)[..., None]
+
+
+def average_pool_numpy(
+    last_hidden_states: np.ndarray, attention_mask: np.ndarray
+) -> np.ndarray:
+    """
+    NumPy version of `average_pool`, for backends that don't return tensors.
+    """
+    mask = attention_mask[..., None].astype(last_hidden_states.dtype)
+    return (last_hidden_states * mask).sum(axis=1) / mask.sum(axis=1)
+
+
+class TorchEncoder:
+    """fp32 PyTorch `AutoModel` backend."""
+
+    def __init__(self, model_name: str, max_length: int) -> None:
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        config = AutoConfig.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name, config=config)
+        self.model.eval()
+        self.max_length = max_length
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """Embed a padded batch of texts."""
+        batch_dict = self.tokenizer(
+            texts,
+            max_length=self.max_length,
+            padding=True,
+            truncation=True,
+            return_tensors="pt",
+        )
+        with torch.inference_mode():
+            outputs = self.model(**batch_dict)
+        return average_pool(
+            outputs.last_hidden_state, batch_dict["attention_mask"]
+        ).tolist()
+
+
+class OnnxEncoder:
+    """ONNX Runtime backend, optionally using an int8 dynamically-quantized model.
+
+    The model is exported on first use and cached under `model_dir`, so later
+    startups only need to load the ONNX file.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_length: int,
+        model_dir: str,
+        quantize: bool = True,
+        num_threads: int = 0,
+    ) -> None:
+        import onnxruntime as ort
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.max_length = max_length
+
+        model_path = export_onnx(model_name, model_dir, quantize=quantize)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """Embed a padded batch of texts."""
+        batch_dict = self.tokenizer(
+            texts,
+            max_length=self.max_length,
+            padding=True,
+            truncation=True,
+            return_tensors="np",
+        )
+        inputs = {name: batch_dict[name].astype(np.int64) for name in self.input_names}
+        (last_hidden_state,) = self.session.run(["last_hidden_state"], inputs)
+        return average_pool_numpy(
+            last_hidden_state, batch_dict["attention_mask"]
+        ).tolist()
+
+
+def export_onnx(model_name: str, model_dir: str, quantize: bool = True) -> str:
+    """
+    Export `model_name` to ONNX in `model_dir` and, if `quantize`, dynamically
+    quantize its weights to int8. Existing files are reused.
+
+    Returns the path of the model to load.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    int8_path = os.path.join(model_dir, "model.int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+        input_names = list(tokenizer.model_input_names)
+        dummy = tokenizer(["export"], return_tensors="pt")
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.inference_mode():
+            torch.onnx.export(
+                model,
+                # trailing dict is passed as keyword arguments to forward()
+                ({name: dummy[name] for name in input_names},),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+            )
+
+    if not quantize:
+        return fp32_path
+
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def load_encoder(
+    backend: str,
+    model_name: str,
+    max_length: int,
+    onnx_model_dir: str,
+    onnx_quantize: bool,
+    onnx_num_threads: int = 0,
+) -> Encoder:
+    """Build the encoder for the configured backend."""
+    if backend == "torch":
+        return TorchEncoder(model_name, max_length)
+    if backend == "onnx":
+        return OnnxEncoder(
+            model_name,
+            max_length,
+            model_dir=onnx_model_dir,
+            quantize=onnx_quantize,
+            num_threads=onnx_num_threads,
+        )
+    raise ValueError(f"Unknown embeddings backend: {backend}")
@@ -0,0 +1,105 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from backends import Encoder
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching scheduler for the embedding model.
+
+    Requests are queued and a single background task drains the queue: after the
+    first request arrives it waits up to `max_wait_ms` for more, and hands
+    everything it collected (up to `max_batch_size` texts per forward pass) to
+    the encoder on a dedicated worker thread so the event loop is never
+    blocked. Results are then fanned back out to each caller.
+    """
+
+    def __init__(
+        self,
+        encoder: Encoder,
+        max_batch_size: int,
+        max_wait_ms: float,
+    ) -> None:
+        self.encoder = encoder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: asyncio.Queue[Tuple[List[str], asyncio.Future]] = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        # A single thread keeps forward passes serialised; the backend
+        # parallelises within each pass.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def start(self) -> None:
+        """Start the background batching loop."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the batching loop and fail any requests still waiting."""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding service shut down"))
+        self._executor.shutdown(wait=False)
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Queue `texts` for the next batch and wait for their embeddings."""
+        if not texts:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _run(self) -> None:
+        """Collect queued requests into batches and run them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = [await self._queue.get()]
+            n_texts = len(requests[0][0])
+            deadline = loop.time() + self.max_wait
+            while n_texts < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                requests.append(item)
+                n_texts += len(item[0])
+
+            # Drop requests whose caller has gone away (e.g. client disconnect)
+            requests = [(texts, fut) for texts, fut in requests if not fut.done()]
+            if not requests:
+                continue
+            texts = [text for request_texts, _ in requests for text in request_texts]
+            try:
+                embeddings = await loop.run_in_executor(
+                    self._executor, self._encode, texts
+                )
+            except Exception as e:
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            start = 0
+            for request_texts, future in requests:
+                end = start + len(request_texts)
+                if not future.done():
+                    future.set_result(embeddings[start:end])
+                start = end
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """Run the encoder on `texts`, in chunks of at most `max_batch_size`."""
+        embeddings: List[List[float]] = []
+        for i in range(0, len(texts), self.max_batch_size):
+            embeddings.extend(self.encoder.encode(texts[i : i + self.max_batch_size]))
+        return embeddings
@@ -2,3 +2,15 @@ import os
 
 HUGGINGFACE_MODEL = os.environ.get("HUGGINGFACE_MODEL", "thenlper/gte-large")
 API_KEY = os.environ.get("EMBEDDINGS_API_KEY", "add-token")
+# Micro-batching: concurrent requests arriving within MAX_BATCH_WAIT_MS of each
+# other are padded into a single forward pass of at most MAX_BATCH_SIZE texts.
+MAX_BATCH_SIZE = int(os.environ.get("EMBEDDINGS_MAX_BATCH_SIZE", 32))
+MAX_BATCH_WAIT_MS = float(os.environ.get("EMBEDDINGS_MAX_BATCH_WAIT_MS", 5))
+MAX_SEQUENCE_LENGTH = int(os.environ.get("EMBEDDINGS_MAX_SEQUENCE_LENGTH", 512))
+
+# Inference backend: "torch" (fp32 PyTorch) or "onnx" (ONNX Runtime on CPU).
+EMBEDDINGS_BACKEND = os.environ.get("EMBEDDINGS_BACKEND", "torch")
+# The ONNX export is cached here so it only happens on first startup
+ONNX_MODEL_DIR = os.environ.get("EMBEDDINGS_ONNX_MODEL_DIR", "/data/onnx")
+ONNX_QUANTIZE = os.environ.get("EMBEDDINGS_ONNX_QUANTIZE", "True") == "True"
+ONNX_NUM_THREADS = int(os.environ.get("EMBEDDINGS_ONNX_NUM_THREADS", 0))
@@ -1,11 +1,21 @@
-from typing import List
-
-from config import API_KEY, HUGGINGFACE_MODEL
+from typing import List, Union
+
+from backends import load_encoder
+from batching import EmbeddingBatcher
+from config import (
+    API_KEY,
+    EMBEDDINGS_BACKEND,
+    HUGGINGFACE_MODEL,
+    MAX_BATCH_SIZE,
+    MAX_BATCH_WAIT_MS,
+    MAX_SEQUENCE_LENGTH,
+    ONNX_MODEL_DIR,
+    ONNX_NUM_THREADS,
+    ONNX_QUANTIZE,
+)
 from fastapi import Depends, FastAPI, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
-from torch import Tensor
-from transformers import AutoConfig, AutoModel, AutoTokenizer
 
 app = FastAPI()
 
@@ -15,14 +25,31 @@ security = HTTPBearer()
 @app.on_event("startup")
 def load_model():
     """Load the model and tokenizer on startup"""
-    app.state.tokenizer = AutoTokenizer.from_pretrained(HUGGINGFACE_MODEL)
-    config = AutoConfig.from_pretrained(HUGGINGFACE_MODEL)
-    app.state.model = AutoModel.from_pretrained(HUGGINGFACE_MODEL, config=config)
-    app.state.model.eval()
+    app.state.encoder = load_encoder(
+        EMBEDDINGS_BACKEND,
+        HUGGINGFACE_MODEL,
+        max_length=MAX_SEQUENCE_LENGTH,
+        onnx_model_dir=ONNX_MODEL_DIR,
+        onnx_quantize=ONNX_QUANTIZE,
+        onnx_num_threads=ONNX_NUM_THREADS,
+    )
+    app.state.batcher = EmbeddingBatcher(
+        encoder=app.state.encoder,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_wait_ms=MAX_BATCH_WAIT_MS,
+    )
+    app.state.batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_batcher() -> None:
+    """Stop the batching loop on shutdown"""
+    await app.state.batcher.stop()
 
 
 class RequestModel(BaseModel):
-    input: str
+    # Accepts a single string or a list of strings, as the OpenAI API does
+    input: Union[str, List[str]]
     model_name: str = HUGGINGFACE_MODEL
 
 
@@ -32,14 +59,6 @@ class ResponseModel(BaseModel):
     model_name: str = HUGGINGFACE_MODEL
 
 
-def average_pool(last_hidden_states: Tensor, attention_mask: Tensor) -> Tensor:
-    """
-    Compute the average pooling of the last hidden states.
-    """
-    last_hidden = last_hidden_states.masked_fill(~attention_mask[..., None].bool(), 0.0)
-    return last_hidden.sum(dim=1) / attention_mask.sum(dim=1)[..., None]
-
-
 def verify_token(http_auth: HTTPAuthorizationCredentials = Depends(security)):
     """
     Authenticate using basic bearer token. Used for calling
@@ -57,22 +76,19 @@ def verify_token(http_auth: HTTPAuthorizationCredentials = Depends(security)):
 async def get_embeddings(
     request: Request, request_input: RequestModel, token: str = Depends(verify_token)
 ):
-    """Endpoint to get embeddings for the given text."""
-    tokenizer = request.app.state.tokenizer
-    model = request.app.state.model
-    batch_dict = tokenizer(
-        request_input.input,
-        max_length=512,
-        padding=True,
-        truncation=True,
-        return_tensors="pt",
+    """Endpoint to get embeddings for the given text(s).
+
+    Concurrent requests are micro-batched into a single forward pass.
+    """
+    texts = (
+        [request_input.input]
+        if isinstance(request_input.input, str)
+        else request_input.input
     )
-    outputs = model(**batch_dict)
-    embeddings = average_pool(outputs.last_hidden_state, batch_dict["attention_mask"])
-
-    response_dict = {
-        "object": "embedding",
-        "index": 0,
-        "embedding": embeddings.tolist()[0],
-    }
-    return ResponseModel(data=[response_dict])
+    embeddings = await request.app.state.batcher.embed(texts)
+
+    data = [
+        {"object": "embedding", "index": i, "embedding": embedding}
+        for i, embedding in enumerate(embeddings)
+    ]
+    return ResponseModel(data=data)
@@ -0,0 +1,100 @@
+"""
+Compare the throughput of the embeddings backends.
+
+Usage:
+    python benchmark.py [--batch-size 32] [--n-texts 512] [--no-quantize]
+
+Run from this directory; model and sequence length are read from the same
+environment variables as the service (see app/config.py).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Union
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "app"))
+
+from backends import OnnxEncoder, TorchEncoder  # noqa: E402
+from config import (  # noqa: E402
+    HUGGINGFACE_MODEL,
+    MAX_SEQUENCE_LENGTH,
+    ONNX_MODEL_DIR,
+    ONNX_NUM_THREADS,
+)
+
+WORDS = (
+    "baby mother feeding fever clinic pregnancy vaccine sleep water milk "
+    "doctor pain cough rash nurse appointment medicine week month health"
+).split()
+
+
+def make_texts(n_texts: int, seed: int = 0) -> List[str]:
+    """Generate `n_texts` random questions of varying length."""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choices(WORDS, k=rng.randint(5, 60))) + "?" for _ in range(n_texts)
+    ]
+
+
+def benchmark(
+    encoder: Union[TorchEncoder, OnnxEncoder], texts: List[str], batch_size: int
+) -> float:
+    """Return tokens/sec for embedding `texts` in batches of `batch_size`."""
+    n_tokens = sum(
+        len(ids)
+        for ids in encoder.tokenizer(
+            texts, max_length=MAX_SEQUENCE_LENGTH, truncation=True
+        )["input_ids"]
+    )
+    encoder.encode(texts[:batch_size])  # warm-up
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        encoder.encode(texts[i : i + batch_size])
+    return n_tokens / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """Run the benchmark for each backend and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--n-texts", type=int, default=512)
+    parser.add_argument("--onnx-model-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument(
+        "--no-quantize", action="store_true", help="Skip the int8 ONNX model"
+    )
+    args = parser.parse_args()
+
+    texts = make_texts(args.n_texts)
+    encoders = {
+        "torch fp32": lambda: TorchEncoder(HUGGINGFACE_MODEL, MAX_SEQUENCE_LENGTH),
+        "onnx fp32": lambda: OnnxEncoder(
+            HUGGINGFACE_MODEL,
+            MAX_SEQUENCE_LENGTH,
+            model_dir=args.onnx_model_dir,
+            quantize=False,
+            num_threads=ONNX_NUM_THREADS,
+        ),
+    }
+    if not args.no_quantize:
+        encoders["onnx int8"] = lambda: OnnxEncoder(
+            HUGGINGFACE_MODEL,
+            MAX_SEQUENCE_LENGTH,
+            model_dir=args.onnx_model_dir,
+            quantize=True,
+            num_threads=ONNX_NUM_THREADS,
+        )
+
+    print(f"Model: {HUGGINGFACE_MODEL}, texts: {len(texts)}, batch: {args.batch_size}")
+    for name, make_encoder in encoders.items():
+        start = time.perf_counter()
+        encoder = make_encoder()
+        load_time = time.perf_counter() - start
+        tokens_per_sec = benchmark(encoder, texts, args.batch_size)
+        print(f"{name:<12} load {load_time:6.1f}s  {tokens_per_sec:10.0f} tokens/sec")
+
+
+if __name__ == "__main__":
+    main()
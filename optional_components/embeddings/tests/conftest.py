@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The service runs with PYTHONPATH=/app, so mirror that for the tests
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
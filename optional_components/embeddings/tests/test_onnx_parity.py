@@ -0,0 +1,52 @@
+import os
+from typing import List
+
+import numpy as np
+import pytest
+from backends import OnnxEncoder, TorchEncoder
+from config import HUGGINGFACE_MODEL, MAX_SEQUENCE_LENGTH
+
+TEXTS = [
+    "What are the signs of dehydration in a newborn?",
+    "How often should I breastfeed my baby?",
+    "short",
+    "A much longer piece of text that is padded very differently from the "
+    "others in the batch, so that any mistake in handling the attention mask "
+    "during pooling shows up as a drop in similarity.",
+]
+
+
+def cosine_similarities(a: List[List[float]], b: List[List[float]]) -> np.ndarray:
+    """Row-wise cosine similarity of two batches of embeddings."""
+    a_arr, b_arr = np.asarray(a), np.asarray(b)
+    a_arr /= np.linalg.norm(a_arr, axis=1, keepdims=True)
+    b_arr /= np.linalg.norm(b_arr, axis=1, keepdims=True)
+    return (a_arr * b_arr).sum(axis=1)
+
+
+class TestOnnxParity:
+    @pytest.fixture(scope="class")
+    def torch_embeddings(self) -> List[List[float]]:
+        encoder = TorchEncoder(HUGGINGFACE_MODEL, MAX_SEQUENCE_LENGTH)
+        return encoder.encode(TEXTS)
+
+    @pytest.mark.parametrize("quantize", [False, True])
+    def test_onnx_matches_torch(
+        self,
+        quantize: bool,
+        torch_embeddings: List[List[float]],
+        tmp_path_factory: pytest.TempPathFactory,
+    ) -> None:
+        model_dir = os.environ.get(
+            "EMBEDDINGS_ONNX_MODEL_DIR", str(tmp_path_factory.getbasetemp() / "onnx")
+        )
+        encoder = OnnxEncoder(
+            HUGGINGFACE_MODEL,
+            MAX_SEQUENCE_LENGTH,
+            model_dir=model_dir,
+            quantize=quantize,
+        )
+        onnx_embeddings = encoder.encode(TEXTS)
+
+        assert len(onnx_embeddings) == len(TEXTS)
+        assert np.all(cosine_similarities(torch_embeddings, onnx_embeddings) >= 0.99)